@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark das dimensões do Titan Text Embeddings v2 (256, 512, 1024) no corpus.
+
+Para cada dimensão gera os embeddings dos chunks e das consultas, monta um
+índice flat e mede latência de busca, tamanho do índice e a sobreposição
+dos top-k com a maior dimensão (referência).
+
+Com --backend bedrock cada dimensão gera todos os embeddings do corpus de
+novo (custo de chamadas ao Titan). O backend fake serve apenas para testar
+o script: os vetores menores são truncamentos do vetor de referência.
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import faiss
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config.settings import Config
+from src import index_factory
+from src.document_processor import DocumentProcessor
+from src.embedding_pipeline import EmbeddingPipeline, create_embeddings
+
+def parse_args():
+    """Lê os argumentos da linha de comando"""
+    parser = argparse.ArgumentParser(description="Benchmark de dimensões de embedding")
+    parser.add_argument('--backend', choices=['fake', 'bedrock'], default='fake')
+    parser.add_argument('--directory', default=Config.DOCUMENTS_PATH,
+                        help="Diretório com os documentos (padrão: %(default)s)")
+    parser.add_argument('--dimensions', default='256,512,1024',
+                        help="Dimensões separadas por vírgula (padrão: %(default)s)")
+    parser.add_argument('--queries-file', help="Arquivo com uma consulta por linha")
+    parser.add_argument('--queries', type=int, default=50,
+                        help="Sem --queries-file, usa o início de N chunks como consultas (padrão: %(default)s)")
+    parser.add_argument('--k', type=int, default=5, help="Vizinhos por consulta (padrão: %(default)s)")
+    parser.add_argument('--concurrency', type=int, default=Config.EMBEDDING_CONCURRENCY)
+    return parser.parse_args()
+
+def load_queries(args, chunks):
+    if args.queries_file:
+        with open(args.queries_file, encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip()]
+    rng = np.random.default_rng(7)
+    sample = rng.choice(len(chunks), size=min(args.queries, len(chunks)), replace=False)
+    return [chunks[i][:200] for i in sample]
+
+def embed(args, dimension, texts):
+    client = None
+    if args.backend == 'bedrock':
+        from src.bedrock_client import configure_from_settings
+        client = configure_from_settings(Config).get_client('bedrock-runtime', region_name=Config.AWS_REGION)
+    embeddings, _, _ = create_embeddings(args.backend, Config.BEDROCK_EMBEDDING_MODEL_ID,
+                                         client=client, dimensions=dimension)
+    pipeline = EmbeddingPipeline(embeddings, max_concurrency=args.concurrency)
+    return np.asarray(pipeline.embed_documents(texts), dtype=np.float32)
+
+def main():
+    """Função principal"""
+    args = parse_args()
+    dimensions = sorted(int(value) for value in args.dimensions.split(','))
+
+    processor = DocumentProcessor(chunk_size=Config.CHUNK_SIZE, chunk_overlap=Config.CHUNK_OVERLAP)
+    chunks = [doc.page_content for doc in processor.process_documents_directory(args.directory)]
+    if not chunks:
+        print(f"❌ Nenhum chunk encontrado em {args.directory}")
+        return 1
+    queries = load_queries(args, chunks)
+    k = min(args.k, len(chunks))
+    print(f"🔬 Backend: {args.backend} | {len(chunks)} chunks | {len(queries)} consultas | k={k}")
+
+    results = {}
+    rows = []
+    for dimension in reversed(dimensions):
+        start = time.perf_counter()
+        vectors = embed(args, dimension, chunks)
+        query_vectors = embed(args, dimension, queries)
+        embed_seconds = time.perf_counter() - start
+
+        index = index_factory.build_index('flat', vectors.shape[1], vectors)
+        size_kb = len(faiss.serialize_index(index)) / 1024
+        start = time.perf_counter()
+        for query in query_vectors:
+            index.search(query.reshape(1, -1), k)
+        latency = (time.perf_counter() - start) * 1000 / len(query_vectors)
+        _, results[dimension] = index.search(query_vectors, k)
+        rows.append((dimension, embed_seconds, size_kb, latency))
+
+    reference = results[dimensions[-1]]
+    print(f"\n{'Dimensão':>8} {'Embeddings (s)':>15} {'Índice (KB)':>12} {'ms/consulta':>12} {'Overlap@k':>10}")
+    print("-" * 61)
+    for dimension, embed_seconds, size_kb, latency in sorted(rows):
+        overlap = np.mean([len(set(row) & set(ref)) / k for row, ref in zip(results[dimension], reference)])
+        print(f"{dimension:>8} {embed_seconds:>15.2f} {size_kb:>12.1f} {latency:>12.3f} {overlap:>10.3f}")
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark de throughput do pipeline de embeddings.
+
+Por padrão usa o backend local (fake) com latência simulada, sem
+credenciais AWS. Use --backend bedrock para medir contra o Titan real.
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config.settings import Config
+from src import embedding_pipeline
+from src.embedding_pipeline import EmbeddingPipeline
+
+def parse_args():
+    """Lê os argumentos da linha de comando"""
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline de embeddings")
+    parser.add_argument('--backend', choices=['fake', 'bedrock'], default='fake')
+    parser.add_argument('--texts', type=int, default=256, help="Número de textos (padrão: %(default)s)")
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help="Latência simulada por chamada no backend fake, em segundos (padrão: %(default)s)")
+    parser.add_argument('--concurrency', default='1,2,4,8,16',
+                        help="Níveis de concorrência separados por vírgula (padrão: %(default)s)")
+    parser.add_argument('--batch-size', type=int, default=Config.EMBEDDING_BATCH_SIZE)
+    return parser.parse_args()
+
+def create_embeddings(args):
+    """Cria o backend de embeddings escolhido"""
+    client = None
+    if args.backend == 'bedrock':
+        from src.bedrock_client import configure_from_settings
+        client = configure_from_settings(Config).get_client('bedrock-runtime', region_name=Config.AWS_REGION)
+    embeddings, _, _ = embedding_pipeline.create_embeddings(
+        args.backend,
+        Config.BEDROCK_EMBEDDING_MODEL_ID,
+        client=client,
+        dimensions=Config.EMBEDDING_DIMENSIONS if args.backend == 'bedrock' else None,
+        fake_size=Config.FAKE_EMBEDDING_SIZE,
+        fake_latency=args.latency
+    )
+    return embeddings
+
+def main():
+    """Função principal"""
+    args = parse_args()
+    embeddings = create_embeddings(args)
+    texts = [f"Trecho de documento número {i} para benchmark de embeddings." for i in range(args.texts)]
+
+    print(f"🔬 Backend: {args.backend} | textos: {args.texts} | lote: {args.batch_size}")
+    print(f"\n{'Concorrência':>12} {'Tempo (s)':>10} {'Textos/s':>10} {'Speedup':>8}")
+    print("-" * 44)
+
+    baseline = None
+    for concurrency in [int(value) for value in args.concurrency.split(',')]:
+        pipeline = EmbeddingPipeline(embeddings, max_concurrency=concurrency, batch_size=args.batch_size)
+        start = time.perf_counter()
+        vectors = pipeline.embed_documents(texts)
+        elapsed = time.perf_counter() - start
+        assert len(vectors) == len(texts)
+
+        baseline = baseline or elapsed
+        print(f"{concurrency:>12} {elapsed:>10.2f} {len(texts) / elapsed:>10.1f} {baseline / elapsed:>7.1f}x")
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark de recall x latência x memória dos tipos de índice vetorial
+(flat, IVF, HNSW e os quantizados SQ8/PQ, com e sem re-ranking).
+
+Por padrão gera vetores sintéticos agrupados, sem credenciais AWS. Com
+--vector-store usa os vetores de um índice já construído; as consultas são
+vetores do próprio corpus levemente perturbados.
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import faiss
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src import index_factory
+from src.vector_store import find_index_file
+
+def parse_args():
+    """Lê os argumentos da linha de comando"""
+    parser = argparse.ArgumentParser(description="Benchmark de tipos de índice vetorial")
+    parser.add_argument('--vectors', type=int, default=50000, help="Vetores sintéticos (padrão: %(default)s)")
+    parser.add_argument('--dimension', type=int, default=256, help="Dimensão sintética (padrão: %(default)s)")
+    parser.add_argument('--vector-store', help="Diretório de um vector store existente (usa o índice da versão ativa)")
+    parser.add_argument('--queries', type=int, default=200, help="Número de consultas (padrão: %(default)s)")
+    parser.add_argument('--k', type=int, default=5, help="Vizinhos por consulta (padrão: %(default)s)")
+    parser.add_argument('--nprobe', default='1,4,16,64', help="Valores de nprobe do IVF (padrão: %(default)s)")
+    parser.add_argument('--ef-search', default='16,64,256', help="Valores de efSearch do HNSW (padrão: %(default)s)")
+    parser.add_argument('--rerank-factor', type=int, default=4,
+                        help="Candidatos por resultado re-ranqueados nos índices quantizados (padrão: %(default)s)")
+    return parser.parse_args()
+
+def synthetic_vectors(count, dimension, seed=42):
+    """Vetores normalizados em torno de centros aleatórios, como embeddings de tópicos"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(count // 500, 8), dimension)).astype(np.float32)
+    labels = rng.integers(0, len(centers), count)
+    vectors = centers[labels] + 0.5 * rng.standard_normal((count, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def load_vectors(args):
+    if args.vector_store:
+        index = faiss.read_index(find_index_file(args.vector_store))
+        return index_factory.extract_vectors(index)
+    return synthetic_vectors(args.vectors, args.dimension)
+
+def make_queries(vectors, count, seed=7):
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.integers(0, len(vectors), count)]
+    queries = sample + 0.05 * rng.standard_normal(sample.shape).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+def measure(index, queries, k, params=None):
+    """Busca uma consulta por vez (como no /chat); retorna posições e ms por consulta"""
+    results = np.zeros((len(queries), k), dtype=np.int64)
+    start = time.perf_counter()
+    for i, query in enumerate(queries):
+        _, positions = index.search(query.reshape(1, -1), k, params=params)
+        results[i] = positions[0]
+    return results, (time.perf_counter() - start) * 1000 / len(queries)
+
+def measure_reranked(index, queries, vectors, k, factor):
+    """Busca k·fator candidatos no índice quantizado e reordena pela distância exata"""
+    results = np.zeros((len(queries), k), dtype=np.int64)
+    start = time.perf_counter()
+    for i, query in enumerate(queries):
+        _, positions = index.search(query.reshape(1, -1), k * factor)
+        candidates = positions[0][positions[0] != -1]
+        distances = ((vectors[candidates] - query) ** 2).sum(axis=1)
+        results[i, :min(k, len(candidates))] = candidates[np.argsort(distances)[:k]]
+    return results, (time.perf_counter() - start) * 1000 / len(queries)
+
+def recall(results, ground_truth):
+    hits = sum(len(set(row) & set(truth)) for row, truth in zip(results, ground_truth))
+    return hits / ground_truth.size
+
+def main():
+    """Função principal"""
+    args = parse_args()
+    vectors = load_vectors(args)
+    queries = make_queries(vectors, args.queries)
+    print(f"🔬 {len(vectors)} vetores de dimensão {vectors.shape[1]} | {len(queries)} consultas | k={args.k}")
+
+    rows = []
+    for index_type in ('flat', 'ivf', 'hnsw', 'sq8', 'pq'):
+        start = time.perf_counter()
+        index = index_factory.build_index(index_type, vectors.shape[1], vectors)
+        build_seconds = time.perf_counter() - start
+        size_mb = len(faiss.serialize_index(index)) / 1024 ** 2
+        per_vector = index_factory.bytes_per_vector(index)
+
+        def row(param, latency, recall_value):
+            rows.append((index_type, param, build_seconds, size_mb, per_vector, latency, recall_value))
+
+        if index_type == 'flat':
+            ground_truth, latency = measure(index, queries, args.k)
+            row('-', latency, 1.0)
+        elif index_type == 'ivf':
+            for nprobe in [int(value) for value in args.nprobe.split(',')]:
+                results, latency = measure(index, queries, args.k, index_factory.search_parameters(index, nprobe=nprobe))
+                row(f"nprobe={nprobe}", latency, recall(results, ground_truth))
+        elif index_type == 'hnsw':
+            for ef_search in [int(value) for value in args.ef_search.split(',')]:
+                results, latency = measure(index, queries, args.k,
+                                           index_factory.search_parameters(index, ef_search=ef_search))
+                row(f"ef={ef_search}", latency, recall(results, ground_truth))
+        else:
+            results, latency = measure(index, queries, args.k)
+            row('-', latency, recall(results, ground_truth))
+            if args.rerank_factor > 1:
+                results, latency = measure_reranked(index, queries, vectors, args.k, args.rerank_factor)
+                row(f"rerank x{args.rerank_factor}", latency, recall(results, ground_truth))
+
+    print(f"\n{'Índice':>6} {'Parâmetro':>12} {'Build (s)':>10} {'Tamanho (MB)':>13} {'Bytes/vetor':>12} "
+          f"{'ms/consulta':>12} {'Recall@k':>9}")
+    print("-" * 80)
+    for index_type, param, build_seconds, size_mb, per_vector, latency, recall_value in rows:
+        print(f"{index_type:>6} {param:>12} {build_seconds:>10.2f} {size_mb:>13.1f} {per_vector:>12} "
+              f"{latency:>12.3f} {recall_value:>9.3f}")
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
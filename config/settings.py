@@ -24,10 +24,83 @@ class Config:
     VECTOR_STORE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'vector_store')
     CHUNK_SIZE = int(os.getenv('CHUNK_SIZE', 1000))
     CHUNK_OVERLAP = int(os.getenv('CHUNK_OVERLAP', 200))
+    INGESTION_WORKERS = int(os.getenv('INGESTION_WORKERS', 1))
+    # Jobs de ingestão em background: executados em sequência, histórico limitado
+    INGESTION_JOB_WORKERS = int(os.getenv('INGESTION_JOB_WORKERS', 1))
+    INGESTION_JOB_HISTORY = int(os.getenv('INGESTION_JOB_HISTORY', 100))
+    
+    # Embedding Pipeline
+    EMBEDDING_CONCURRENCY = int(os.getenv('EMBEDDING_CONCURRENCY', 8))
+    EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', 32))
+    EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'bedrock')  # 'bedrock' ou 'fake' (testes/benchmarks)
+    FAKE_EMBEDDING_LATENCY = float(os.getenv('FAKE_EMBEDDING_LATENCY', 0.0))
+    FAKE_EMBEDDING_SIZE = int(os.getenv('FAKE_EMBEDDING_SIZE', 1024))
+    # Dimensão dos vetores do Titan v2 (256, 512 ou 1024); vazio usa a do modelo (1024 no Titan v2).
+    # Ignorada por modelos sem dimensão configurável e pelo backend fake (FAKE_EMBEDDING_SIZE)
+    EMBEDDING_DIMENSIONS = int(os.getenv('EMBEDDING_DIMENSIONS')) if os.getenv('EMBEDDING_DIMENSIONS') else None
+    # Cache persistente de embeddings (fora do diretório do índice para sobreviver a rebuilds)
+    EMBEDDING_CACHE_PATH = os.getenv(
+        'EMBEDDING_CACHE_PATH',
+        os.path.join(os.path.dirname(os.path.dirname(__file__)), 'vector_store_embedding_cache.sqlite')
+    )
+    EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', 200000))
     
     # Search Configuration
     MAX_SEARCH_RESULTS = int(os.getenv('MAX_SEARCH_RESULTS', 5))
     SIMILARITY_THRESHOLD = float(os.getenv('SIMILARITY_THRESHOLD', 0.7))
+    SEARCH_BATCH_MAX_QUERIES = int(os.getenv('SEARCH_BATCH_MAX_QUERIES', 1000))  # consultas por /search/batch
+    QUERY_CACHE_SIZE = int(os.getenv('QUERY_CACHE_SIZE', 1024))
+    QUERY_CACHE_TTL = float(os.getenv('QUERY_CACHE_TTL', 3600))  # segundos; 0 = sem expiração
+    
+    # Cache semântico de respostas
+    ANSWER_CACHE_ENABLED = os.getenv('ANSWER_CACHE_ENABLED', 'True').lower() == 'true'
+    ANSWER_CACHE_MAX_DISTANCE = float(os.getenv('ANSWER_CACHE_MAX_DISTANCE', 0.05))  # distância de cosseno
+    ANSWER_CACHE_SIZE = int(os.getenv('ANSWER_CACHE_SIZE', 512))
+    ANSWER_CACHE_TTL = float(os.getenv('ANSWER_CACHE_TTL', 3600))
+    
+    # Pool de clientes boto3 compartilhado (Bedrock)
+    BEDROCK_MAX_POOL_CONNECTIONS = int(os.getenv('BEDROCK_MAX_POOL_CONNECTIONS', 50))
+    BEDROCK_CONNECT_TIMEOUT = float(os.getenv('BEDROCK_CONNECT_TIMEOUT', 5))  # segundos
+    BEDROCK_READ_TIMEOUT = float(os.getenv('BEDROCK_READ_TIMEOUT', 120))  # segundos
+    BEDROCK_MAX_ATTEMPTS = int(os.getenv('BEDROCK_MAX_ATTEMPTS', 5))
+    BEDROCK_RETRY_MODE = os.getenv('BEDROCK_RETRY_MODE', 'adaptive')  # legacy, standard ou adaptive
+    
+    # Carregamento do índice FAISS com mmap (páginas compartilhadas entre workers)
+    INDEX_MMAP = os.getenv('INDEX_MMAP', 'True').lower() == 'true'
+    
+    # Tipo de índice vetorial: flat (exato), ivf, hnsw, sq8, pq ou auto (escolhe pelo tamanho do corpus)
+    INDEX_TYPE = os.getenv('INDEX_TYPE', 'flat')
+    INDEX_NPROBE = int(os.getenv('INDEX_NPROBE', 16))  # listas visitadas por busca (IVF)
+    INDEX_EF_SEARCH = int(os.getenv('INDEX_EF_SEARCH', 64))  # candidatos explorados por busca (HNSW)
+    INDEX_RERANK_FACTOR = int(os.getenv('INDEX_RERANK_FACTOR', 4))  # sq8/pq: candidatos = k·fator; 0 desativa
+    # ivf/sq8/pq: treina de novo quando o corpus passa de fator × vetores do último treino; 0 desativa
+    INDEX_RETRAIN_FACTOR = float(os.getenv('INDEX_RETRAIN_FACTOR', 4))
+    # Métrica dos índices: cosine (vetores normalizados, score = similaridade) ou l2 (índices antigos)
+    INDEX_METRIC = os.getenv('INDEX_METRIC', 'cosine')
+    # Busca por raio: retorna todos os chunks acima do limiar (até MAX_SEARCH_RESULTS)
+    RANGE_SEARCH = os.getenv('RANGE_SEARCH', 'False').lower() == 'true'
+    # Buscas filtradas por metadados com até N chunks no filtro são exatas, só entre esses chunks
+    INDEX_FILTER_EXACT_MAX = int(os.getenv('INDEX_FILTER_EXACT_MAX', 2048))
+    # Busca híbrida: BM25 (códigos, artigos, SKUs) + vetorial, fundidas por reciprocal rank fusion
+    HYBRID_SEARCH = os.getenv('HYBRID_SEARCH', 'False').lower() == 'true'
+    HYBRID_RRF_K = int(os.getenv('HYBRID_RRF_K', 60))
+    HYBRID_CANDIDATE_FACTOR = int(os.getenv('HYBRID_CANDIDATE_FACTOR', 4))  # candidatos de cada lado = k·fator
+    # Diversificação MMR dos resultados: lambda 1 = só relevância, 0 = só diversidade
+    MMR_ENABLED = os.getenv('MMR_ENABLED', 'False').lower() == 'true'
+    MMR_LAMBDA = float(os.getenv('MMR_LAMBDA', 0.5))
+    MMR_CANDIDATE_FACTOR = int(os.getenv('MMR_CANDIDATE_FACTOR', 4))  # candidatos = k·fator
+    # Une no prompt chunks consecutivos do mesmo arquivo, removendo o overlap repetido
+    MERGE_ADJACENT_CHUNKS = os.getenv('MERGE_ADJACENT_CHUNKS', 'True').lower() == 'true'
+    
+    # Write-ahead log do índice: adições/remoções vão para um log append-only e o
+    # índice completo é regravado em checkpoints periódicos em background
+    WAL_ENABLED = os.getenv('WAL_ENABLED', 'True').lower() == 'true'
+    WAL_CHECKPOINT_INTERVAL = float(os.getenv('WAL_CHECKPOINT_INTERVAL', 60))  # segundos
+    WAL_CHECKPOINT_BYTES = int(os.getenv('WAL_CHECKPOINT_BYTES', 64 * 1024 * 1024))  # checkpoint antecipado
+    
+    # Versões do índice: reconstruções completas geram uma versão nova, ativada ao final
+    INDEX_KEEP_VERSIONS = int(os.getenv('INDEX_KEEP_VERSIONS', 2))  # ativa + anteriores para rollback
+    INDEX_VERSION_CHECK_INTERVAL = float(os.getenv('INDEX_VERSION_CHECK_INTERVAL', 5))  # segundos; 0 desativa
     
     # Prompt Configuration
     PROMPTS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'prompts')
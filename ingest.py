@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Script de linha de comando para ingestão de documentos no vector store
+"""
+
+import os
+import sys
+import time
+import argparse
+import logging
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config.settings import Config
+from src.document_processor import DocumentProcessor
+from src import index_factory
+
+def parse_args():
+    """Lê os argumentos da linha de comando"""
+    parser = argparse.ArgumentParser(description="Ingestão de documentos no vector store")
+    parser.add_argument('--directory', default=Config.DOCUMENTS_PATH,
+                        help="Diretório com os documentos (padrão: %(default)s)")
+    parser.add_argument('--workers', type=int, default=Config.INGESTION_WORKERS,
+                        help="Número de processos para extração e chunking (padrão: %(default)s)")
+    parser.add_argument('--concurrency', type=int, default=Config.EMBEDDING_CONCURRENCY,
+                        help="Chamadas de embedding simultâneas (padrão: %(default)s)")
+    parser.add_argument('--extract-only', action='store_true',
+                        help="Apenas extrai e divide os documentos, sem gerar embeddings")
+    parser.add_argument('--full', action='store_true',
+                        help="Reconstrói o vector store do zero em vez de ingerir apenas arquivos alterados")
+    parser.add_argument('--rebuild-index', choices=index_factory.INDEX_TYPES,
+                        help="Apenas reconstrói o índice existente no tipo indicado, sem reprocessar documentos")
+    parser.add_argument('--rollback', action='store_true',
+                        help="Volta o índice para a versão anterior (após um --full)")
+    return parser.parse_args()
+
+def print_timings(timings):
+    """Exibe o tempo de processamento por arquivo"""
+    print(f"\n{'Arquivo':50} {'Chunks':>8} {'Tempo (s)':>10}")
+    print("-" * 70)
+    for timing in timings:
+        print(f"{timing['file'][:50]:50} {timing['chunks']:>8} {timing['seconds']:>10.3f}")
+
+def main():
+    """Função principal"""
+    args = parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    processor = DocumentProcessor(
+        chunk_size=Config.CHUNK_SIZE,
+        chunk_overlap=Config.CHUNK_OVERLAP
+    )
+
+    if args.extract_only:
+        start = time.perf_counter()
+        documents = processor.process_documents_directory(args.directory, max_workers=args.workers)
+        print_timings(processor.last_file_timings)
+        print(f"\n📄 {len(processor.last_file_timings)} arquivos, {len(documents)} chunks "
+              f"em {time.perf_counter() - start:.2f}s ({args.workers} processos)")
+        return 0
+
+    from src.vector_store import VectorStore
+    vector_store = VectorStore(
+        aws_region=Config.AWS_REGION,
+        embedding_model_id=Config.BEDROCK_EMBEDDING_MODEL_ID,
+        vector_store_path=Config.VECTOR_STORE_PATH,
+        embedding_concurrency=args.concurrency,
+        embedding_batch_size=Config.EMBEDDING_BATCH_SIZE,
+        embedding_backend=Config.EMBEDDING_BACKEND,
+        fake_embedding_latency=Config.FAKE_EMBEDDING_LATENCY,
+        fake_embedding_size=Config.FAKE_EMBEDDING_SIZE,
+        embedding_cache_path=Config.EMBEDDING_CACHE_PATH,
+        embedding_cache_max_entries=Config.EMBEDDING_CACHE_MAX_ENTRIES,
+        index_type=args.rebuild_index or Config.INDEX_TYPE,
+        index_metric=Config.INDEX_METRIC,
+        index_retrain_factor=Config.INDEX_RETRAIN_FACTOR,
+        # Com a busca híbrida ligada, o índice BM25 é atualizado e salvo junto na ingestão
+        hybrid_search=Config.HYBRID_SEARCH,
+        embedding_dimensions=Config.EMBEDDING_DIMENSIONS,
+        wal_enabled=Config.WAL_ENABLED,
+        keep_index_versions=Config.INDEX_KEEP_VERSIONS,
+        # O CLI salva o índice ao final; sem checkpoints periódicos durante a ingestão
+        wal_checkpoint_interval=0,
+        # Com --full, um índice de outro modelo/dimensão é descartado em vez de gerar erro
+        reset_on_embedding_change=args.full
+    )
+
+    if args.rollback:
+        version = vector_store.rollback_version()
+        print(f"\n✅ Índice de volta à versão {version} (versões: {', '.join(vector_store.list_versions())})")
+        return 0
+
+    if args.rebuild_index:
+        info = vector_store.rebuild_index(args.rebuild_index)
+        vector_store.save_vector_store()
+        print(f"\n✅ Índice reconstruído: {info}")
+        return 0
+
+    from src.ingestion_jobs import ingest_directory, NoDocumentsError
+    start = time.perf_counter()
+    # Reconstrução completa em uma nova versão; a atual segue servindo buscas até a troca
+    try:
+        result = ingest_directory(vector_store, processor, args.directory,
+                                  full_rebuild=args.full or not vector_store.manifest.exists(),
+                                  workers=args.workers)
+    except NoDocumentsError as e:
+        print(f"❌ {e}")
+        return 1
+    print_timings(result['file_timings'])
+
+    print(f"\n✅ Vector store atualizado em {time.perf_counter() - start:.2f}s: {result['ingestion']}")
+    if vector_store.version:
+        print(f"   Versão do índice: {vector_store.version}")
+    print(f"   Embeddings: {vector_store.embedding_pipeline.get_stats()}")
+    if vector_store.embedding_cache:
+        print(f"   Cache de embeddings: {vector_store.embedding_cache.get_stats()}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
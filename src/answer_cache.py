@@ -0,0 +1,112 @@
+import time
+import logging
+import threading
+from typing import List, Dict, Any, Optional
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class SemanticAnswerCache:
+    """Cache semântico de respostas do modelo.
+
+    Guarda (embedding da pergunta, ids dos chunks recuperados, versão do
+    corpus, resposta). Uma nova pergunta reaproveita a resposta quando está a
+    até max_distance (distância de cosseno) de uma pergunta já respondida,
+    recuperou os mesmos chunks e o corpus não mudou desde então.
+    """
+
+    def __init__(self, max_distance: float = 0.05, capacity: int = 512, ttl_seconds: float = 3600):
+        self.max_distance = max_distance
+        self.capacity = capacity
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: List[Dict[str, Any]] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._corpus_version: Optional[str] = None
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'saved_latency_seconds': 0.0}
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _sync_version(self, corpus_version: str):
+        """Descarta todas as entradas quando o corpus muda"""
+        if corpus_version != self._corpus_version:
+            if self._entries:
+                self._stats['invalidations'] += 1
+                logger.info("Corpus alterado: cache semântico de respostas invalidado")
+            self._entries = []
+            self._matrix = None
+            self._corpus_version = corpus_version
+
+    def _drop_expired(self):
+        if not self.ttl_seconds or not self._entries:
+            return
+        now = time.monotonic()
+        alive = [i for i, entry in enumerate(self._entries) if now - entry['created_at'] <= self.ttl_seconds]
+        if len(alive) != len(self._entries):
+            self._entries = [self._entries[i] for i in alive]
+            self._matrix = self._matrix[alive] if alive else None
+
+    def lookup(self, query_embedding, chunk_ids: List[str], corpus_version: str) -> Optional[Dict[str, Any]]:
+        """Retorna a resposta em cache mais próxima, ou None"""
+        query = self._normalize(query_embedding)
+        with self._lock:
+            self._sync_version(corpus_version)
+            self._drop_expired()
+            if self._matrix is not None:
+                distances = 1.0 - self._matrix @ query
+                # Candidatos dentro do raio, do mais próximo para o mais distante
+                for index in np.argsort(distances):
+                    if distances[index] > self.max_distance:
+                        break
+                    entry = self._entries[index]
+                    if entry['chunk_ids'] == sorted(chunk_ids):
+                        self._stats['hits'] += 1
+                        self._stats['saved_latency_seconds'] += entry['latency']
+                        return {'result': dict(entry['result']), 'distance': float(distances[index])}
+            self._stats['misses'] += 1
+            return None
+
+    def store(self, query_embedding, chunk_ids: List[str], corpus_version: str,
+              result: Dict[str, Any], latency: float):
+        """Guarda uma resposta gerada pelo modelo"""
+        if self.capacity <= 0:
+            return
+        query = self._normalize(query_embedding)
+        with self._lock:
+            self._sync_version(corpus_version)
+            self._entries.append({
+                'chunk_ids': sorted(chunk_ids),
+                'result': dict(result),
+                'latency': latency,
+                'created_at': time.monotonic()
+            })
+            row = query[np.newaxis, :]
+            self._matrix = row if self._matrix is None else np.vstack([self._matrix, row])
+            if len(self._entries) > self.capacity:
+                # Remove as entradas mais antigas
+                excess = len(self._entries) - self.capacity
+                self._entries = self._entries[excess:]
+                self._matrix = self._matrix[excess:]
+
+    def invalidate(self):
+        with self._lock:
+            if self._entries:
+                self._stats['invalidations'] += 1
+            self._entries = []
+            self._matrix = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['saved_latency_seconds'] = round(stats['saved_latency_seconds'], 3)
+        stats['max_distance'] = self.max_distance
+        stats['capacity'] = self.capacity
+        return stats
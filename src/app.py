@@ -1,7 +1,8 @@
 import os
 import sys
+import json
 import logging
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 import traceback
 
@@ -13,6 +14,11 @@ from config.settings import Config
 from src.document_processor import DocumentProcessor
 from src.vector_store import VectorStore
 from src.bedrock_agent import BedrockAgent
+from src.answer_cache import SemanticAnswerCache
+from src.bedrock_client import configure_from_settings, get_client_factory
+from src.ingestion_jobs import IngestionJobManager, ingest_directory
+from src.metadata_index import parse_filters
+from src.request_params import number_param, bool_param
 
 # Configuração de logging
 logging.basicConfig(
@@ -32,14 +38,19 @@ config = Config()
 document_processor = None
 vector_store = None
 bedrock_agent = None
+job_manager = None
 
 def initialize_components():
     """Inicializa todos os componentes do sistema"""
-    global document_processor, vector_store, bedrock_agent
+    global document_processor, vector_store, bedrock_agent, job_manager
     
     try:
         logger.info("Inicializando componentes do sistema...")
         
+        # Cliente Bedrock compartilhado entre Vector Store e Agent
+        client_factory = configure_from_settings(config)
+        bedrock_client = client_factory.get_client('bedrock-runtime', region_name=config.AWS_REGION)
+        
         # Document Processor
         document_processor = DocumentProcessor(
             chunk_size=config.CHUNK_SIZE,
@@ -50,7 +61,36 @@ def initialize_components():
         vector_store = VectorStore(
             aws_region=config.AWS_REGION,
             embedding_model_id=config.BEDROCK_EMBEDDING_MODEL_ID,
-            vector_store_path=config.VECTOR_STORE_PATH
+            vector_store_path=config.VECTOR_STORE_PATH,
+            embedding_concurrency=config.EMBEDDING_CONCURRENCY,
+            embedding_batch_size=config.EMBEDDING_BATCH_SIZE,
+            embedding_backend=config.EMBEDDING_BACKEND,
+            fake_embedding_latency=config.FAKE_EMBEDDING_LATENCY,
+            fake_embedding_size=config.FAKE_EMBEDDING_SIZE,
+            embedding_cache_path=config.EMBEDDING_CACHE_PATH,
+            embedding_cache_max_entries=config.EMBEDDING_CACHE_MAX_ENTRIES,
+            query_cache_size=config.QUERY_CACHE_SIZE,
+            query_cache_ttl=config.QUERY_CACHE_TTL,
+            bedrock_client=bedrock_client,
+            index_mmap=config.INDEX_MMAP,
+            index_type=config.INDEX_TYPE,
+            index_nprobe=config.INDEX_NPROBE,
+            index_ef_search=config.INDEX_EF_SEARCH,
+            index_rerank_factor=config.INDEX_RERANK_FACTOR,
+            index_retrain_factor=config.INDEX_RETRAIN_FACTOR,
+            index_metric=config.INDEX_METRIC,
+            filter_exact_max=config.INDEX_FILTER_EXACT_MAX,
+            hybrid_search=config.HYBRID_SEARCH,
+            hybrid_rrf_k=config.HYBRID_RRF_K,
+            hybrid_candidate_factor=config.HYBRID_CANDIDATE_FACTOR,
+            mmr_lambda=config.MMR_LAMBDA,
+            mmr_candidate_factor=config.MMR_CANDIDATE_FACTOR,
+            embedding_dimensions=config.EMBEDDING_DIMENSIONS,
+            wal_enabled=config.WAL_ENABLED,
+            wal_checkpoint_interval=config.WAL_CHECKPOINT_INTERVAL,
+            wal_checkpoint_bytes=config.WAL_CHECKPOINT_BYTES,
+            keep_index_versions=config.INDEX_KEEP_VERSIONS,
+            version_check_interval=config.INDEX_VERSION_CHECK_INTERVAL
         )
         
         # Bedrock Agent
@@ -61,7 +101,21 @@ def initialize_components():
         bedrock_agent = BedrockAgent(
             aws_region=config.AWS_REGION,
             model_id=config.BEDROCK_MODEL_ID,
-            agent_instructions_path=agent_instructions_path
+            agent_instructions_path=agent_instructions_path,
+            bedrock_client=bedrock_client,
+            merge_adjacent_chunks=config.MERGE_ADJACENT_CHUNKS,
+            chunk_overlap=config.CHUNK_OVERLAP,
+            answer_cache=SemanticAnswerCache(
+                max_distance=config.ANSWER_CACHE_MAX_DISTANCE,
+                capacity=config.ANSWER_CACHE_SIZE,
+                ttl_seconds=config.ANSWER_CACHE_TTL
+            ) if config.ANSWER_CACHE_ENABLED else None
+        )
+        
+        # Fila de ingestões em background (/documents/upload + /jobs)
+        job_manager = IngestionJobManager(
+            max_workers=config.INGESTION_JOB_WORKERS,
+            max_history=config.INGESTION_JOB_HISTORY
         )
         
         logger.info("Componentes inicializados com sucesso")
@@ -72,6 +126,27 @@ def initialize_components():
         logger.error(traceback.format_exc())
         return False
 
+def _search_params(data, default_threshold=None):
+    """Parâmetros de busca comuns a /chat e /search/batch, validados (ValueError com a mensagem)"""
+    return {
+        'k': number_param(data, 'max_results', config.MAX_SEARCH_RESULTS, integer=True, minimum=1),
+        'score_threshold': number_param(data, 'similarity_threshold', default_threshold, minimum=-1, maximum=1),
+        'nprobe': number_param(data, 'nprobe', integer=True, minimum=1),
+        'ef_search': number_param(data, 'ef_search', integer=True, minimum=1),
+        'filters': parse_filters(data.get('filters'))
+    }
+
+def _chat_search_params(data):
+    """Parâmetros de busca do /chat e /chat/stream, incluindo os modos de busca"""
+    params = _search_params(data, config.SIMILARITY_THRESHOLD)
+    params.update({
+        'range_search': bool_param(data, 'range_search', config.RANGE_SEARCH),
+        'hybrid': bool_param(data, 'hybrid', config.HYBRID_SEARCH),
+        'mmr': bool_param(data, 'mmr', config.MMR_ENABLED),
+        'mmr_lambda': number_param(data, 'mmr_lambda', minimum=0, maximum=1)
+    })
+    return params
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Endpoint de verificação de saúde"""
@@ -125,20 +200,33 @@ def chat():
             }), 400
         
         # Parâmetros opcionais
-        max_results = data.get('max_results', config.MAX_SEARCH_RESULTS)
-        similarity_threshold = data.get('similarity_threshold', config.SIMILARITY_THRESHOLD)
+        try:
+            search_params = _chat_search_params(data)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
         
         logger.info(f"Processando mensagem: {user_message[:100]}...")
         
+        # Embedding da pergunta gerado uma vez, para a busca e para o cache de respostas
+        query_embedding = vector_store.embed_query(user_message)
+        
         # Busca documentos relevantes
         relevant_documents = vector_store.search_similar_documents(
             query=user_message,
-            k=max_results,
-            score_threshold=similarity_threshold
+            query_embedding=query_embedding,
+            **search_params
         )
         
         # Processa mensagem com o agente
-        result = bedrock_agent.process_message(user_message, relevant_documents)
+        result = bedrock_agent.process_message(
+            user_message,
+            relevant_documents,
+            query_embedding=query_embedding,
+            corpus_version=vector_store.corpus_version
+        )
         
         # Adiciona informações extras à resposta
         result['search_results_count'] = len(relevant_documents)
@@ -154,52 +242,278 @@ def chat():
             "error": f"Erro interno do servidor: {str(e)}"
         }), 500
 
-@app.route('/documents/upload', methods=['POST'])
-def upload_documents():
-    """Endpoint para reprocessar documentos"""
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Chat com resposta em streaming (Server-Sent Events)"""
+    if not all([document_processor, vector_store, bedrock_agent]):
+        return jsonify({
+            "success": False,
+            "error": "Sistema não inicializado corretamente"
+        }), 500
+    
+    data = request.get_json(silent=True)
+    if not data or not str(data.get('message', '')).strip():
+        return jsonify({
+            "success": False,
+            "error": "Campo 'message' é obrigatório"
+        }), 400
+    
+    user_message = data['message'].strip()
     try:
-        if not all([document_processor, vector_store]):
+        search_params = _chat_search_params(data)
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 400
+    
+    logger.info(f"Processando mensagem (streaming): {user_message[:100]}...")
+    
+    # A busca acontece antes de abrir o stream para que erros virem respostas HTTP normais
+    query_embedding = vector_store.embed_query(user_message)
+    relevant_documents = vector_store.search_similar_documents(
+        query=user_message,
+        query_embedding=query_embedding,
+        **search_params
+    )
+    corpus_version = vector_store.corpus_version
+    
+    def generate():
+        try:
+            for event in bedrock_agent.stream_message(user_message, relevant_documents,
+                                                      query_embedding=query_embedding,
+                                                      corpus_version=corpus_version):
+                if event['type'] == 'done':
+                    event['search_results_count'] = len(relevant_documents)
+                yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            logger.error(f"Erro no streaming: {str(e)}")
+            logger.error(traceback.format_exc())
+            error = {"type": "error", "success": False, "error": f"Erro interno do servidor: {str(e)}"}
+            yield f"event: error\ndata: {json.dumps(error, ensure_ascii=False)}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/search/batch', methods=['POST'])
+def search_batch():
+    """Endpoint de busca (sem gerar respostas) para várias consultas de uma vez"""
+    try:
+        if not vector_store:
             return jsonify({
                 "success": False,
                 "error": "Sistema não inicializado corretamente"
             }), 500
         
-        logger.info("Iniciando reprocessamento de documentos...")
+        data = request.get_json(silent=True) or {}
+        queries = data.get('queries')
+        if not isinstance(queries, list) or not queries or \
+                not all(isinstance(query, str) and query.strip() for query in queries):
+            return jsonify({
+                "success": False,
+                "error": "Campo 'queries' deve ser uma lista de consultas não vazias"
+            }), 400
+        if len(queries) > config.SEARCH_BATCH_MAX_QUERIES:
+            return jsonify({
+                "success": False,
+                "error": f"Máximo de {config.SEARCH_BATCH_MAX_QUERIES} consultas por requisição"
+            }), 400
+        try:
+            search_params = _search_params(data)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
         
-        # Processa documentos do diretório
-        documents = document_processor.process_documents_directory(config.DOCUMENTS_PATH)
+        queries = [query.strip() for query in queries]
+        results = vector_store.search_batch(queries, **search_params)
         
-        if not documents:
+        return jsonify({
+            "success": True,
+            "results": [
+                {
+                    "query": query,
+                    "documents": [
+                        {
+                            "id": doc.id,
+                            "content": doc.page_content,
+                            "metadata": doc.metadata,
+                            "score": score
+                        }
+                        for doc, score in documents
+                    ]
+                }
+                for query, documents in zip(queries, results)
+            ]
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Erro na busca em lote: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({
+            "success": False,
+            "error": f"Erro na busca em lote: {str(e)}"
+        }), 500
+
+@app.route('/documents/upload', methods=['POST'])
+def upload_documents():
+    """Endpoint para reprocessar documentos (em background; acompanhe em /jobs/<id>)"""
+    try:
+        if not all([document_processor, vector_store, job_manager]):
+            return jsonify({
+                "success": False,
+                "error": "Sistema não inicializado corretamente"
+            }), 500
+        
+        has_documents = os.path.isdir(config.DOCUMENTS_PATH) and \
+            bool(document_processor.list_supported_files(config.DOCUMENTS_PATH))
+        if not has_documents and not vector_store.manifest.files:
             return jsonify({
                 "success": False,
                 "error": "Nenhum documento encontrado ou processado",
                 "documents_path": config.DOCUMENTS_PATH
             }), 400
         
-        # Limpa vector store existente
-        vector_store.clear_vector_store()
+        data = request.get_json(silent=True) or {}
+        try:
+            workers = number_param(data, 'workers', config.INGESTION_WORKERS, integer=True, minimum=1)
+            full = bool_param(data, 'full', False)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+        # Sem manifesto não sabemos o que já está indexado: reconstrói tudo
+        full_rebuild = full or not vector_store.manifest.exists()
+        
+        job = job_manager.submit(
+            lambda job: run_ingestion_job(job, full_rebuild, workers),
+            params={"full_rebuild": full_rebuild, "workers": workers, "documents_path": config.DOCUMENTS_PATH}
+        )
+        
+        return jsonify({
+            "success": True,
+            "message": "Reprocessamento de documentos iniciado",
+            "job_id": job.job_id,
+            "status_url": f"/jobs/{job.job_id}",
+            "full_rebuild": full_rebuild
+        }), 202
+        
+    except Exception as e:
+        logger.error(f"Erro no upload de documentos: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({
+            "success": False,
+            "error": f"Erro ao processar documentos: {str(e)}"
+        }), 500
+
+def run_ingestion_job(job, full_rebuild: bool, workers: int):
+    """Executa a ingestão de um job (thread do job manager)"""
+    logger.info(f"Iniciando reprocessamento de documentos "
+                f"({'completo' if full_rebuild else 'incremental'}, {workers} processos)...")
+    try:
+        result = ingest_directory(vector_store, document_processor, config.DOCUMENTS_PATH,
+                                  full_rebuild=full_rebuild, workers=workers, progress=job)
+    finally:
+        # Respostas em cache podem citar conteúdo que mudou (mesmo em ingestão interrompida)
+        if bedrock_agent and bedrock_agent.answer_cache and (job.chunks_embedded or job.files_done):
+            bedrock_agent.answer_cache.invalidate()
+    
+    logger.info(f"Reprocessamento concluído: {result['ingestion']}")
+    result["documents_path"] = config.DOCUMENTS_PATH
+    return result
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    """Endpoint para listar os jobs de ingestão recentes"""
+    if not job_manager:
+        return jsonify({"success": False, "error": "Sistema não inicializado corretamente"}), 500
+    return jsonify({"jobs": job_manager.list_jobs()}), 200
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Endpoint para acompanhar o progresso de um job de ingestão"""
+    job = job_manager.get(job_id) if job_manager else None
+    if job is None:
+        return jsonify({"success": False, "error": f"Job não encontrado: {job_id}"}), 404
+    return jsonify(job.to_dict()), 200
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Endpoint para cancelar um job de ingestão"""
+    job = job_manager.cancel(job_id) if job_manager else None
+    if job is None:
+        return jsonify({"success": False, "error": f"Job não encontrado: {job_id}"}), 404
+    return jsonify(job.to_dict()), 202
+
+@app.route('/documents/<path:file_name>', methods=['DELETE'])
+def delete_document(file_name):
+    """Endpoint para remover do índice todos os chunks de um arquivo"""
+    try:
+        if not vector_store:
+            return jsonify({
+                "success": False,
+                "error": "Sistema não inicializado corretamente"
+            }), 500
         
-        # Adiciona novos documentos
-        vector_store.add_documents(documents)
+        removed = vector_store.delete_by_source(file_name)
+        if removed == 0:
+            return jsonify({
+                "success": False,
+                "error": f"Nenhum chunk encontrado para {file_name}"
+            }), 404
         
-        # Salva vector store
         vector_store.save_vector_store()
+        if bedrock_agent and bedrock_agent.answer_cache:
+            bedrock_agent.answer_cache.invalidate()
         
-        logger.info(f"Reprocessamento concluído: {len(documents)} chunks")
+        return jsonify({
+            "success": True,
+            "file_name": file_name,
+            "chunks_removed": removed
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Erro ao remover documento: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": f"Erro ao remover documento: {str(e)}"
+        }), 500
+
+@app.route('/index/rollback', methods=['POST'])
+def rollback_index():
+    """Endpoint para voltar à versão anterior do índice"""
+    try:
+        if not vector_store:
+            return jsonify({
+                "success": False,
+                "error": "Sistema não inicializado corretamente"
+            }), 500
+        
+        version = vector_store.rollback_version()
+        if bedrock_agent and bedrock_agent.answer_cache:
+            bedrock_agent.answer_cache.invalidate()
         
         return jsonify({
             "success": True,
-            "message": "Documentos reprocessados com sucesso",
-            "documents_processed": len(documents),
-            "documents_path": config.DOCUMENTS_PATH
+            "index_version": version,
+            "versions": vector_store.list_versions()
         }), 200
         
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 409
     except Exception as e:
-        logger.error(f"Erro no upload de documentos: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.error(f"Erro no rollback do índice: {str(e)}")
         return jsonify({
             "success": False,
-            "error": f"Erro ao processar documentos: {str(e)}"
+            "error": f"Erro no rollback do índice: {str(e)}"
         }), 500
 
 @app.route('/status', methods=['GET'])
@@ -220,6 +534,8 @@ def get_status():
         if bedrock_agent:
             status["agent"] = bedrock_agent.get_agent_info()
         
+        status["bedrock_clients"] = get_client_factory().get_stats()
+        
         return jsonify(status), 200
         
     except Exception as e:
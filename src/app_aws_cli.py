@@ -9,7 +9,6 @@ import logging
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import traceback
-import boto3
 
 # Adiciona o diretório raiz ao path
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -18,6 +17,10 @@ sys.path.insert(0, project_root)
 # Usar configuração que pega credenciais da AWS CLI
 from config.settings_aws_cli import Config as config
 from src.document_processor import DocumentProcessor
+from src.bedrock_client import configure_from_settings, get_client_factory
+from src.ingestion_jobs import IngestionJobManager
+from src.metadata_index import parse_filters
+from src.request_params import number_param
 
 # Configuração de logging
 logging.basicConfig(
@@ -34,6 +37,7 @@ CORS(app)
 document_processor = None
 vector_store = None
 bedrock_agent = None
+job_manager = None
 
 def check_aws_credentials():
     """Verifica e exibe credenciais AWS"""
@@ -55,13 +59,7 @@ def check_aws_credentials():
     
     # Testar credenciais com STS
     try:
-        sts_client = boto3.client(
-            'sts',
-            region_name=config.AWS_REGION,
-            aws_access_key_id=config.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=config.AWS_SECRET_ACCESS_KEY,
-            aws_session_token=config.AWS_SESSION_TOKEN
-        )
+        sts_client = create_boto3_client('sts')
         
         identity = sts_client.get_caller_identity()
         logger.info(f"✅ Credenciais válidas - User: {identity.get('Arn', 'N/A')}")
@@ -74,8 +72,8 @@ def check_aws_credentials():
         return False
 
 def create_boto3_client(service_name, region=None):
-    """Cria cliente boto3 com credenciais explícitas"""
-    return boto3.client(
+    """Obtém cliente boto3 compartilhado com credenciais explícitas"""
+    return get_client_factory().get_client(
         service_name,
         region_name=region or config.AWS_REGION,
         aws_access_key_id=config.AWS_ACCESS_KEY_ID,
@@ -85,11 +83,14 @@ def create_boto3_client(service_name, region=None):
 
 def initialize_components():
     """Inicializa componentes do sistema"""
-    global document_processor, vector_store, bedrock_agent
+    global document_processor, vector_store, bedrock_agent, job_manager
     
     try:
         logger.info("Inicializando componentes do sistema...")
         
+        # Pool de clientes compartilhado (configurado antes de qualquer cliente)
+        configure_from_settings(config)
+        
         # Verificar credenciais AWS primeiro
         if not check_aws_credentials():
             logger.error("❌ Credenciais AWS inválidas")
@@ -112,7 +113,35 @@ def initialize_components():
             vector_store_path=config.VECTOR_STORE_PATH,
             aws_access_key_id=config.AWS_ACCESS_KEY_ID,
             aws_secret_access_key=config.AWS_SECRET_ACCESS_KEY,
-            aws_session_token=config.AWS_SESSION_TOKEN
+            aws_session_token=config.AWS_SESSION_TOKEN,
+            embedding_concurrency=config.EMBEDDING_CONCURRENCY,
+            embedding_batch_size=config.EMBEDDING_BATCH_SIZE,
+            embedding_backend=config.EMBEDDING_BACKEND,
+            fake_embedding_latency=config.FAKE_EMBEDDING_LATENCY,
+            fake_embedding_size=config.FAKE_EMBEDDING_SIZE,
+            embedding_cache_path=config.EMBEDDING_CACHE_PATH,
+            embedding_cache_max_entries=config.EMBEDDING_CACHE_MAX_ENTRIES,
+            query_cache_size=config.QUERY_CACHE_SIZE,
+            query_cache_ttl=config.QUERY_CACHE_TTL,
+            bedrock_client=create_boto3_client('bedrock-runtime'),
+            index_mmap=config.INDEX_MMAP,
+            index_type=config.INDEX_TYPE,
+            index_nprobe=config.INDEX_NPROBE,
+            index_ef_search=config.INDEX_EF_SEARCH,
+            index_rerank_factor=config.INDEX_RERANK_FACTOR,
+            index_retrain_factor=config.INDEX_RETRAIN_FACTOR,
+            index_metric=config.INDEX_METRIC,
+            filter_exact_max=config.INDEX_FILTER_EXACT_MAX,
+            hybrid_rrf_k=config.HYBRID_RRF_K,
+            hybrid_candidate_factor=config.HYBRID_CANDIDATE_FACTOR,
+            mmr_lambda=config.MMR_LAMBDA,
+            mmr_candidate_factor=config.MMR_CANDIDATE_FACTOR,
+            embedding_dimensions=config.EMBEDDING_DIMENSIONS,
+            wal_enabled=config.WAL_ENABLED,
+            wal_checkpoint_interval=config.WAL_CHECKPOINT_INTERVAL,
+            wal_checkpoint_bytes=config.WAL_CHECKPOINT_BYTES,
+            keep_index_versions=config.INDEX_KEEP_VERSIONS,
+            version_check_interval=config.INDEX_VERSION_CHECK_INTERVAL
         )
         logger.info("✅ Vector Store inicializado")
         
@@ -130,10 +159,17 @@ def initialize_components():
             agent_instructions_path=agent_instructions_path,
             aws_access_key_id=config.AWS_ACCESS_KEY_ID,
             aws_secret_access_key=config.AWS_SECRET_ACCESS_KEY,
-            aws_session_token=config.AWS_SESSION_TOKEN
+            aws_session_token=config.AWS_SESSION_TOKEN,
+            bedrock_client=create_boto3_client('bedrock-runtime')
         )
         logger.info("✅ Bedrock Agent inicializado")
         
+        # Fila de ingestões em background (/documents/upload + /jobs)
+        job_manager = IngestionJobManager(
+            max_workers=config.INGESTION_JOB_WORKERS,
+            max_history=config.INGESTION_JOB_HISTORY
+        )
+        
         logger.info("🚀 Todos os componentes inicializados com sucesso!")
         return True
         
@@ -188,6 +224,8 @@ def get_status():
                 'vector_store_path': config.VECTOR_STORE_PATH
             },
             'aws_credentials': creds,
+            'vector_store': vector_store.get_stats() if vector_store else None,
+            'bedrock_clients': get_client_factory().get_stats(),
             'initialized': all([document_processor, vector_store, bedrock_agent])
         })
     except Exception as e:
@@ -199,26 +237,33 @@ def get_status():
 
 @app.route('/documents/upload', methods=['POST'])
 def process_documents():
-    """Processa documentos"""
+    """Processa documentos em background; o progresso fica em /jobs/<id>"""
     try:
-        if not all([document_processor, vector_store]):
+        if not all([document_processor, vector_store, job_manager]):
             return jsonify({
                 'success': False,
                 'error': 'Componentes não inicializados'
             }), 500
         
-        # Processar documentos - CORREÇÃO APLICADA
-        logger.info(f"Processando documentos do diretório: {config.DOCUMENTS_PATH}")
-        documents = document_processor.process_documents_directory(config.DOCUMENTS_PATH)  # ✅ CORRIGIDO
-        
-        # Adicionar ao vector store
-        vector_store.add_documents(documents)
+        data = request.get_json(silent=True) or {}
+        try:
+            workers = number_param(data, 'workers', config.INGESTION_WORKERS, integer=True, minimum=1)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        job = job_manager.submit(
+            lambda job: run_ingestion_job(job, workers),
+            params={'workers': workers, 'documents_path': config.DOCUMENTS_PATH}
+        )
         
         return jsonify({
             'success': True,
-            'documents_processed': len(documents),
-            'message': f'Processados {len(documents)} documentos com embeddings reais'
-        })
+            'job_id': job.job_id,
+            'status_url': f'/jobs/{job.job_id}',
+            'message': 'Processamento de documentos iniciado'
+        }), 202
         
     except Exception as e:
         logger.error(f"Erro ao processar documentos: {e}")
@@ -227,6 +272,50 @@ def process_documents():
             'error': str(e)
         }), 500
 
+def run_ingestion_job(job, workers):
+    """Extrai e indexa os documentos (thread do job manager)"""
+    logger.info(f"Processando documentos do diretório: {config.DOCUMENTS_PATH}")
+    file_paths = document_processor.list_supported_files(config.DOCUMENTS_PATH)
+    job.begin_files({path: {'size': os.path.getsize(path)} for path in file_paths})
+    documents = document_processor.process_documents_directory(config.DOCUMENTS_PATH, max_workers=workers)
+    for path in file_paths:
+        job.file_done(path, os.path.getsize(path))
+    job.set_chunks_total(len(documents))
+    job.raise_if_cancelled()
+    
+    # Adicionar ao vector store (chunks já indexados são ignorados)
+    vector_store.add_documents(documents, progress=job)
+    
+    return {
+        'documents_processed': len(documents),
+        'chunks_added': job.chunks_embedded,
+        'file_timings': document_processor.last_file_timings,
+        'message': f'Processados {len(documents)} documentos com embeddings reais'
+    }
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    """Lista os jobs de ingestão recentes"""
+    if not job_manager:
+        return jsonify({'success': False, 'error': 'Componentes não inicializados'}), 500
+    return jsonify({'jobs': job_manager.list_jobs()})
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Progresso de um job de ingestão"""
+    job = job_manager.get(job_id) if job_manager else None
+    if job is None:
+        return jsonify({'success': False, 'error': f'Job não encontrado: {job_id}'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancela um job de ingestão"""
+    job = job_manager.cancel(job_id) if job_manager else None
+    if job is None:
+        return jsonify({'success': False, 'error': f'Job não encontrado: {job_id}'}), 404
+    return jsonify(job.to_dict()), 202
+
 @app.route('/chat', methods=['POST'])
 def chat():
     """Chat com o agente"""
@@ -247,11 +336,19 @@ def chat():
         
         user_message = data['message']
         max_results = data.get('max_results', config.MAX_SEARCH_RESULTS)
+        try:
+            filters = parse_filters(data.get('filters'))
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
         
         # Buscar documentos relevantes
         relevant_documents = vector_store.similarity_search(
             user_message, 
-            k=max_results
+            k=max_results,
+            filters=filters
         )
         
         # Processar com Bedrock
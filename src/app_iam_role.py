@@ -9,7 +9,6 @@ import logging
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import traceback
-import boto3
 
 # Adiciona o diretório raiz ao path
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -17,6 +16,7 @@ sys.path.insert(0, project_root)
 
 from config.settings import Config as config
 from src.document_processor import DocumentProcessor
+from src.bedrock_client import configure_from_settings, get_client_factory
 
 # Configuração de logging
 logging.basicConfig(
@@ -41,7 +41,7 @@ def check_aws_credentials():
     
     try:
         # Usar credenciais padrão (IAM Role da EC2)
-        sts_client = boto3.client('sts', region_name=config.AWS_REGION)
+        sts_client = get_client_factory().get_client('sts', region_name=config.AWS_REGION)
         identity = sts_client.get_caller_identity()
         
         logger.info(f"✅ Credenciais válidas via IAM Role")
@@ -61,7 +61,7 @@ def test_bedrock_access():
         logger.info("🧪 Testando acesso ao Bedrock...")
         
         # Testar listagem de modelos
-        bedrock_client = boto3.client('bedrock', region_name=config.AWS_REGION)
+        bedrock_client = get_client_factory().get_client('bedrock', region_name=config.AWS_REGION)
         models = bedrock_client.list_foundation_models()
         
         model_count = len(models['modelSummaries'])
@@ -89,6 +89,9 @@ def initialize_components():
     try:
         logger.info("Inicializando componentes do sistema...")
         
+        # Pool de clientes compartilhado (VectorStore e BedrockAgent usam a mesma fábrica)
+        configure_from_settings(config)
+        
         # Verificar credenciais AWS
         if not check_aws_credentials():
             logger.error("❌ Credenciais AWS inválidas")
@@ -173,7 +176,7 @@ def get_status():
     try:
         # Obter informações da identidade AWS
         try:
-            sts_client = boto3.client('sts', region_name=config.AWS_REGION)
+            sts_client = get_client_factory().get_client('sts', region_name=config.AWS_REGION)
             identity = sts_client.get_caller_identity()
             aws_info = {
                 'account': identity.get('Account'),
@@ -1,23 +1,34 @@
 import os
 import json
+import time
 import logging
-from typing import List, Dict, Any
-import boto3
+from typing import List, Dict, Any, Optional, Iterator
+from src.bedrock_client import get_client_factory
 from botocore.exceptions import ClientError
+from src.answer_cache import SemanticAnswerCache
+from src.reranking import merge_adjacent_chunks
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class BedrockAgent:
-    def __init__(self, aws_region: str, model_id: str, agent_instructions_path: str):
+    def __init__(self, aws_region: str, model_id: str, agent_instructions_path: str,
+                 answer_cache: Optional[SemanticAnswerCache] = None, bedrock_client=None,
+                 merge_adjacent_chunks: bool = True, chunk_overlap: Optional[int] = None):
         self.aws_region = aws_region
         self.model_id = model_id
         self.agent_instructions_path = agent_instructions_path
+        # Cache semântico opcional de respostas (curto-circuita a geração)
+        self.answer_cache = answer_cache
+        # Une chunks vizinhos do mesmo arquivo no prompt, sem repetir o overlap
+        self.merge_adjacent_chunks = merge_adjacent_chunks
+        self.chunk_overlap = chunk_overlap
+        # Métricas das respostas em streaming
+        self.stream_metrics = {'streams': 0, 'ttft_seconds': 0.0, 'total_seconds': 0.0, 'last_ttft_seconds': None}
         
-        # Inicializa cliente Bedrock
-        self.bedrock_client = boto3.client(
-            service_name='bedrock-runtime',
-            region_name=aws_region
+        # Cliente Bedrock compartilhado (injetado ou obtido da fábrica única)
+        self.bedrock_client = bedrock_client or get_client_factory().get_client(
+            'bedrock-runtime', region_name=aws_region
         )
         
         # Carrega instruções do agente
@@ -39,12 +50,16 @@ class BedrockAgent:
         if not documents_with_scores:
             return "Nenhum documento relevante encontrado."
         
+        if self.merge_adjacent_chunks:
+            documents_with_scores = merge_adjacent_chunks(documents_with_scores, self.chunk_overlap)
+        
         context_parts = []
         context_parts.append("=== CONTEXTO DOS DOCUMENTOS ===\n")
         
         for i, (doc, score) in enumerate(documents_with_scores, 1):
             source = doc.metadata.get('source', 'Documento desconhecido')
-            chunk_id = doc.metadata.get('chunk_id', 'N/A')
+            chunk_ids = doc.metadata.get('chunk_ids')
+            chunk_id = f"{chunk_ids[0]}-{chunk_ids[-1]}" if chunk_ids else doc.metadata.get('chunk_id', 'N/A')
             
             context_parts.append(f"[DOCUMENTO {i}]")
             context_parts.append(f"Fonte: {source}")
@@ -76,37 +91,38 @@ Resposta:"""
         
         return prompt
     
+    def _build_request_body(self, prompt: str) -> Dict[str, Any]:
+        """Monta o corpo da requisição de acordo com o modelo"""
+        # Configuração específica para Claude
+        if "claude" in self.model_id.lower():
+            return {
+                "anthropic_version": "bedrock-2023-05-31",
+                "max_tokens": 4000,
+                "temperature": 0.1,
+                "top_p": 0.9,
+                "messages": [
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ]
+            }
+        # Configuração genérica para outros modelos
+        return {
+            "inputText": prompt,
+            "textGenerationConfig": {
+                "maxTokenCount": 4000,
+                "temperature": 0.1,
+                "topP": 0.9
+            }
+        }
+    
     def _call_bedrock_model(self, prompt: str) -> str:
         """Chama o modelo Bedrock com o prompt"""
         try:
-            # Configuração específica para Claude
-            if "claude" in self.model_id.lower():
-                body = {
-                    "anthropic_version": "bedrock-2023-05-31",
-                    "max_tokens": 4000,
-                    "temperature": 0.1,
-                    "top_p": 0.9,
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ]
-                }
-            else:
-                # Configuração genérica para outros modelos
-                body = {
-                    "inputText": prompt,
-                    "textGenerationConfig": {
-                        "maxTokenCount": 4000,
-                        "temperature": 0.1,
-                        "topP": 0.9
-                    }
-                }
-            
             response = self.bedrock_client.invoke_model(
                 modelId=self.model_id,
-                body=json.dumps(body),
+                body=json.dumps(self._build_request_body(prompt)),
                 contentType='application/json'
             )
             
@@ -125,9 +141,134 @@ Resposta:"""
             logger.error(f"Erro inesperado: {str(e)}")
             return f"Erro inesperado: {str(e)}"
     
-    def process_message(self, user_message: str, relevant_documents: List[tuple]) -> Dict[str, Any]:
-        """Processa uma mensagem do usuário com contexto de documentos"""
+    def _stream_bedrock_model(self, prompt: str) -> Iterator[str]:
+        """Chama o modelo com invoke_model_with_response_stream e emite os trechos de texto"""
+        response = self.bedrock_client.invoke_model_with_response_stream(
+            modelId=self.model_id,
+            body=json.dumps(self._build_request_body(prompt)),
+            contentType='application/json'
+        )
+        
+        for event in response['body']:
+            chunk = event.get('chunk')
+            if not chunk:
+                continue
+            payload = json.loads(chunk['bytes'])
+            
+            if "claude" in self.model_id.lower():
+                if payload.get('type') == 'content_block_delta':
+                    text = payload.get('delta', {}).get('text', '')
+                    if text:
+                        yield text
+            else:
+                text = payload.get('outputText', '')
+                if text:
+                    yield text
+    
+    def stream_message(self, user_message: str, relevant_documents: List[tuple],
+                       query_embedding=None, corpus_version: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Processa uma mensagem emitindo eventos à medida que o modelo gera a resposta.
+        
+        Emite eventos {'type': 'token', 'text': ...} e, ao final, um evento
+        {'type': 'done', ...} com fontes e métricas (tempo até o primeiro
+        token e tempo total), ou {'type': 'error', ...} em caso de falha.
+        """
+        start = time.perf_counter()
+        sources = list(set([
+            doc.metadata.get('source', 'Desconhecido')
+            for doc, _ in relevant_documents
+        ]))
+        summary = {
+            "type": "done",
+            "success": True,
+            "sources": sources,
+            "documents_used": len(relevant_documents),
+            "model_id": self.model_id,
+            "cached": False
+        }
+        
+        use_cache = self.answer_cache is not None and query_embedding is not None and corpus_version
+        if use_cache:
+            chunk_ids = self._document_chunk_ids(relevant_documents)
+            cached = self.answer_cache.lookup(query_embedding, chunk_ids, corpus_version)
+            if cached:
+                yield {"type": "token", "text": cached['result']['response']}
+                summary.update({"cached": True, "cache_distance": round(cached['distance'], 4),
+                                "time_to_first_token": round(time.perf_counter() - start, 4),
+                                "total_time": round(time.perf_counter() - start, 4)})
+                yield summary
+                return
+        
+        context = self._format_context_from_documents(relevant_documents)
+        prompt = self._build_prompt(user_message, context)
+        
+        parts = []
+        time_to_first_token = None
         try:
+            for text in self._stream_bedrock_model(prompt):
+                if time_to_first_token is None:
+                    time_to_first_token = time.perf_counter() - start
+                parts.append(text)
+                yield {"type": "token", "text": text}
+        except ClientError as e:
+            logger.error(f"Erro do cliente AWS no streaming: {str(e)}")
+            yield {"type": "error", "success": False, "error": f"Erro ao processar sua solicitação: {str(e)}"}
+            return
+        except Exception as e:
+            logger.error(f"Erro inesperado no streaming: {str(e)}")
+            yield {"type": "error", "success": False, "error": f"Erro inesperado: {str(e)}"}
+            return
+        
+        total_time = time.perf_counter() - start
+        self._record_stream_metrics(time_to_first_token, total_time)
+        summary.update({
+            "time_to_first_token": round(time_to_first_token, 4) if time_to_first_token is not None else None,
+            "total_time": round(total_time, 4)
+        })
+        
+        if use_cache:
+            result = {key: value for key, value in summary.items() if key != "type"}
+            result["response"] = "".join(parts)
+            self.answer_cache.store(query_embedding, chunk_ids, corpus_version, result, total_time)
+        
+        yield summary
+    
+    def _record_stream_metrics(self, time_to_first_token: Optional[float], total_time: float):
+        """Acumula métricas de streaming (tempo até o primeiro token)"""
+        metrics = self.stream_metrics
+        metrics['streams'] += 1
+        metrics['total_seconds'] += total_time
+        if time_to_first_token is not None:
+            metrics['ttft_seconds'] += time_to_first_token
+            metrics['last_ttft_seconds'] = round(time_to_first_token, 4)
+    
+    def _document_chunk_ids(self, relevant_documents: List[tuple]) -> List[str]:
+        """Identificadores dos chunks recuperados, usados como chave do cache de respostas"""
+        return [
+            doc.id or f"{doc.metadata.get('source', '')}:{doc.metadata.get('chunk_id', '')}"
+            for doc, _ in relevant_documents
+        ]
+    
+    def process_message(self, user_message: str, relevant_documents: List[tuple],
+                        query_embedding=None, corpus_version: Optional[str] = None) -> Dict[str, Any]:
+        """Processa uma mensagem do usuário com contexto de documentos.
+        
+        Com query_embedding e corpus_version, consulta o cache semântico de
+        respostas antes de chamar o modelo.
+        """
+        try:
+            use_cache = self.answer_cache is not None and query_embedding is not None and corpus_version
+            if use_cache:
+                chunk_ids = self._document_chunk_ids(relevant_documents)
+                cached = self.answer_cache.lookup(query_embedding, chunk_ids, corpus_version)
+                if cached:
+                    result = cached['result']
+                    result['cached'] = True
+                    result['cache_distance'] = round(cached['distance'], 4)
+                    return result
+            
+            start = time.perf_counter()
+            
             # Formata contexto dos documentos
             context = self._format_context_from_documents(relevant_documents)
             
@@ -143,14 +284,21 @@ Resposta:"""
                 for doc, _ in relevant_documents
             ]))
             
-            return {
+            result = {
                 "success": True,
                 "response": response,
                 "sources": sources,
                 "documents_used": len(relevant_documents),
-                "model_id": self.model_id
+                "model_id": self.model_id,
+                "cached": False
             }
             
+            if use_cache and not self._is_error_response(response):
+                self.answer_cache.store(query_embedding, chunk_ids, corpus_version, result,
+                                        time.perf_counter() - start)
+            
+            return result
+            
         except Exception as e:
             logger.error(f"Erro ao processar mensagem: {str(e)}")
             return {
@@ -159,11 +307,27 @@ Resposta:"""
                 "response": "Desculpe, ocorreu um erro ao processar sua solicitação."
             }
     
+    def _is_error_response(self, response: str) -> bool:
+        """_call_bedrock_model devolve erros como texto; eles não devem ir para o cache"""
+        return response.startswith(("Erro ao processar sua solicitação:", "Erro inesperado:"))
+    
     def get_agent_info(self) -> Dict[str, Any]:
         """Retorna informações sobre o agente"""
         return {
             "model_id": self.model_id,
             "aws_region": self.aws_region,
             "instructions_loaded": bool(self.agent_instructions),
-            "instructions_length": len(self.agent_instructions) if self.agent_instructions else 0
+            "instructions_length": len(self.agent_instructions) if self.agent_instructions else 0,
+            "answer_cache": self.answer_cache.get_stats() if self.answer_cache else None,
+            "streaming": self._get_stream_stats()
+        }
+    
+    def _get_stream_stats(self) -> Dict[str, Any]:
+        metrics = self.stream_metrics
+        streams = metrics['streams']
+        return {
+            "streams": streams,
+            "avg_time_to_first_token": round(metrics['ttft_seconds'] / streams, 4) if streams else None,
+            "avg_total_time": round(metrics['total_seconds'] / streams, 4) if streams else None,
+            "last_time_to_first_token": metrics['last_ttft_seconds']
         }
@@ -2,7 +2,7 @@ import os
 import json
 import logging
 from typing import List, Dict, Any
-import boto3
+from src.bedrock_client import get_client_factory
 from botocore.exceptions import ClientError
 
 logging.basicConfig(level=logging.INFO)
@@ -10,14 +10,15 @@ logger = logging.getLogger(__name__)
 
 class BedrockAgentAWSCLI:
     def __init__(self, aws_region: str, model_id: str, agent_instructions_path: str,
-                 aws_access_key_id: str, aws_secret_access_key: str, aws_session_token: str):
+                 aws_access_key_id: str, aws_secret_access_key: str, aws_session_token: str,
+                 bedrock_client=None):
         self.aws_region = aws_region
         self.model_id = model_id
         self.agent_instructions_path = agent_instructions_path
         
-        # Inicializa cliente Bedrock com credenciais explícitas
-        self.bedrock_client = boto3.client(
-            service_name='bedrock-runtime',
+        # Cliente Bedrock compartilhado, com credenciais explícitas
+        self.bedrock_client = bedrock_client or get_client_factory().get_client(
+            'bedrock-runtime',
             region_name=aws_region,
             aws_access_key_id=aws_access_key_id,
             aws_secret_access_key=aws_secret_access_key,
@@ -0,0 +1,134 @@
+import logging
+import threading
+from typing import Dict, Any, Optional, Tuple
+import boto3
+from botocore.config import Config as BotoConfig
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class BedrockClientFactory:
+    """Fábrica única de clientes boto3 compartilhados entre os componentes.
+
+    Cada combinação (serviço, região, credenciais) recebe um único cliente,
+    configurado com pool de conexões maior, keep-alive TCP, retries
+    adaptativos e timeouts explícitos. Clientes boto3 são thread-safe, então
+    VectorStore e BedrockAgent podem usar o mesmo pool de conexões.
+    """
+
+    def __init__(self, max_pool_connections: int = 50, connect_timeout: float = 5,
+                 read_timeout: float = 120, max_attempts: int = 5, retry_mode: str = 'adaptive',
+                 tcp_keepalive: bool = True):
+        self.max_pool_connections = max_pool_connections
+        self.boto_config = BotoConfig(
+            max_pool_connections=max_pool_connections,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            retries={'mode': retry_mode, 'max_attempts': max_attempts},
+            tcp_keepalive=tcp_keepalive
+        )
+        self._clients: Dict[Tuple, Any] = {}
+        self._metrics: Dict[Tuple, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def get_client(self, service_name: str = 'bedrock-runtime', region_name: Optional[str] = None,
+                   aws_access_key_id: Optional[str] = None, aws_secret_access_key: Optional[str] = None,
+                   aws_session_token: Optional[str] = None):
+        """Retorna o cliente compartilhado para o serviço/região/credenciais"""
+        key = (service_name, region_name, aws_access_key_id, aws_session_token)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = boto3.client(
+                    service_name,
+                    region_name=region_name,
+                    aws_access_key_id=aws_access_key_id,
+                    aws_secret_access_key=aws_secret_access_key,
+                    aws_session_token=aws_session_token,
+                    config=self.boto_config
+                )
+                self._metrics[key] = {'requests': 0, 'in_flight': 0, 'peak_in_flight': 0, 'errors': 0}
+                self._register_metrics(client, self._metrics[key])
+                self._clients[key] = client
+                logger.info(f"Cliente {service_name} criado (pool de {self.max_pool_connections} conexões)")
+            return client
+
+    def _register_metrics(self, client, metrics: Dict[str, int]):
+        """Conta requisições em andamento via eventos do botocore"""
+        lock = self._lock
+
+        def before_send(**kwargs):
+            with lock:
+                metrics['requests'] += 1
+                metrics['in_flight'] += 1
+                metrics['peak_in_flight'] = max(metrics['peak_in_flight'], metrics['in_flight'])
+            # Retornar None mantém o envio normal da requisição
+
+        def response_received(exception=None, response_dict=None, **kwargs):
+            with lock:
+                metrics['in_flight'] -= 1
+                status = (response_dict or {}).get('status_code', 0)
+                if exception is not None or status >= 400:
+                    metrics['errors'] += 1
+
+        client.meta.events.register('before-send', before_send)
+        client.meta.events.register('response-received', response_received)
+
+    def _connection_pool_stats(self, client) -> Dict[str, int]:
+        """Lê o estado dos pools do urllib3 (conexões em uso / abertas)"""
+        stats = {'connections_in_use': 0, 'connections_opened': 0}
+        try:
+            manager = client._endpoint.http_session._manager
+            for pool_key in list(manager.pools.keys()):
+                pool = manager.pools[pool_key]
+                stats['connections_in_use'] += pool.maxsize - pool.pool.qsize()
+                stats['connections_opened'] += pool.num_connections
+        except Exception:
+            # Atributos internos do urllib3/botocore podem mudar entre versões
+            pass
+        return stats
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Métricas de uso do pool por cliente"""
+        with self._lock:
+            items = [(key, client, dict(self._metrics[key])) for key, client in self._clients.items()]
+        clients = []
+        for (service_name, region_name, _, _), client, metrics in items:
+            metrics.update(self._connection_pool_stats(client))
+            metrics['service'] = service_name
+            metrics['region'] = region_name
+            metrics['pool_utilization'] = round(metrics['peak_in_flight'] / self.max_pool_connections, 3)
+            clients.append(metrics)
+        return {
+            'max_pool_connections': self.max_pool_connections,
+            'retry_mode': self.boto_config.retries.get('mode'),
+            'clients': clients
+        }
+
+_default_factory: Optional[BedrockClientFactory] = None
+_default_lock = threading.Lock()
+
+def configure_client_factory(**kwargs) -> BedrockClientFactory:
+    """Define a fábrica padrão com as configurações de pool informadas"""
+    global _default_factory
+    with _default_lock:
+        _default_factory = BedrockClientFactory(**kwargs)
+        return _default_factory
+
+def get_client_factory() -> BedrockClientFactory:
+    """Retorna a fábrica padrão, criando-a com valores default se necessário"""
+    global _default_factory
+    with _default_lock:
+        if _default_factory is None:
+            _default_factory = BedrockClientFactory()
+        return _default_factory
+
+def configure_from_settings(config) -> BedrockClientFactory:
+    """Configura a fábrica padrão a partir da classe Config"""
+    return configure_client_factory(
+        max_pool_connections=config.BEDROCK_MAX_POOL_CONNECTIONS,
+        connect_timeout=config.BEDROCK_CONNECT_TIMEOUT,
+        read_timeout=config.BEDROCK_READ_TIMEOUT,
+        max_attempts=config.BEDROCK_MAX_ATTEMPTS,
+        retry_mode=config.BEDROCK_RETRY_MODE
+    )
@@ -0,0 +1,296 @@
+import os
+import json
+import time
+import pickle
+import sqlite3
+import logging
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+import numpy as np
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 3
+
+def read_meta(db_path: str, key: str) -> Optional[str]:
+    """Lê um metadado do índice sem abrir o chunk store para escrita (ferramentas externas)"""
+    if not os.path.exists(db_path):
+        return None
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+class ChunkStore(Docstore, AddableMixin):
+    """Docstore em SQLite para os textos e metadados dos chunks.
+
+    Substitui o InMemoryDocstore pickled em index.pkl: nada é carregado na
+    inicialização além do mapeamento posição → id do índice FAISS, e cada
+    busca lê do disco apenas os top-k chunks retornados.
+
+    Também guarda o vetor float32 original de cada chunk, usado para
+    re-ranquear candidatos de índices quantizados e para reconstruir o
+    índice sem perda de precisão.
+
+    Cada lote de chunks é confirmado na hora, em transações curtas e com o
+    journal em modo WAL: outros processos lendo o mesmo arquivo nunca
+    esperam o escritor. O que liga o SQLite ao índice FAISS salvo é o
+    mapeamento posição → id, gravado por commit() no checkpoint junto com
+    os metadados do índice; chunks confirmados depois dele e perdidos numa
+    queda voltam pelo WAL do índice (ver delete_unmapped).
+
+    Com read_only, o arquivo é aberto só para leitura (processos que não
+    são o escritor do vector store) e nada é gravado, nem o schema.
+    """
+
+    def __init__(self, db_path: str, read_only: bool = False):
+        self.db_path = db_path
+        self.read_only = read_only
+        self._lock = threading.Lock()
+
+        if read_only:
+            self._conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+            return
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        # Mudar o modo do journal exige acesso exclusivo: só quando ainda não é WAL
+        if self._conn.execute("PRAGMA journal_mode").fetchone()[0].lower() != 'wal':
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # Schema atual: nada a gravar (outro processo pode estar no meio de um lote)
+        has_meta = self._conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'meta'").fetchone()[0]
+        if not has_meta or self.get_meta('schema_version') != str(SCHEMA_VERSION):
+            self._create_schema()
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(chunks)")]
+            if 'vector' not in columns:
+                # Chunk store da versão 1, sem os vetores originais
+                self._conn.execute("ALTER TABLE chunks ADD COLUMN vector BLOB")
+            self.set_meta('schema_version', SCHEMA_VERSION)
+
+    def _create_schema(self):
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                doc_id TEXT PRIMARY KEY,
+                content TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                vector BLOB
+            );
+            CREATE INDEX IF NOT EXISTS idx_chunks_source ON chunks (json_extract(metadata, '$.source'));
+            CREATE TABLE IF NOT EXISTS index_map (
+                position INTEGER PRIMARY KEY,
+                doc_id TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS lexical_docs (
+                position INTEGER PRIMARY KEY,
+                doc_id TEXT,
+                length INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS lexical_terms (
+                term TEXT PRIMARY KEY,
+                docs BLOB NOT NULL,
+                frequencies BLOB NOT NULL
+            );
+        """)
+
+    def search(self, search: str) -> Union[str, Document]:
+        """Retorna o chunk pelo id (interface Docstore usada pelo wrapper FAISS)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, metadata FROM chunks WHERE doc_id = ?", (search,)
+            ).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(id=search, page_content=row[0], metadata=json.loads(row[1]))
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        """Grava chunks; um id já presente (confirmado antes de uma queda e reaplicado
+        pelo WAL) tem texto e metadados substituídos"""
+        rows = [(doc_id, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False))
+                for doc_id, doc in texts.items()]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO chunks (doc_id, content, metadata) VALUES (?, ?, ?) "
+                "ON CONFLICT (doc_id) DO UPDATE SET content = excluded.content, metadata = excluded.metadata",
+                rows
+            )
+            self._conn.commit()
+
+    def update_metadata(self, items: Dict[str, Dict]):
+        """Atualiza os metadados de chunks existentes (ex.: posição no arquivo)"""
+        rows = [(json.dumps(metadata, ensure_ascii=False), doc_id) for doc_id, metadata in items.items()]
+        with self._lock:
+            self._conn.executemany("UPDATE chunks SET metadata = ? WHERE doc_id = ?", rows)
+            self._conn.commit()
+
+    def ids_for_source(self, source: str) -> List[str]:
+        """Ids dos chunks de um arquivo (metadado 'source')"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT doc_id FROM chunks WHERE json_extract(metadata, '$.source') = ?", (source,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def iter_contents(self, batch_size: int = 1000) -> Iterator[Tuple[str, str]]:
+        """Percorre (id, texto) de todos os chunks em blocos, sem carregar tudo na memória"""
+        last_id = ''
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT doc_id, content FROM chunks WHERE doc_id > ? ORDER BY doc_id LIMIT ?",
+                    (last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            yield from rows
+            last_id = rows[-1][0]
+
+    def field_values(self, fields) -> Dict[str, Dict]:
+        """Valores de alguns campos dos metadados de todos os chunks (id -> {campo: valor})"""
+        columns = ", ".join(f"json_extract(metadata, '$.{field}')" for field in fields)
+        with self._lock:
+            rows = self._conn.execute(f"SELECT doc_id, {columns} FROM chunks").fetchall()
+        return {row[0]: dict(zip(fields, row[1:])) for row in rows}
+
+    def put_vectors(self, vectors: Dict[str, List[float]]):
+        """Guarda os vetores float32 originais dos chunks"""
+        rows = [(np.asarray(vector, dtype=np.float32).tobytes(), doc_id) for doc_id, vector in vectors.items()]
+        with self._lock:
+            self._conn.executemany("UPDATE chunks SET vector = ? WHERE doc_id = ?", rows)
+            self._conn.commit()
+
+    def get_vectors(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        """Lê os vetores originais; chunks sem vetor guardado ficam de fora"""
+        found = {}
+        unique = list(dict.fromkeys(ids))
+        with self._lock:
+            # Consulta em blocos para respeitar o limite de parâmetros do SQLite
+            for i in range(0, len(unique), 500):
+                block = unique[i:i + 500]
+                placeholders = ",".join("?" * len(block))
+                rows = self._conn.execute(
+                    f"SELECT doc_id, vector FROM chunks WHERE vector IS NOT NULL AND doc_id IN ({placeholders})",
+                    block
+                ).fetchall()
+                for doc_id, blob in rows:
+                    found[doc_id] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def delete(self, ids: List) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM chunks WHERE doc_id = ?", [(doc_id,) for doc_id in ids])
+            self._conn.commit()
+
+    def delete_unmapped(self) -> int:
+        """Apaga chunks fora do mapeamento do último checkpoint.
+
+        São lotes confirmados depois dele cujo índice não chegou a ser salvo;
+        os que estão no WAL do índice são gravados de novo ao reaplicá-lo.
+        """
+        with self._lock:
+            removed = self._conn.execute(
+                "DELETE FROM chunks WHERE doc_id NOT IN (SELECT doc_id FROM index_map)"
+            ).rowcount
+            self._conn.commit()
+        return removed
+
+    def clear(self):
+        """Remove todos os chunks e o mapeamento do índice"""
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.execute("DELETE FROM index_map")
+            self._conn.commit()
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        """Grava um metadado do índice"""
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+            self._conn.commit()
+
+    def load_index_map(self) -> Dict[int, str]:
+        """Lê o mapeamento posição no índice FAISS → id do chunk"""
+        with self._lock:
+            rows = self._conn.execute("SELECT position, doc_id FROM index_map").fetchall()
+        return dict(rows)
+
+    def commit(self, index_to_docstore_id: Dict[int, str], meta: Optional[Dict[str, str]] = None,
+               lexical: Optional[Tuple[Dict, List, List]] = None):
+        """Grava o mapeamento do índice e os metadados do checkpoint em uma única transação.
+
+        lexical (LexicalIndex.to_records) substitui o índice BM25 salvo; sem
+        ele, o salvo fica como está e é conferido contra o mapeamento na carga.
+        """
+        meta = dict(meta or {}, updated_at=time.time())
+        with self._lock:
+            try:
+                self._conn.execute("DELETE FROM index_map")
+                self._conn.executemany("INSERT INTO index_map (position, doc_id) VALUES (?, ?)",
+                                       index_to_docstore_id.items())
+                if lexical is not None:
+                    header, documents, postings = lexical
+                    self._conn.execute("DELETE FROM lexical_docs")
+                    self._conn.executemany("INSERT INTO lexical_docs (position, doc_id, length) VALUES (?, ?, ?)",
+                                           documents)
+                    self._conn.execute("DELETE FROM lexical_terms")
+                    self._conn.executemany("INSERT INTO lexical_terms (term, docs, frequencies) VALUES (?, ?, ?)",
+                                           postings)
+                    meta['lexical'] = json.dumps(header)
+                self._conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                       [(key, str(value)) for key, value in meta.items()])
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    def load_lexical(self) -> Optional[Tuple[Dict, List, List]]:
+        """Índice BM25 salvo no último checkpoint (cabeçalho, documentos, posting lists) ou None"""
+        header = self.get_meta('lexical')
+        if header is None:
+            return None
+        with self._lock:
+            documents = self._conn.execute("SELECT doc_id, length FROM lexical_docs ORDER BY position").fetchall()
+            postings = self._conn.execute("SELECT term, docs, frequencies FROM lexical_terms").fetchall()
+        return json.loads(header), documents, postings
+
+    def import_pickled_docstore(self, pickle_path: str) -> Dict[int, str]:
+        """Migra um index.pkl do formato antigo (InMemoryDocstore) para o SQLite"""
+        with open(pickle_path, 'rb') as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        documents = {doc_id: docstore.search(doc_id) for doc_id in index_to_docstore_id.values()}
+        self.clear()
+        self.add({doc_id: doc for doc_id, doc in documents.items() if isinstance(doc, Document)})
+        self.commit(index_to_docstore_id)
+        logger.info(f"{len(documents)} chunks migrados de {pickle_path} para o chunk store")
+        return index_to_docstore_id
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def get_stats(self) -> Dict:
+        return {
+            'chunks': self.count(),
+            'path': self.db_path,
+            'size_bytes': os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0
+        }
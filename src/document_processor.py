@@ -1,14 +1,55 @@
 import os
+import time
+import hashlib
 import logging
-from typing import List, Dict
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Tuple, Iterator, Iterable, Optional
 import PyPDF2
 from docx import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document as LangchainDocument
+from src.ingestion_manifest import IngestionManifest, IngestionPlan
+from src.embedding_cache import normalize_text
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+SUPPORTED_EXTENSIONS = ['.pdf', '.docx', '.doc']
+
+def stable_chunk_id(source: str, content: str, occurrence: int = 0) -> str:
+    """Id determinístico do chunk: o mesmo arquivo e texto geram sempre o mesmo id.
+    
+    occurrence distingue repetições do mesmo texto no arquivo (cabeçalhos,
+    rodapés, cláusulas repetidas); a primeira ocorrência mantém o id sem
+    contador.
+    """
+    key = f"{source}\n{normalize_text(content)}"
+    if occurrence:
+        key += f"\n#{occurrence}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+class ChunkIdAssigner:
+    """Atribui ids estáveis em sequência, numerando textos repetidos do mesmo arquivo"""
+    
+    def __init__(self):
+        self._occurrences = Counter()
+    
+    def assign(self, source: str, content: str) -> str:
+        base_id = stable_chunk_id(source, content)
+        occurrence = self._occurrences[base_id]
+        self._occurrences[base_id] += 1
+        return stable_chunk_id(source, content, occurrence) if occurrence else base_id
+
+def _process_file_worker(args: Tuple[str, int, int]) -> Tuple[List[LangchainDocument], float]:
+    """Processa um arquivo em um processo filho e retorna chunks e tempo gasto"""
+    file_path, chunk_size, chunk_overlap = args
+    start = time.perf_counter()
+    processor = DocumentProcessor(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    documents = processor.process_document(file_path)
+    return documents, time.perf_counter() - start
+
 class DocumentProcessor:
     def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
         self.chunk_size = chunk_size
@@ -18,59 +59,89 @@ class DocumentProcessor:
             chunk_overlap=chunk_overlap,
             length_function=len,
         )
+        # Tempos por arquivo da última execução (preenchido por process_files)
+        self.last_file_timings: List[Dict] = []
     
-    def extract_text_from_pdf(self, file_path: str) -> str:
-        """Extrai texto de arquivo PDF"""
+    def iter_pdf_pages(self, file_path: str) -> Iterator[str]:
+        """Extrai o texto de um PDF página a página, sem montar o documento inteiro"""
         try:
             with open(file_path, 'rb') as file:
                 pdf_reader = PyPDF2.PdfReader(file)
-                text = ""
                 for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
-                return text
+                    yield (page.extract_text() or "") + "\n"
         except Exception as e:
             logger.error(f"Erro ao processar PDF {file_path}: {str(e)}")
-            return ""
     
-    def extract_text_from_docx(self, file_path: str) -> str:
-        """Extrai texto de arquivo Word"""
+    def iter_docx_paragraphs(self, file_path: str) -> Iterator[str]:
+        """Extrai o texto de um arquivo Word parágrafo a parágrafo"""
         try:
             doc = Document(file_path)
-            text = ""
             for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            return text
+                yield paragraph.text + "\n"
         except Exception as e:
             logger.error(f"Erro ao processar DOCX {file_path}: {str(e)}")
-            return ""
     
-    def process_document(self, file_path: str) -> List[LangchainDocument]:
-        """Processa um documento e retorna chunks"""
+    def extract_text_from_pdf(self, file_path: str) -> str:
+        """Extrai texto de arquivo PDF"""
+        return "".join(self.iter_pdf_pages(file_path))
+    
+    def extract_text_from_docx(self, file_path: str) -> str:
+        """Extrai texto de arquivo Word"""
+        return "".join(self.iter_docx_paragraphs(file_path))
+    
+    def iter_text_parts(self, file_path: str) -> Optional[Iterator[str]]:
+        """Retorna um iterador de partes de texto (páginas/parágrafos) ou None se não suportado"""
+        file_extension = os.path.splitext(file_path)[1].lower()
+        if file_extension == '.pdf':
+            return self.iter_pdf_pages(file_path)
+        if file_extension in ['.docx', '.doc']:
+            return self.iter_docx_paragraphs(file_path)
+        return None
+    
+    def iter_chunks(self, text_parts: Iterable[str]) -> Iterator[str]:
+        """Divide um fluxo de texto em chunks de forma incremental.
+        
+        Mantém em memória apenas o último chunk (ainda incompleto) mais a parte
+        atual; os chunks completos são emitidos assim que o buffer passa de
+        duas vezes o chunk_size. O último chunk é reaproveitado como início do
+        buffer, preservando a sobreposição entre chunks consecutivos.
+        """
+        buffer = ""
+        for part in text_parts:
+            buffer += part
+            if len(buffer) < 2 * self.chunk_size:
+                continue
+            
+            chunks = self.text_splitter.split_text(buffer)
+            if len(chunks) < 2:
+                continue
+            for chunk in chunks[:-1]:
+                yield chunk
+            # split_text remove espaços nas bordas; a parte anterior terminava em quebra de linha
+            buffer = chunks[-1] + "\n"
+        
+        if buffer.strip():
+            yield from self.text_splitter.split_text(buffer)
+    
+    def iter_document_chunks(self, file_path: str) -> Iterator[LangchainDocument]:
+        """Processa um documento e emite os chunks à medida que são gerados"""
         file_name = os.path.basename(file_path)
         file_extension = os.path.splitext(file_path)[1].lower()
         
         logger.info(f"Processando documento: {file_name}")
         
         # Extrai texto baseado na extensão
-        if file_extension == '.pdf':
-            text = self.extract_text_from_pdf(file_path)
-        elif file_extension in ['.docx', '.doc']:
-            text = self.extract_text_from_docx(file_path)
-        else:
+        text_parts = self.iter_text_parts(file_path)
+        if text_parts is None:
             logger.warning(f"Tipo de arquivo não suportado: {file_extension}")
-            return []
-        
-        if not text.strip():
-            logger.warning(f"Nenhum texto extraído de {file_name}")
-            return []
+            return
         
-        # Divide o texto em chunks
-        chunks = self.text_splitter.split_text(text)
-        
-        # Cria documentos Langchain com metadados
-        documents = []
-        for i, chunk in enumerate(chunks):
-            doc = LangchainDocument(
+        chunk_count = 0
+        chunk_ids = ChunkIdAssigner()
+        for i, chunk in enumerate(self.iter_chunks(text_parts)):
+            chunk_count += 1
+            yield LangchainDocument(
+                id=chunk_ids.assign(file_name, chunk),
                 page_content=chunk,
                 metadata={
                     'source': file_name,
@@ -79,28 +150,111 @@ class DocumentProcessor:
                     'file_type': file_extension
                 }
             )
-            documents.append(doc)
         
-        logger.info(f"Documento {file_name} processado em {len(documents)} chunks")
-        return documents
+        if chunk_count == 0:
+            logger.warning(f"Nenhum texto extraído de {file_name}")
+        else:
+            logger.info(f"Documento {file_name} processado em {chunk_count} chunks")
+    
+    def process_document(self, file_path: str) -> List[LangchainDocument]:
+        """Processa um documento e retorna chunks"""
+        return list(self.iter_document_chunks(file_path))
+    
+    def _iter_timed_chunks(self, file_path: str) -> Iterator[LangchainDocument]:
+        """Emite os chunks de um arquivo e registra o tempo quando o fluxo termina"""
+        start = time.perf_counter()
+        chunk_count = 0
+        for doc in self.iter_document_chunks(file_path):
+            chunk_count += 1
+            yield doc
+        self._record_file_timing(file_path, chunk_count, time.perf_counter() - start)
+    
+    def list_supported_files(self, directory_path: str) -> List[str]:
+        """Lista, em ordem determinística, os arquivos suportados de um diretório"""
+        file_paths = []
+        for filename in sorted(os.listdir(directory_path)):
+            file_path = os.path.join(directory_path, filename)
+            file_extension = os.path.splitext(filename)[1].lower()
+            if file_extension in SUPPORTED_EXTENSIONS and os.path.isfile(file_path):
+                file_paths.append(file_path)
+        return file_paths
+    
+    def process_files(self, file_paths: List[str], max_workers: int = 1) -> List[LangchainDocument]:
+        """Processa uma lista de arquivos, em paralelo quando max_workers > 1"""
+        all_documents = []
+        self.last_file_timings = []
+        
+        if max_workers > 1 and len(file_paths) > 1:
+            max_workers = min(max_workers, len(file_paths))
+            logger.info(f"Processando {len(file_paths)} arquivos com {max_workers} processos")
+            tasks = [(path, self.chunk_size, self.chunk_overlap) for path in file_paths]
+            # spawn: o fork copiaria locks (logging, SQLite) presos por outras threads do
+            # processo, como o checkpoint e as requisições do Flask, e o filho travaria
+            with ProcessPoolExecutor(max_workers=max_workers,
+                                     mp_context=multiprocessing.get_context('spawn')) as executor:
+                # map preserva a ordem de entrada, garantindo resultado determinístico
+                results = executor.map(_process_file_worker, tasks)
+                for file_path, (documents, elapsed) in zip(file_paths, results):
+                    self._record_file_timing(file_path, len(documents), elapsed)
+                    all_documents.extend(documents)
+        else:
+            for file_path in file_paths:
+                start = time.perf_counter()
+                documents = self.process_document(file_path)
+                self._record_file_timing(file_path, len(documents), time.perf_counter() - start)
+                all_documents.extend(documents)
+        
+        return all_documents
+    
+    def _record_file_timing(self, file_path: str, chunk_count: int, elapsed: float):
+        """Registra o tempo de processamento de um arquivo"""
+        self.last_file_timings.append({
+            'file': os.path.basename(file_path),
+            'chunks': chunk_count,
+            'seconds': round(elapsed, 4)
+        })
     
-    def process_documents_directory(self, directory_path: str) -> List[LangchainDocument]:
+    def process_documents_directory(self, directory_path: str, max_workers: int = 1) -> List[LangchainDocument]:
         """Processa todos os documentos em um diretório"""
-        all_documents = []
-        supported_extensions = ['.pdf', '.docx', '.doc']
+        self.last_file_timings = []
         
         if not os.path.exists(directory_path):
             logger.error(f"Diretório não encontrado: {directory_path}")
-            return all_documents
+            return []
         
-        for filename in os.listdir(directory_path):
-            file_path = os.path.join(directory_path, filename)
-            file_extension = os.path.splitext(filename)[1].lower()
-            
-            if file_extension in supported_extensions and os.path.isfile(file_path):
-                print("File Path:", file_path)
-                documents = self.process_document(file_path)
-                all_documents.extend(documents)
+        start = time.perf_counter()
+        all_documents = self.process_files(self.list_supported_files(directory_path), max_workers)
+        elapsed = time.perf_counter() - start
         
-        logger.info(f"Total de {len(all_documents)} chunks processados de {directory_path}")
+        logger.info(f"Total de {len(all_documents)} chunks processados de {directory_path} em {elapsed:.2f}s")
         return all_documents
+    
+    def process_changed_documents(self, directory_path: str, manifest: IngestionManifest,
+                                  max_workers: int = 1,
+                                  stream: bool = False) -> Tuple[IngestionPlan, Dict[str, Iterable[LangchainDocument]]]:
+        """Processa apenas os arquivos novos ou modificados desde a última ingestão.
+        
+        Com stream=True (apenas no modo sequencial) os valores retornados são
+        geradores: a extração acontece enquanto os chunks são consumidos,
+        mantendo a memória limitada a poucas páginas por arquivo.
+        """
+        self.last_file_timings = []
+        
+        if not os.path.exists(directory_path):
+            logger.error(f"Diretório não encontrado: {directory_path}")
+            return IngestionPlan(), {}
+        
+        plan = manifest.scan(self.list_supported_files(directory_path))
+        logger.info(f"Ingestão incremental: {plan.summary()}")
+        
+        changed_files = list(plan.changed)
+        if stream and max_workers <= 1:
+            return plan, {file_path: self._iter_timed_chunks(file_path) for file_path in changed_files}
+        
+        documents = self.process_files(changed_files, max_workers)
+        
+        documents_by_file = {file_path: [] for file_path in changed_files}
+        for doc in documents:
+            documents_by_file[doc.metadata['file_path']].append(doc)
+        
+        return plan, documents_by_file
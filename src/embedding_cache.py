@@ -0,0 +1,230 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import List, Dict, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def normalize_text(text: str) -> str:
+    """Normaliza o texto para a chave do cache (Unicode NFC e espaços colapsados)"""
+    return " ".join(unicodedata.normalize('NFC', text).split())
+
+def text_hash(text: str) -> str:
+    """SHA-256 do texto normalizado"""
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+class EmbeddingCache:
+    """Cache persistente de embeddings em SQLite, com limite de tamanho.
+
+    As entradas são indexadas por (model_id, sha256 do texto normalizado).
+    Quando o número de entradas passa de max_entries, as menos acessadas
+    recentemente são removidas.
+    """
+
+    def __init__(self, db_path: str, max_entries: int = 200000):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model_id TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model_id, text_hash)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access)")
+        self._conn.commit()
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, model_id: str, hashes: List[str]) -> Dict[str, List[float]]:
+        """Busca vetores em cache; retorna apenas os encontrados"""
+        if not hashes:
+            return {}
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            # Consulta em blocos para respeitar o limite de parâmetros do SQLite
+            for i in range(0, len(unique), 500):
+                block = unique[i:i + 500]
+                placeholders = ",".join("?" * len(block))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model_id = ? AND text_hash IN ({placeholders})",
+                    [model_id] + block
+                ).fetchall()
+                for hash_value, blob in rows:
+                    found[hash_value] = np.frombuffer(blob, dtype=np.float32).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE model_id = ? AND text_hash = ?",
+                    [(now, model_id, hash_value) for hash_value in found]
+                )
+                self._conn.commit()
+            hits = sum(1 for hash_value in hashes if hash_value in found)
+            self._stats['hits'] += hits
+            self._stats['misses'] += len(hashes) - hits
+        return found
+
+    def put_many(self, model_id: str, items: Dict[str, List[float]]):
+        """Grava vetores no cache e aplica a política de remoção"""
+        if not items:
+            return
+        now = time.time()
+        rows = [(model_id, hash_value, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                for hash_value, vector in items.items()]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model_id, text_hash, vector, last_access) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._entries += self._conn.total_changes - before
+            if self._entries > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Remove as entradas menos usadas, deixando 10% de folga abaixo do limite"""
+        target = int(self.max_entries * 0.9)
+        to_remove = self._entries - target
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN "
+            "(SELECT rowid FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+            (to_remove,)
+        )
+        self._entries = target
+        self._stats['evictions'] += to_remove
+        logger.info(f"Cache de embeddings: {to_remove} entradas removidas")
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._entries = 0
+
+    def get_stats(self) -> Dict:
+        """Retorna contadores de acertos/falhas e tamanho do cache"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = self._entries
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['max_entries'] = self.max_entries
+        stats['path'] = self.db_path
+        return stats
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings que consultam o cache persistente antes de chamar o backend"""
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, model_id: str):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_id = model_id
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [text_hash(text) for text in texts]
+        cached = self.cache.get_many(self.model_id, hashes)
+
+        missing = {}
+        for text, hash_value in zip(texts, hashes):
+            if hash_value not in cached and hash_value not in missing:
+                missing[hash_value] = text
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(self.model_id, computed)
+            cached.update(computed)
+
+        return [cached[hash_value] for hash_value in hashes]
+
+    def lookup(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Vetores em cache na ordem dos textos (None nos ausentes), com uma única consulta"""
+        cached = self.cache.get_many(self.model_id, [text_hash(text) for text in texts])
+        return [cached.get(text_hash(text)) for text in texts]
+
+    def store(self, vectors: Dict[str, List[float]]):
+        """Grava vetores calculados fora desta classe (texto -> vetor) de uma vez"""
+        self.cache.put_many(self.model_id, {text_hash(text): vector for text, vector in vectors.items()})
+
+    def embed_query(self, text: str) -> List[float]:
+        hash_value = text_hash(text)
+        cached = self.cache.get_many(self.model_id, [hash_value])
+        if hash_value in cached:
+            return cached[hash_value]
+        vector = self.embeddings.embed_query(text)
+        self.cache.put_many(self.model_id, {hash_value: vector})
+        return vector
+
+class QueryEmbeddingCache:
+    """Cache LRU em memória, com expiração (TTL), de embeddings de consultas.
+
+    Evita a chamada ao Bedrock para perguntas repetidas no /chat. A chave
+    é o texto normalizado e o valor, o vetor float32.
+    """
+
+    def __init__(self, capacity: int = 1024, ttl_seconds: float = 3600):
+        self.capacity = capacity
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        key = normalize_text(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            vector, created_at = entry
+            if self.ttl_seconds and time.monotonic() - created_at > self.ttl_seconds:
+                del self._entries[key]
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return vector
+
+    def put(self, text: str, vector: List[float]):
+        if self.capacity <= 0:
+            return
+        key = normalize_text(text)
+        with self._lock:
+            self._entries[key] = (np.asarray(vector, dtype=np.float32), time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['capacity'] = self.capacity
+        stats['ttl_seconds'] = self.ttl_seconds
+        return stats
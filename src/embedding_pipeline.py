@@ -0,0 +1,189 @@
+import time
+import hashlib
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Iterator, Optional, Sequence, Tuple
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from src.embedding_cache import CachedEmbeddings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Dimensões aceitas pelo Titan Text Embeddings v2 (1024 é o padrão do modelo)
+TITAN_V2_DIMENSIONS = (256, 512, 1024)
+TITAN_V2_DEFAULT_DIMENSIONS = 1024
+
+def supports_dimensions(model_id: str) -> bool:
+    """Indica se o modelo aceita escolher a dimensão do embedding"""
+    return 'titan-embed-text-v2' in model_id
+
+def create_embeddings(backend: str, model_id: str, client=None, dimensions: Optional[int] = None,
+                      fake_size: int = 1024,
+                      fake_latency: float = 0.0) -> Tuple[Embeddings, str, Optional[int]]:
+    """Cria o backend de embeddings e a chave que identifica o espaço vetorial.
+
+    A chave (modelo + dimensão) separa entradas de cache e é gravada nos
+    metadados do índice para impedir que vetores de espaços diferentes se
+    misturem.
+
+    Também retorna a dimensão efetivamente configurada no modelo, ou None
+    quando ela fica a cargo do modelo (sem dimensions ou modelo que não
+    aceita escolhê-la, como o Titan v1 e o Cohere).
+    """
+    if backend == 'fake':
+        size = dimensions or fake_size
+        logger.warning("Usando backend de embeddings local (fake) - apenas para testes/benchmarks")
+        return FakeEmbeddings(size=size, latency=fake_latency), f"fake:{size}", size
+
+    from langchain_aws import BedrockEmbeddings
+    model_kwargs = None
+    key = model_id
+    if dimensions:
+        if not supports_dimensions(model_id):
+            logger.warning(f"O modelo {model_id} não aceita configurar a dimensão; ignorando {dimensions}")
+            dimensions = None
+        elif dimensions not in TITAN_V2_DIMENSIONS:
+            raise ValueError(f"Dimensão inválida para o Titan v2: {dimensions} (use {TITAN_V2_DIMENSIONS})")
+        else:
+            model_kwargs = {'dimensions': dimensions}
+            if dimensions != TITAN_V2_DEFAULT_DIMENSIONS:
+                key = f"{model_id}:{dimensions}"
+    return BedrockEmbeddings(client=client, model_id=model_id, model_kwargs=model_kwargs), key, dimensions or None
+
+class FakeEmbeddings(Embeddings):
+    """Backend local de embeddings com latência configurável.
+
+    Gera vetores determinísticos (mesmo texto -> mesmo vetor) e normalizados,
+    simulando o tempo de ida e volta de uma chamada ao Bedrock. Útil para
+    testes e benchmarks sem credenciais AWS.
+    """
+
+    def __init__(self, size: int = 1024, latency: float = 0.0):
+        self.size = size
+        self.latency = latency
+
+    def _embed(self, text: str) -> List[float]:
+        if self.latency > 0:
+            time.sleep(self.latency)
+        seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'little')
+        vector = np.random.default_rng(seed).standard_normal(self.size).astype(np.float32)
+        vector /= np.linalg.norm(vector)
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Uma "chamada" por texto, como o BedrockEmbeddings faz com o Titan
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+class EmbeddingPipeline:
+    """Gera embeddings com chamadas concorrentes, devolvendo lotes em ordem.
+
+    Cada texto é embedado em uma thread de um pool limitado a
+    max_concurrency. Os resultados são remontados na ordem original e
+    emitidos em lotes de batch_size, de modo que o chamador pode adicionar
+    cada lote ao índice enquanto os próximos ainda estão sendo calculados.
+
+    Com CachedEmbeddings, o cache é consultado uma vez por lote antes de
+    distribuir o trabalho, só os textos ausentes vão para o pool (direto no
+    backend) e os vetores novos são gravados de uma vez ao final do lote.
+    """
+
+    def __init__(self, embeddings: Embeddings, max_concurrency: int = 8, batch_size: int = 32):
+        self.embeddings = embeddings
+        self._cache = embeddings if isinstance(embeddings, CachedEmbeddings) else None
+        self._backend = embeddings.embeddings if self._cache is not None else embeddings
+        self.max_concurrency = max(1, max_concurrency)
+        self.batch_size = max(1, batch_size)
+        self._lock = threading.Lock()
+        self._stats = {'texts_embedded': 0, 'batches': 0, 'seconds': 0.0}
+
+    def _embed_one(self, text: str) -> List[float]:
+        return self._backend.embed_documents([text])[0]
+
+    def _submit_batch(self, executor: ThreadPoolExecutor, batch: List[str]) -> Tuple[List, Dict]:
+        """Vetores já em cache (None nos ausentes) e as chamadas submetidas para os ausentes"""
+        cached = self._cache.lookup(batch) if self._cache is not None else [None] * len(batch)
+        futures = {}
+        for text, vector in zip(batch, cached):
+            if vector is None and text not in futures:
+                futures[text] = executor.submit(self._embed_one, text)
+        return cached, futures
+
+    def iter_batches(self, texts: Sequence[str]) -> Iterator[Tuple[int, List[List[float]]]]:
+        """Emite (posição inicial, vetores) para cada lote, na ordem dos textos"""
+        if not texts:
+            return
+
+        if self.max_concurrency == 1:
+            for start in range(0, len(texts), self.batch_size):
+                batch_start = time.perf_counter()
+                vectors = self.embeddings.embed_documents(list(texts[start:start + self.batch_size]))
+                self._record(len(vectors), time.perf_counter() - batch_start)
+                yield start, vectors
+            return
+
+        # Lotes submetidos à frente do que está sendo consumido, para manter o pool ocupado
+        prefetch = -(-self.max_concurrency // self.batch_size) + 1
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='embedding')
+        in_flight = deque()
+        try:
+            started = time.perf_counter()
+            for start in range(0, len(texts), self.batch_size):
+                batch = list(texts[start:start + self.batch_size])
+                in_flight.append((start, batch) + self._submit_batch(executor, batch))
+                if len(in_flight) > prefetch:
+                    yield self._collect(in_flight, started)
+                    started = time.perf_counter()
+            while in_flight:
+                yield self._collect(in_flight, started)
+                started = time.perf_counter()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _collect(self, in_flight: deque, started: float) -> Tuple[int, List[List[float]]]:
+        start, batch, cached, futures = in_flight.popleft()
+        computed = {text: future.result() for text, future in futures.items()}
+        if self._cache is not None and computed:
+            self._cache.store(computed)
+        vectors = [vector if vector is not None else computed[text] for text, vector in zip(batch, cached)]
+        self._record(len(vectors), time.perf_counter() - started)
+        return start, vectors
+
+    def _record(self, count: int, seconds: float):
+        with self._lock:
+            self._stats['texts_embedded'] += count
+            self._stats['batches'] += 1
+            self._stats['seconds'] += seconds
+
+    def embed_documents(self, texts: Sequence[str]) -> List[List[float]]:
+        """Gera embeddings de todos os textos, preservando a ordem"""
+        vectors = []
+        for _, batch_vectors in self.iter_batches(texts):
+            vectors.extend(batch_vectors)
+        return vectors
+
+    def embed_queries(self, queries: Sequence[str]) -> List[List[float]]:
+        """Gera embeddings de consultas (embed_query) em paralelo, preservando a ordem"""
+        if not queries:
+            return []
+        start = time.perf_counter()
+        workers = min(self.max_concurrency, len(queries))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='embedding') as executor:
+            vectors = list(executor.map(self.embeddings.embed_query, queries))
+        self._record(len(vectors), time.perf_counter() - start)
+        return vectors
+
+    def get_stats(self) -> Dict:
+        """Retorna estatísticas acumuladas do pipeline"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['texts_per_second'] = round(stats['texts_embedded'] / stats['seconds'], 2) if stats['seconds'] else 0.0
+        stats['seconds'] = round(stats['seconds'], 3)
+        stats['max_concurrency'] = self.max_concurrency
+        stats['batch_size'] = self.batch_size
+        return stats
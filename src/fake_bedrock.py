@@ -0,0 +1,53 @@
+import io
+import json
+import time
+from typing import Any, Dict, Iterator
+
+class FakeBedrockRuntimeClient:
+    """Substituto local do cliente bedrock-runtime para testes.
+
+    Implementa invoke_model e invoke_model_with_response_stream no formato
+    de mensagens do Claude, devolvendo um texto fixo dividido em tokens com
+    atrasos configuráveis (primeiro token e entre tokens).
+    """
+
+    def __init__(self, response_text: str = "Resposta de teste baseada nos documentos.",
+                 first_token_delay: float = 0.0, token_delay: float = 0.0):
+        self.response_text = response_text
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.calls = []
+
+    def _tokens(self):
+        words = self.response_text.split(' ')
+        return [word if i == 0 else ' ' + word for i, word in enumerate(words)]
+
+    def invoke_model(self, modelId: str, body: str, **kwargs) -> Dict[str, Any]:
+        self.calls.append(('invoke_model', modelId, json.loads(body)))
+        time.sleep(self.first_token_delay + self.token_delay * len(self._tokens()))
+        payload = {
+            "type": "message",
+            "role": "assistant",
+            "content": [{"type": "text", "text": self.response_text}],
+            "stop_reason": "end_turn"
+        }
+        return {'body': io.BytesIO(json.dumps(payload).encode('utf-8'))}
+
+    def invoke_model_with_response_stream(self, modelId: str, body: str, **kwargs) -> Dict[str, Any]:
+        self.calls.append(('invoke_model_with_response_stream', modelId, json.loads(body)))
+        return {'body': self._event_stream()}
+
+    def _event_stream(self) -> Iterator[Dict[str, Any]]:
+        def event(payload):
+            return {'chunk': {'bytes': json.dumps(payload).encode('utf-8')}}
+
+        yield event({"type": "message_start", "message": {"role": "assistant"}})
+        yield event({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}})
+        time.sleep(self.first_token_delay)
+        for i, token in enumerate(self._tokens()):
+            if i and self.token_delay:
+                time.sleep(self.token_delay)
+            yield event({"type": "content_block_delta", "index": 0,
+                         "delta": {"type": "text_delta", "text": token}})
+        yield event({"type": "content_block_stop", "index": 0})
+        yield event({"type": "message_stop"})
@@ -0,0 +1,347 @@
+import math
+import logging
+from typing import Dict, Any, Optional, Tuple
+import numpy as np
+import faiss
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ('flat', 'ivf', 'hnsw', 'sq8', 'pq', 'auto')
+
+# Métricas: 'cosine' usa produto interno sobre vetores normalizados (score =
+# similaridade de cosseno); 'l2' é a distância euclidiana ao quadrado dos
+# índices criados antes da métrica ser configurável.
+METRICS = ('cosine', 'l2')
+
+# Tipos quantizados: guardam códigos comprimidos em vez dos float32 originais
+QUANTIZED_TYPES = ('sq8', 'pq')
+
+# Tipos treinados com os vetores disponíveis na construção; centróides e
+# intervalos ficam defasados quando o corpus cresce muito além deles
+TRAINED_TYPES = ('ivf', 'sq8', 'pq')
+
+# Tipos que o faiss compacta no remove_ids (posições restantes são renumeradas)
+COMPACTING_TYPES = ('flat', 'sq8', 'pq')
+
+# IVF e HNSW não compactam: remoções viram posições apagadas, excluídas das buscas
+# por seletor, e o índice é reconstruído em background quando passam desta fração
+COMPACT_DELETED_RATIO = 0.2
+
+# Limites do modo auto: abaixo de AUTO_HNSW_MIN_VECTORS a busca exata é
+# rápida o bastante; acima de AUTO_IVF_MIN_VECTORS o grafo HNSW passa a
+# custar memória demais e o IVF (treinado) escala melhor.
+AUTO_HNSW_MIN_VECTORS = 20000
+AUTO_IVF_MIN_VECTORS = 1000000
+
+# Pontos de treino por centróide recomendados pelo faiss
+IVF_MIN_POINTS_PER_CENTROID = 39
+
+# O PQ treina 256 centróides (8 bits) por subvetor
+PQ_MIN_TRAINING_VECTORS = 256
+
+# Códigos PQ avaliados por vez na busca filtrada (limita a matriz temporária de distâncias)
+PQ_FILTER_BLOCK = 65536
+
+def resolve_index_type(index_type: str, n_vectors: int) -> str:
+    """Converte o modo configurado (inclusive 'auto') no tipo de índice a usar"""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Tipo de índice inválido: {index_type} (use {', '.join(INDEX_TYPES)})")
+    if index_type == 'auto':
+        if n_vectors < AUTO_HNSW_MIN_VECTORS:
+            return 'flat'
+        return 'hnsw' if n_vectors < AUTO_IVF_MIN_VECTORS else 'ivf'
+    if index_type == 'ivf' and n_vectors < IVF_MIN_POINTS_PER_CENTROID:
+        # Poucos vetores para treinar os centróides: mantém a busca exata
+        return 'flat'
+    if index_type == 'pq' and n_vectors < PQ_MIN_TRAINING_VECTORS:
+        return 'flat'
+    return index_type
+
+def default_nlist(n_vectors: int) -> int:
+    """Número de listas do IVF (~4·√n), limitado pelos pontos de treino disponíveis"""
+    nlist = int(4 * math.sqrt(max(n_vectors, 1)))
+    return max(1, min(nlist, n_vectors // IVF_MIN_POINTS_PER_CENTROID))
+
+def default_pq_m(dimension: int) -> int:
+    """Número de subquantizadores do PQ: o maior divisor da dimensão até d/8.
+
+    Para Titan v2 (1024 dimensões) resulta em 64 bytes por vetor, 64x menor
+    que os 4 KB do float32.
+    """
+    for m in (64, 48, 32, 24, 16, 12, 8, 4, 2, 1):
+        if dimension % m == 0 and m <= max(dimension // 8, 1):
+            return m
+    return 1
+
+def estimate_trained_vectors(index) -> int:
+    """Quantos vetores treinaram um índice salvo sem essa informação.
+
+    No IVF, o inverso de default_nlist (o menor corpus que daria esse
+    nlist); nos demais, os vetores que o índice tem agora.
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return max(int((ivf.nlist / 4) ** 2), IVF_MIN_POINTS_PER_CENTROID * int(ivf.nlist))
+    return int(index.ntotal)
+
+def metric_of(index) -> str:
+    """Métrica de um índice FAISS já construído"""
+    return 'cosine' if index.metric_type == faiss.METRIC_INNER_PRODUCT else 'l2'
+
+def _faiss_metric(metric: str) -> int:
+    if metric not in METRICS:
+        raise ValueError(f"Métrica inválida: {metric} (use {', '.join(METRICS)})")
+    return faiss.METRIC_INNER_PRODUCT if metric == 'cosine' else faiss.METRIC_L2
+
+def normalize(vectors) -> np.ndarray:
+    """Cópia normalizada (norma 1) dos vetores, como o índice de cosseno espera"""
+    vectors = np.array(vectors, dtype=np.float32, ndmin=2)
+    if len(vectors):
+        faiss.normalize_L2(vectors)
+    return vectors
+
+def to_distances(index, scores) -> np.ndarray:
+    """Converte os scores do faiss em distâncias (menor = mais similar).
+
+    No índice de cosseno a distância é 1 - similaridade, então um limiar de
+    similaridade vira diretamente um limite de distância. No L2 os valores
+    são mantidos como antes.
+    """
+    scores = np.asarray(scores, dtype=np.float32)
+    return 1.0 - scores if metric_of(index) == 'cosine' else scores
+
+def range_radius(index, max_distance: float) -> float:
+    """Raio do range_search do faiss equivalente a uma distância máxima"""
+    return 1.0 - max_distance if metric_of(index) == 'cosine' else max_distance
+
+def index_type_of(index) -> str:
+    """Identifica o tipo de um índice FAISS já construído"""
+    if faiss.try_extract_index_ivf(index) is not None:
+        return 'ivf'
+    if isinstance(index, faiss.IndexHNSW):
+        return 'hnsw'
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return 'sq8'
+    if isinstance(index, faiss.IndexPQ):
+        return 'pq'
+    return 'flat'
+
+def build_index(index_type: str, dimension: int, vectors: Optional[np.ndarray] = None,
+                nlist: Optional[int] = None, hnsw_m: int = 32, ef_construction: int = 200,
+                metric: str = 'l2'):
+    """Cria um índice do tipo pedido e adiciona os vetores (treinando o IVF se preciso).
+
+    Todos os tipos usam a mesma métrica, para que scores e limiares de
+    similaridade continuem comparáveis ao trocar o tipo. Com 'cosine' os
+    vetores são normalizados antes de entrar no índice.
+    """
+    faiss_metric = _faiss_metric(metric)
+    if vectors is None:
+        vectors = np.zeros((0, dimension), dtype=np.float32)
+    elif metric == 'cosine':
+        vectors = normalize(vectors)
+    else:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index_type = resolve_index_type(index_type, len(vectors))
+
+    if index_type == 'flat':
+        index = faiss.IndexFlat(dimension, faiss_metric)
+    elif index_type == 'hnsw':
+        index = faiss.IndexHNSWFlat(dimension, hnsw_m, faiss_metric)
+        index.hnsw.efConstruction = ef_construction
+    elif index_type == 'sq8':
+        # 1 byte por dimensão; o treino só estima o intervalo de cada dimensão
+        index = faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit, faiss_metric)
+        index.train(vectors if len(vectors) else np.zeros((1, dimension), dtype=np.float32))
+    elif index_type == 'pq':
+        m = default_pq_m(dimension)
+        index = faiss.IndexPQ(dimension, m, 8, faiss_metric)
+        logger.info(f"Treinando PQ ({m} subquantizadores) em {len(vectors)} vetores...")
+        index.train(vectors)
+    else:
+        nlist = nlist or default_nlist(len(vectors))
+        quantizer = faiss.IndexFlat(dimension, faiss_metric)
+        index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss_metric)
+        logger.info(f"Treinando IVF com {nlist} listas em {len(vectors)} vetores...")
+        index.train(vectors)
+
+    if len(vectors):
+        index.add(vectors)
+    return index
+
+def extract_vectors(index) -> np.ndarray:
+    """Recupera todos os vetores armazenados, na ordem das posições do índice"""
+    if index.ntotal == 0:
+        return np.zeros((0, index.d), dtype=np.float32)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+def compacts_on_remove(index) -> bool:
+    """O índice remove vetores renumerando as posições seguintes (flat, sq8, pq)"""
+    return index_type_of(index) in COMPACTING_TYPES
+
+def remove_positions(index, positions) -> None:
+    """Remove posições de um índice que compacta as restantes (como o IndexFlat faz).
+
+    O IVF não renumera os ids após remove_ids e o HNSW não suporta remoção:
+    neles as posições ficam apagadas até uma reconstrução (ver
+    COMPACT_DELETED_RATIO), em vez de readicionar o índice inteiro a cada
+    remoção.
+    """
+    if not compacts_on_remove(index):
+        raise ValueError(f"Índice {index_type_of(index)} não compacta remoções; marque as posições como apagadas")
+    positions = np.asarray(sorted(positions), dtype=np.int64)
+    if len(positions):
+        index.remove_ids(positions)
+
+def search_parameters(index, nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                      allowed: Optional[np.ndarray] = None, exhaustive: bool = False):
+    """Parâmetros de busca por requisição (não alteram o índice compartilhado).
+
+    allowed restringe a busca a essas posições (filtro de metadados) com um
+    IDSelectorBitmap avaliado dentro do faiss. exhaustive faz o IVF visitar
+    todas as listas, para não perder os poucos vetores de um filtro estreito.
+    """
+    index_type = index_type_of(index)
+    selector = None
+    if allowed is not None:
+        bitmap = np.zeros(index.ntotal, dtype=bool)
+        bitmap[allowed] = True
+        bitmap = np.packbits(bitmap, bitorder='little')
+        selector = faiss.IDSelectorBitmap(index.ntotal, faiss.swig_ptr(bitmap))
+
+    if index_type == 'ivf' and (nprobe or selector is not None):
+        ivf = faiss.extract_index_ivf(index)
+        params = faiss.SearchParametersIVF(nprobe=int(ivf.nlist if exhaustive else nprobe or ivf.nprobe))
+    elif index_type == 'hnsw' and (ef_search or selector is not None):
+        params = faiss.SearchParametersHNSW(efSearch=int(ef_search or index.hnsw.efSearch))
+    elif selector is not None:
+        params = faiss.SearchParameters()
+    else:
+        return None
+    if selector is not None:
+        params.sel = selector
+        # O seletor não copia o bitmap: os dois precisam viver tanto quanto os parâmetros
+        params.referenced_objects = [selector, bitmap]
+    return params
+
+def _use_subset(index, allowed: np.ndarray, exact_max: int) -> bool:
+    """Filtro estreito: busca exata só nas posições permitidas.
+
+    O IVF não reconstrói vetores sem o direct map; nele o filtro estreito
+    usa o seletor visitando todas as listas.
+    """
+    return index_type_of(index) != 'ivf' and len(allowed) <= exact_max
+
+def _pq_filtered_scores(index, queries: np.ndarray, allowed: np.ndarray) -> np.ndarray:
+    """Scores ADC das posições permitidas de um IndexPQ, sem decodificar os vetores.
+
+    O IndexPQ não aceita seletor; para filtros largos, em vez de reconstruir
+    cada vetor, monta a tabela de distâncias consulta × centróides de cada
+    subquantizador e soma as entradas indicadas pelos códigos (como o faiss
+    faz internamente), lendo os códigos direto da memória do índice.
+    """
+    pq = index.pq
+    codes = faiss.rev_swig_ptr(index.codes.data(), index.ntotal * index.code_size)
+    codes = codes.reshape(index.ntotal, index.code_size)
+    inner_product = index.metric_type == faiss.METRIC_INNER_PRODUCT
+    table = np.empty((pq.M, pq.ksub), dtype=np.float32)
+    subquantizers = np.arange(pq.M)
+    scores = np.empty((len(queries), len(allowed)), dtype=np.float32)
+    for row, query in enumerate(np.ascontiguousarray(queries, dtype=np.float32)):
+        if inner_product:
+            pq.compute_inner_prod_table(faiss.swig_ptr(query), faiss.swig_ptr(table))
+        else:
+            pq.compute_distance_table(faiss.swig_ptr(query), faiss.swig_ptr(table))
+        for start in range(0, len(allowed), PQ_FILTER_BLOCK):
+            block = codes[allowed[start:start + PQ_FILTER_BLOCK]]
+            scores[row, start:start + len(block)] = table[subquantizers, block].sum(axis=1)
+    return scores
+
+def _pq_filtered_search(index, queries: np.ndarray, k: int,
+                        allowed: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Top-k de um IndexPQ restrito às posições permitidas, no formato de index.search"""
+    inner_product = index.metric_type == faiss.METRIC_INNER_PRODUCT
+    scores = _pq_filtered_scores(index, queries, allowed)
+    ordered = -scores if inner_product else scores
+    count = min(k, len(allowed))
+    out_scores = np.full((len(queries), k), -np.inf if inner_product else np.inf, dtype=np.float32)
+    out_positions = np.full((len(queries), k), -1, dtype=np.int64)
+    for row in range(len(queries)):
+        top = np.argpartition(ordered[row], count - 1)[:count] if count < len(allowed) else np.arange(count)
+        top = top[np.argsort(ordered[row, top], kind='stable')]
+        out_scores[row, :count] = scores[row, top]
+        out_positions[row, :count] = allowed[top]
+    return out_scores, out_positions
+
+def _subset_index(index, allowed: np.ndarray):
+    subset = faiss.IndexFlat(index.d, index.metric_type)
+    if len(allowed):
+        subset.add(index.reconstruct_batch(allowed))
+    return subset
+
+def search(index, queries: np.ndarray, k: int, nprobe: Optional[int] = None,
+           ef_search: Optional[int] = None, allowed: Optional[np.ndarray] = None,
+           exact_max: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """index.search com parâmetros por requisição e filtro opcional de posições.
+
+    Filtros com até exact_max posições são resolvidos por busca exata sobre
+    os vetores reconstruídos dessas posições: a latência depende do tamanho
+    do filtro, não do índice, e o HNSW não perde resultados por explorar o
+    grafo fora do filtro.
+    """
+    if allowed is not None and _use_subset(index, allowed, exact_max):
+        scores, found = _subset_index(index, allowed).search(queries, k)
+        positions = np.where(found >= 0, allowed[np.maximum(found, 0)] if len(allowed) else -1, -1)
+        return scores, positions
+    if allowed is not None and index_type_of(index) == 'pq':
+        return _pq_filtered_search(index, queries, k, allowed)
+    params = search_parameters(index, nprobe=nprobe, ef_search=ef_search, allowed=allowed,
+                               exhaustive=allowed is not None and len(allowed) <= exact_max)
+    return index.search(queries, k, params=params)
+
+def range_search(index, queries: np.ndarray, radius: float, nprobe: Optional[int] = None,
+                 ef_search: Optional[int] = None, allowed: Optional[np.ndarray] = None,
+                 exact_max: int = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """index.range_search com os mesmos parâmetros e filtro de search"""
+    if allowed is not None and _use_subset(index, allowed, exact_max):
+        limits, scores, found = _subset_index(index, allowed).range_search(queries, radius)
+        return limits, scores, allowed[found]
+    if allowed is not None and index_type_of(index) == 'pq':
+        scores = _pq_filtered_scores(index, queries, allowed)
+        inside = scores > radius if index.metric_type == faiss.METRIC_INNER_PRODUCT else scores < radius
+        limits = np.concatenate([[0], np.cumsum(inside.sum(axis=1))]).astype(np.int64)
+        return limits, scores[inside], np.broadcast_to(allowed, scores.shape)[inside]
+    params = search_parameters(index, nprobe=nprobe, ef_search=ef_search, allowed=allowed,
+                               exhaustive=allowed is not None and len(allowed) <= exact_max)
+    return index.range_search(queries, radius, params=params)
+
+def bytes_per_vector(index) -> int:
+    """Memória aproximada ocupada por vetor (códigos + estruturas auxiliares)"""
+    index_type = index_type_of(index)
+    if index_type == 'ivf':
+        # Código do vetor + id de 8 bytes na lista invertida
+        return int(faiss.try_extract_index_ivf(index).code_size) + 8
+    if index_type == 'hnsw':
+        storage = faiss.downcast_index(index.storage)
+        # Vizinhos da camada 0 (2·M ids de 4 bytes) dominam o grafo
+        return int(storage.code_size) + 2 * int(index.hnsw.nb_neighbors(1)) * 4
+    return int(index.code_size)
+
+def describe_index(index) -> Dict[str, Any]:
+    """Resumo do índice para /status e para o CLI"""
+    per_vector = bytes_per_vector(index)
+    info = {'type': index_type_of(index), 'metric': metric_of(index), 'vectors': int(index.ntotal),
+            'dimension': int(index.d),
+            'bytes_per_vector': per_vector, 'memory_bytes': per_vector * int(index.ntotal)}
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        info.update({'nlist': int(ivf.nlist), 'nprobe': int(ivf.nprobe)})
+    if isinstance(index, faiss.IndexHNSW):
+        info.update({'hnsw_m': int(index.hnsw.nb_neighbors(1)), 'ef_search': int(index.hnsw.efSearch)})
+    if isinstance(index, faiss.IndexPQ):
+        info['pq_m'] = int(index.pq.M)
+    return info
@@ -0,0 +1,157 @@
+import os
+import zlib
+import pickle
+import struct
+import logging
+import threading
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Cabeçalho de cada registro: sequência, tamanho do payload e CRC32 do payload
+_HEADER = struct.Struct('<QII')
+
+class IndexWAL:
+    """Write-ahead log append-only das alterações do índice vetorial.
+
+    Cada lote adicionado (ids, textos, metadados e vetores) ou removido (ids)
+    vira um registro gravado com fsync antes de a operação ser confirmada ao
+    chamador. O índice completo só é regravado no checkpoint, que registra no
+    chunk store a última sequência aplicada e esvazia o log.
+
+    Na carga, os registros posteriores ao último checkpoint são reaplicados.
+    Um registro incompleto no fim do arquivo (queda durante a escrita) é
+    descartado: ele nunca foi confirmado.
+    """
+
+    def __init__(self, path: str, last_checkpoint_seq: int = 0, fsync: bool = True):
+        self.path = path
+        self.fsync = fsync
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        last_seq, valid_bytes = self._scan()
+        if os.path.exists(path) and os.path.getsize(path) > valid_bytes:
+            logger.warning(f"WAL com registro incompleto no fim; truncando {path} em {valid_bytes} bytes")
+            with open(path, 'r+b') as f:
+                f.truncate(valid_bytes)
+        self.last_seq = max(last_seq, last_checkpoint_seq)
+        self._file = open(path, 'ab')
+        self.appended_records = 0
+
+    def _scan(self) -> Tuple[int, int]:
+        """Última sequência válida e tamanho em bytes da parte íntegra do log"""
+        last_seq, valid_bytes = 0, 0
+        for seq, _, end in self._iter_raw():
+            last_seq, valid_bytes = seq, end
+        return last_seq, valid_bytes
+
+    def _iter_raw(self) -> Iterator[Tuple[int, bytes, int]]:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            offset = 0
+            while True:
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    return
+                seq, length, crc = _HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    return
+                offset += _HEADER.size + length
+                yield seq, payload, offset
+
+    def _append(self, record: Dict[str, Any]) -> int:
+        payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self.last_seq += 1
+            self._file.write(_HEADER.pack(self.last_seq, len(payload), zlib.crc32(payload)) + payload)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self.appended_records += 1
+            return self.last_seq
+
+    def append_add(self, ids: List[str], texts: List[str], metadatas: List[Dict], vectors) -> int:
+        """Registra um lote adicionado ao índice"""
+        return self._append({
+            'op': 'add',
+            'ids': list(ids),
+            'texts': list(texts),
+            'metadatas': list(metadatas),
+            'vectors': np.asarray(vectors, dtype=np.float32)
+        })
+
+    def append_delete(self, ids: List[str]) -> int:
+        """Registra ids removidos do índice"""
+        return self._append({'op': 'delete', 'ids': list(ids)})
+
+    def read_records(self, after_seq: int = 0) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Registros íntegros com sequência maior que after_seq, em ordem"""
+        for seq, payload, _ in self._iter_raw():
+            if seq > after_seq:
+                yield seq, pickle.loads(payload)
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            return self._file.tell()
+
+    def truncate(self):
+        """Esvazia o log após um checkpoint (a sequência continua crescendo)"""
+        with self._lock:
+            self._file.truncate(0)
+            self._file.seek(0)
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'path': self.path,
+            'size_bytes': self.size_bytes(),
+            'last_seq': self.last_seq,
+            'appended_records': self.appended_records
+        }
+
+class CheckpointThread(threading.Thread):
+    """Executa checkpoints periódicos ou quando o WAL passa do tamanho limite"""
+
+    def __init__(self, checkpoint, pending_bytes, interval: float, max_bytes: int):
+        super().__init__(name='index-checkpoint', daemon=True)
+        self._checkpoint = checkpoint
+        self._pending_bytes = pending_bytes
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+
+    def notify(self, force: bool = False):
+        """Chamado após cada append: acorda a thread se o log ficou grande (ou se forçado)"""
+        if force or (self.max_bytes and self._pending_bytes() >= self.max_bytes):
+            self._wakeup.set()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stopped.set()
+        self._wakeup.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
+
+    def run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                return
+            try:
+                if self._pending_bytes() > 0:
+                    self._checkpoint()
+            except Exception as e:
+                logger.error(f"Erro no checkpoint do índice: {e}")
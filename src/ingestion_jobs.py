@@ -0,0 +1,236 @@
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed', 'cancelled')
+
+class JobCancelled(Exception):
+    """O job foi cancelado pelo usuário"""
+
+class NoDocumentsError(ValueError):
+    """Nenhum documento suportado no diretório de ingestão"""
+
+class IngestionJob:
+    """Estado e progresso de uma ingestão executada em background.
+
+    O VectorStore recebe o job como `progress` e informa arquivos e chunks
+    processados; entre lotes ele chama raise_if_cancelled, então o
+    cancelamento interrompe a ingestão no próximo lote de embeddings.
+    """
+
+    def __init__(self, job_id: str, params: Optional[Dict[str, Any]] = None):
+        self.job_id = job_id
+        self.params = params or {}
+        self.status = 'queued'
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.files_total = 0
+        self.files_done = 0
+        self.bytes_total = 0
+        self.bytes_done = 0
+        self.current_file: Optional[str] = None
+        self.chunks_total: Optional[int] = None
+        self.chunks_embedded = 0
+        self.chunks_skipped = 0
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def begin_files(self, files: Dict[str, Dict]):
+        """Registra os arquivos a processar (caminho -> {size, ...})"""
+        with self._lock:
+            self.files_total = len(files)
+            self.bytes_total = sum(info.get('size', 0) for info in files.values())
+
+    def set_chunks_total(self, total: int):
+        with self._lock:
+            self.chunks_total = total
+
+    def file_started(self, file_path: str):
+        with self._lock:
+            self.current_file = file_path
+
+    def file_done(self, file_path: str, size: int = 0):
+        with self._lock:
+            self.files_done += 1
+            self.bytes_done += size
+            self.current_file = None
+
+    def add_chunks(self, embedded: int = 0, skipped: int = 0):
+        with self._lock:
+            self.chunks_embedded += embedded
+            self.chunks_skipped += skipped
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._cancel_event.is_set():
+            raise JobCancelled(f"Job {self.job_id} cancelado")
+
+    def is_finished(self) -> bool:
+        return self.status in ('succeeded', 'failed', 'cancelled')
+
+    def _eta_seconds(self, elapsed: float) -> Optional[float]:
+        """Estimativa pelo ritmo de chunks (se o total é conhecido) ou de bytes de arquivos"""
+        if self.status != 'running' or elapsed <= 0:
+            return None
+        processed = self.chunks_embedded + self.chunks_skipped
+        if self.chunks_total and processed:
+            return max(self.chunks_total - processed, 0) * elapsed / processed
+        if self.bytes_done and self.bytes_total:
+            return max(self.bytes_total - self.bytes_done, 0) * elapsed / self.bytes_done
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            end = self.finished_at or time.time()
+            elapsed = end - self.started_at if self.started_at else 0.0
+            eta = self._eta_seconds(elapsed)
+            return {
+                'job_id': self.job_id,
+                'status': self.status,
+                'params': self.params,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'elapsed_seconds': round(elapsed, 3),
+                'files_total': self.files_total,
+                'files_done': self.files_done,
+                'current_file': self.current_file,
+                'chunks_total': self.chunks_total,
+                'chunks_embedded': self.chunks_embedded,
+                'chunks_skipped': self.chunks_skipped,
+                'chunks_per_second': round(self.chunks_embedded / elapsed, 2) if elapsed > 0 else 0.0,
+                'eta_seconds': round(eta, 1) if eta is not None else None,
+                'cancel_requested': self.cancel_requested,
+                'result': self.result,
+                'error': self.error
+            }
+
+class IngestionJobManager:
+    """Fila de jobs de ingestão executados por um pool de threads.
+
+    Com max_workers=1 (padrão) as ingestões rodam uma de cada vez, na ordem
+    de envio, já que todas escrevem no mesmo vector store. Os jobs mais
+    antigos já finalizados são esquecidos além de max_history.
+    """
+
+    def __init__(self, max_workers: int = 1, max_history: int = 100):
+        self.max_history = max_history
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ingestion-job')
+        self._jobs: 'OrderedDict[str, IngestionJob]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, work: Callable[[IngestionJob], Dict[str, Any]],
+               params: Optional[Dict[str, Any]] = None) -> IngestionJob:
+        """Enfileira work(job); o retorno vira job.result"""
+        job = IngestionJob(uuid.uuid4().hex, params)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._trim_history()
+        self._executor.submit(self._run, job, work)
+        logger.info(f"Job de ingestão {job.job_id} enfileirado: {job.params}")
+        return job
+
+    def _run(self, job: IngestionJob, work: Callable[[IngestionJob], Dict[str, Any]]):
+        if job.cancel_requested:
+            job.status = 'cancelled'
+            job.finished_at = time.time()
+            return
+        job.status = 'running'
+        job.started_at = time.time()
+        try:
+            job.result = work(job)
+            job.status = 'succeeded'
+        except JobCancelled as e:
+            job.status = 'cancelled'
+            job.error = str(e)
+        except Exception as e:
+            logger.error(f"Job de ingestão {job.job_id} falhou: {e}")
+            job.status = 'failed'
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            logger.info(f"Job de ingestão {job.job_id} finalizado: {job.status}")
+
+    def _trim_history(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.is_finished()]
+        for job_id in finished[:max(len(self._jobs) - self.max_history, 0)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.to_dict() for job in reversed(jobs)]
+
+    def cancel(self, job_id: str) -> Optional[IngestionJob]:
+        """Pede o cancelamento; jobs na fila nem chegam a executar"""
+        job = self.get(job_id)
+        if job is not None and not job.is_finished():
+            job.cancel()
+        return job
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job.cancel()
+        self._executor.shutdown(wait=wait)
+
+def ingest_directory(vector_store, document_processor, directory: str, full_rebuild: bool = False,
+                     workers: int = 1, progress: Optional[IngestionJob] = None) -> Dict[str, Any]:
+    """Ingere os documentos de um diretório no vector store (usada pela API e pelo CLI).
+
+    Sem full_rebuild, processa apenas arquivos novos, alterados ou
+    removidos. Com full_rebuild, constrói uma nova versão do índice e só a
+    ativa ao final; em caso de erro ou cancelamento a versão atual continua
+    em uso e a parcial é descartada.
+    """
+    target = vector_store.create_version() if full_rebuild else vector_store
+    try:
+        plan, documents_by_file = document_processor.process_changed_documents(
+            directory, target.manifest, max_workers=workers, stream=workers <= 1
+        )
+        if not plan.has_changes() and not plan.unchanged:
+            raise NoDocumentsError(f"Nenhum documento encontrado ou processado em {directory}")
+        try:
+            summary = target.apply_ingestion_plan(plan, documents_by_file, progress=progress)
+        finally:
+            if not full_rebuild:
+                # Incremental: o que já foi aplicado é salvo mesmo se o job for interrompido;
+                # arquivos pendentes continuam marcados como alterados no manifesto
+                target.save_vector_store()
+        if full_rebuild:
+            target.save_vector_store()
+    except Exception:
+        if full_rebuild:
+            vector_store.discard_version(target)
+        raise
+    if full_rebuild:
+        vector_store.activate_version(target)
+
+    return {
+        'full_rebuild': full_rebuild,
+        'index_version': vector_store.version,
+        'ingestion': summary,
+        'documents_processed': summary['chunks_added'],
+        'file_timings': document_processor.last_file_timings
+    }
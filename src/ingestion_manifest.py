@@ -0,0 +1,128 @@
+import os
+import json
+import hashlib
+import logging
+from typing import List, Dict, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+def compute_file_hash(file_path: str, block_size: int = 1024 * 1024) -> str:
+    """Calcula o SHA-256 do conteúdo de um arquivo"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class IngestionPlan:
+    """Resultado da comparação entre o diretório de documentos e o manifesto"""
+
+    def __init__(self):
+        # Arquivos novos ou modificados: caminho -> {size, mtime, sha256}
+        self.changed: Dict[str, Dict] = {}
+        self.added: List[str] = []
+        self.modified: List[str] = []
+        self.removed: List[str] = []
+        self.unchanged: List[str] = []
+
+    def has_changes(self) -> bool:
+        return bool(self.changed or self.removed)
+
+    def summary(self) -> Dict:
+        return {
+            'files_added': len(self.added),
+            'files_modified': len(self.modified),
+            'files_removed': len(self.removed),
+            'files_unchanged': len(self.unchanged)
+        }
+
+class IngestionManifest:
+    """Manifesto persistido dos arquivos já ingeridos no vector store"""
+
+    def __init__(self, manifest_path: str):
+        self.manifest_path = manifest_path
+        self.files: Dict[str, Dict] = {}
+        self._load()
+
+    def _load(self):
+        """Carrega o manifesto do disco, se existir"""
+        if not os.path.exists(self.manifest_path):
+            return
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            if data.get('version') == MANIFEST_VERSION:
+                self.files = data.get('files', {})
+            else:
+                logger.warning(f"Versão de manifesto desconhecida em {self.manifest_path}, ignorando")
+        except Exception as e:
+            logger.error(f"Erro ao carregar manifesto {self.manifest_path}: {str(e)}")
+            self.files = {}
+
+    def exists(self) -> bool:
+        return os.path.exists(self.manifest_path)
+
+    def save(self):
+        """Salva o manifesto de forma atômica"""
+        directory = os.path.dirname(self.manifest_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({'version': MANIFEST_VERSION, 'files': self.files}, file, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def clear(self):
+        """Esquece todos os arquivos e remove o manifesto do disco"""
+        self.files = {}
+        if os.path.exists(self.manifest_path):
+            os.remove(self.manifest_path)
+
+    def get_chunk_ids(self, file_path: str) -> List[str]:
+        entry = self.files.get(os.path.abspath(file_path))
+        return list(entry.get('chunk_ids', [])) if entry else []
+
+    def update_file(self, file_path: str, file_info: Dict, chunk_ids: List[str]):
+        """Registra um arquivo ingerido e os ids dos seus chunks"""
+        entry = dict(file_info)
+        entry['chunk_ids'] = list(chunk_ids)
+        self.files[os.path.abspath(file_path)] = entry
+
+    def remove_file(self, file_path: str):
+        self.files.pop(os.path.abspath(file_path), None)
+
+    def scan(self, file_paths: List[str]) -> IngestionPlan:
+        """Compara os arquivos atuais com o manifesto.
+
+        Tamanho e mtime são verificados primeiro; o hash do conteúdo só é
+        calculado quando eles mudam, para evitar ler arquivos inalterados.
+        """
+        plan = IngestionPlan()
+        current = set()
+
+        for file_path in file_paths:
+            key = os.path.abspath(file_path)
+            current.add(key)
+            stat = os.stat(file_path)
+            entry: Optional[Dict] = self.files.get(key)
+
+            if entry and entry.get('size') == stat.st_size and entry.get('mtime') == stat.st_mtime:
+                plan.unchanged.append(file_path)
+                continue
+
+            sha256 = compute_file_hash(file_path)
+            file_info = {'size': stat.st_size, 'mtime': stat.st_mtime, 'sha256': sha256}
+
+            if entry and entry.get('sha256') == sha256:
+                # Apenas metadados mudaram (ex: touch); atualiza sem reprocessar
+                entry.update(file_info)
+                plan.unchanged.append(file_path)
+            else:
+                plan.changed[file_path] = file_info
+                (plan.modified if entry else plan.added).append(file_path)
+
+        plan.removed = [path for path in self.files if path not in current]
+        return plan
@@ -0,0 +1,245 @@
+import re
+import math
+import logging
+import unicodedata
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Parâmetros padrão do BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Formato do índice salvo; outro valor força a reconstrução a partir do chunk store
+FORMAT_VERSION = 2
+
+# Palavras funcionais do português (já sem acentos) ignoradas na indexação
+STOPWORDS = frozenset("""
+a ao aos aquela aquelas aquele aqueles aquilo as ate com como da das de dela delas dele deles depois
+do dos e ela elas ele eles em entre era eram essa essas esse esses esta estao estas este estes eu foi
+foram ha isso isto ja la lhe lhes mais mas me mesmo meu meus minha minhas muito na nas nao nem no nos
+nossa nossas nosso nossos num numa o os ou para pela pelas pelo pelos por qual quando que quem sao se seja
+sem ser sera seu seus so sua suas tambem te tem tendo ter um uma umas uns voce voces vos
+""".split())
+
+# Plurais e sufixos derivacionais comuns, do mais longo para o mais curto
+_PLURAL_SUFFIXES = (('oes', 'ao'), ('aes', 'ao'), ('ais', 'al'), ('eis', 'el'), ('ois', 'ol'),
+                    ('ns', 'm'), ('res', 'r'), ('les', 'l'), ('zes', 'z'), ('s', ''))
+_DERIVATIONAL_SUFFIXES = ('amentos', 'amento', 'imentos', 'imento', 'amente', 'mente', 'idades', 'idade',
+                          'acoes', 'acao', 'adoras', 'adores', 'adora', 'ador', 'ancias', 'ancia',
+                          'encias', 'encia', 'aveis', 'avel', 'iveis', 'ivel', 'ismos', 'ismo',
+                          'istas', 'ista', 'osas', 'osos', 'osa', 'oso', 'ivas', 'ivos', 'iva', 'ivo')
+
+# Palavras e códigos (SKU-4471-B, 12.345/2020)
+_TOKEN_RE = re.compile(r'[a-z0-9]+(?:[-_./][a-z0-9]+)*')
+
+def fold_accents(text: str) -> str:
+    """Minúsculas sem acentos nem indicadores ordinais (Política → politica, 5º → 5)"""
+    decomposed = unicodedata.normalize('NFKD', text.lower().replace('º', '').replace('ª', ''))
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+def stem(word: str) -> str:
+    """Stemmer leve para português: remove plural, um sufixo derivacional e a vogal final.
+
+    Palavras curtas e tokens com dígitos (códigos, artigos, SKUs) ficam intactos.
+    """
+    if len(word) < 4 or any(char.isdigit() for char in word):
+        return word
+    for suffix, replacement in _PLURAL_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)] + replacement
+            break
+    for suffix in _DERIVATIONAL_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            break
+    if len(word) > 3 and word[-1] in 'aeo':
+        word = word[:-1]
+    return word
+
+def analyze(text: str) -> List[str]:
+    """Termos indexados de um texto: sem acentos, sem stopwords e com stemming.
+
+    Um código composto (SKU-4471-B) gera o termo inteiro e cada parte, para
+    casar tanto a busca pelo código exato quanto por um pedaço dele.
+    """
+    terms = []
+    for token in _TOKEN_RE.findall(fold_accents(text)):
+        parts = re.split(r'[-_./]', token)
+        if len(parts) > 1:
+            terms.append(token)
+        for part in parts:
+            if part in STOPWORDS or (len(part) < 2 and not part.isdigit()):
+                continue
+            terms.append(stem(part))
+    return terms
+
+class LexicalIndex:
+    """Índice invertido BM25 dos chunks, para a parte lexical da busca híbrida.
+
+    Cada termo tem uma posting list compacta (arrays de documentos e
+    frequências). A busca soma os scores BM25 das posting lists dos termos da
+    consulta com NumPy, sem percorrer o corpus.
+
+    Remoções marcam o documento como apagado; as posting lists são
+    compactadas quando os apagados passam de um quarto do total.
+    """
+
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self._doc_ids: List[Optional[str]] = []
+        self._positions: Dict[str, int] = {}
+        self._lengths = array('I')
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._total_length = 0
+        self._deleted = 0
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def ids(self) -> Set[str]:
+        """Ids dos chunks indexados"""
+        return set(self._positions)
+
+    def add(self, doc_ids: List[str], texts: List[str]):
+        """Indexa chunks; um id já indexado é substituído"""
+        self.delete([doc_id for doc_id in doc_ids if doc_id in self._positions])
+        for doc_id, text in zip(doc_ids, texts):
+            terms = analyze(text)
+            position = len(self._doc_ids)
+            self._doc_ids.append(doc_id)
+            self._positions[doc_id] = position
+            self._lengths.append(len(terms))
+            self._total_length += len(terms)
+            for term, frequency in Counter(terms).items():
+                docs, frequencies = self._postings.setdefault(term, (array('I'), array('H')))
+                docs.append(position)
+                frequencies.append(min(frequency, 65535))
+
+    def delete(self, doc_ids: Iterable[str]):
+        for doc_id in doc_ids:
+            position = self._positions.pop(doc_id, None)
+            if position is None:
+                continue
+            self._doc_ids[position] = None
+            self._total_length -= self._lengths[position]
+            self._lengths[position] = 0
+            self._deleted += 1
+        if self._deleted > max(len(self._doc_ids) // 4, 1000):
+            self._compact()
+
+    def _compact(self):
+        """Remove os documentos apagados das posting lists e renumera os restantes"""
+        alive = np.array([doc_id is not None for doc_id in self._doc_ids], dtype=bool)
+        new_position = np.cumsum(alive) - 1
+        postings = {}
+        for term, (docs, frequencies) in self._postings.items():
+            docs = np.array(docs, dtype=np.int64)
+            keep = alive[docs]
+            if keep.any():
+                postings[term] = (array('I', new_position[docs[keep]].astype(np.uint32).tobytes()),
+                                  array('H', np.array(frequencies, dtype=np.uint16)[keep].tobytes()))
+        self._postings = postings
+        self._doc_ids = [doc_id for doc_id in self._doc_ids if doc_id is not None]
+        self._positions = {doc_id: position for position, doc_id in enumerate(self._doc_ids)}
+        self._lengths = array('I', np.array(self._lengths, dtype=np.uint32)[alive].tobytes())
+        self._deleted = 0
+
+    def search(self, query: str, k: int = 10,
+               allowed_ids: Optional[Set[str]] = None) -> List[Tuple[str, float]]:
+        """Os k chunks de maior score BM25 para a consulta (apenas os com algum termo em comum).
+
+        Só as posting lists dos termos da consulta são lidas: o custo depende
+        de quantos chunks contêm esses termos, não do tamanho do corpus.
+        """
+        terms = set(analyze(query))
+        if not terms or not self._positions:
+            return []
+        lengths = np.frombuffer(self._lengths, dtype=np.uint32)
+        average_length = max(self._total_length / len(self._positions), 1e-9)
+        doc_lists, score_lists = [], []
+        for term in terms:
+            if term not in self._postings:
+                continue
+            docs, frequencies = self._postings[term]
+            docs = np.frombuffer(docs, dtype=np.uint32)
+            frequencies = np.frombuffer(frequencies, dtype=np.uint16).astype(np.float32)
+            # df inclui apagados ainda não compactados: diferença pequena no idf
+            df = min(len(docs), len(self._positions))
+            idf = math.log(1 + (len(self._positions) - df + 0.5) / (df + 0.5))
+            norms = self.k1 * (1 - self.b + self.b * lengths[docs] / average_length)
+            doc_lists.append(docs)
+            score_lists.append(idf * frequencies * (self.k1 + 1) / (frequencies + norms))
+        if not doc_lists:
+            return []
+        candidates, inverse = np.unique(np.concatenate(doc_lists), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_lists))
+        # Apagados ficam com comprimento 0 até a compactação
+        keep = lengths[candidates] > 0
+        if allowed_ids is not None:
+            allowed = [self._positions[doc_id] for doc_id in allowed_ids if doc_id in self._positions]
+            keep &= np.isin(candidates, allowed)
+        candidates, scores = candidates[keep], scores[keep]
+        if len(candidates) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            candidates, scores = candidates[top], scores[top]
+        order = np.argsort(-scores, kind='stable')
+        return [(self._doc_ids[candidates[i]], float(scores[i])) for i in order]
+
+    def to_records(self) -> Tuple[Dict[str, Any], List[Tuple[int, Optional[str], int]],
+                                  List[Tuple[str, bytes, bytes]]]:
+        """Índice em registros para o chunk store: parâmetros, documentos e posting lists.
+
+        Só dados simples (números, textos e arrays em bytes), sem pickle.
+        """
+        header = {'format': FORMAT_VERSION, 'k1': self.k1, 'b': self.b}
+        documents = [(position, doc_id, length)
+                     for position, (doc_id, length) in enumerate(zip(self._doc_ids, self._lengths))]
+        postings = [(term, docs.tobytes(), frequencies.tobytes())
+                    for term, (docs, frequencies) in self._postings.items()]
+        return header, documents, postings
+
+    @classmethod
+    def from_records(cls, header: Dict[str, Any], documents: Iterable[Tuple[Optional[str], int]],
+                     postings: Iterable[Tuple[str, bytes, bytes]]) -> Optional['LexicalIndex']:
+        """Remonta um índice salvo com to_records; None se for de outro formato"""
+        if header.get('format') != FORMAT_VERSION:
+            return None
+        index = cls(k1=header['k1'], b=header['b'])
+        for doc_id, length in documents:
+            index._doc_ids.append(doc_id)
+            index._lengths.append(length)
+        index._positions = {doc_id: position for position, doc_id in enumerate(index._doc_ids)
+                            if doc_id is not None}
+        for term, docs, frequencies in postings:
+            index._postings[term] = (array('I', docs), array('H', frequencies))
+        index._total_length = int(sum(index._lengths))
+        index._deleted = len(index._doc_ids) - len(index._positions)
+        return index
+
+    @classmethod
+    def build(cls, chunks: Iterable[Tuple[str, str]], batch_size: int = 1000) -> 'LexicalIndex':
+        """Monta o índice a partir de (id, texto) de todos os chunks"""
+        index = cls()
+        batch = []
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= batch_size:
+                index.add(*map(list, zip(*batch)))
+                batch = []
+        if batch:
+            index.add(*map(list, zip(*batch)))
+        return index
+
+    def get_stats(self):
+        return {
+            'documents': len(self._positions),
+            'terms': len(self._postings),
+            'deleted_pending': self._deleted,
+            'average_length': round(self._total_length / len(self._positions), 1) if self._positions else 0.0
+        }
@@ -0,0 +1,122 @@
+import logging
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Metadados definidos pelo DocumentProcessor que podem filtrar buscas
+FILTER_FIELDS = ('source', 'file_type')
+
+def parse_filters(filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, List[str]]]:
+    """Valida um filtro {'campo': valor ou [valores]} e o normaliza para listas.
+
+    Valores do mesmo campo são alternativas (OU); campos diferentes precisam
+    ser atendidos juntos (E). Sem filtro, retorna None.
+    """
+    if not filters:
+        return None
+    if not isinstance(filters, dict):
+        raise ValueError("Filtro deve ser um objeto {campo: valor ou [valores]}")
+    parsed = {}
+    for field, values in filters.items():
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"Campo de filtro inválido: {field} (use {', '.join(FILTER_FIELDS)})")
+        values = values if isinstance(values, (list, tuple)) else [values]
+        if not values or not all(isinstance(value, str) and value for value in values):
+            raise ValueError(f"Valores do filtro '{field}' devem ser textos não vazios")
+        parsed[field] = list(dict.fromkeys(values))
+    return parsed
+
+class MetadataIndex:
+    """Índice invertido metadado → posições no índice FAISS.
+
+    Para cada valor de source e file_type guarda as posições dos chunks, em
+    ordem crescente. Uma busca filtrada combina as listas dos valores pedidos
+    e o faiss recebe o resultado como bitmap (IDSelectorBitmap), descartando
+    os demais vetores dentro da própria busca em vez de filtrar os k
+    resultados depois.
+
+    Acompanha as posições do índice: adições entram no fim e remoções
+    compactam as posições seguintes, como o índice FAISS faz; em índices
+    que não compactam (IVF, HNSW), discard só tira as posições apagadas.
+    """
+
+    def __init__(self, fields: Tuple[str, ...] = FILTER_FIELDS):
+        self.fields = fields
+        self.size = 0
+        self._postings: Dict[str, Dict[str, array]] = {field: {} for field in fields}
+
+    @classmethod
+    def build(cls, rows: Iterable[Tuple[int, Dict[str, Any]]], size: int,
+              fields: Tuple[str, ...] = FILTER_FIELDS) -> 'MetadataIndex':
+        """Monta o índice a partir de (posição, metadados) em ordem de posição"""
+        metadata_index = cls(fields)
+        for position, metadata in rows:
+            metadata_index._add_one(position, metadata)
+        metadata_index.size = size
+        return metadata_index
+
+    def _add_one(self, position: int, metadata: Dict[str, Any]):
+        for field in self.fields:
+            value = metadata.get(field)
+            if value is not None:
+                self._postings[field].setdefault(str(value), array('q')).append(position)
+
+    def add(self, metadatas: List[Dict[str, Any]]):
+        """Registra chunks adicionados no fim do índice"""
+        for offset, metadata in enumerate(metadatas):
+            self._add_one(self.size + offset, metadata)
+        self.size += len(metadatas)
+
+    def remove(self, positions: Iterable[int]):
+        """Remove posições e renumera as seguintes"""
+        removed = np.unique(np.asarray(list(positions), dtype=np.int64))
+        if len(removed) == 0:
+            return
+        for postings in self._postings.values():
+            for value in list(postings):
+                current = np.array(postings[value], dtype=np.int64)
+                kept = current[~np.isin(current, removed, assume_unique=True)]
+                if len(kept):
+                    postings[value] = array('q', (kept - np.searchsorted(removed, kept)).tobytes())
+                else:
+                    del postings[value]
+        self.size -= len(removed)
+
+    def discard(self, positions: Iterable[int]):
+        """Tira posições apagadas sem renumerar as seguintes (o tamanho não muda)"""
+        removed = np.unique(np.asarray(list(positions), dtype=np.int64))
+        if len(removed) == 0:
+            return
+        for postings in self._postings.values():
+            for value in list(postings):
+                current = np.array(postings[value], dtype=np.int64)
+                kept = current[~np.isin(current, removed, assume_unique=True)]
+                if len(kept) == len(current):
+                    continue
+                if len(kept):
+                    postings[value] = array('q', kept.tobytes())
+                else:
+                    del postings[value]
+
+    def positions(self, filters: Dict[str, List[str]]) -> np.ndarray:
+        """Posições (ordenadas) dos chunks que atendem ao filtro já validado"""
+        selected = None
+        for field, values in filters.items():
+            postings = self._postings.get(field, {})
+            lists = [np.array(postings[value], dtype=np.int64) for value in values if value in postings]
+            matched = np.unique(np.concatenate(lists)) if lists else np.zeros(0, dtype=np.int64)
+            selected = matched if selected is None else np.intersect1d(selected, matched, assume_unique=True)
+        return selected if selected is not None else np.arange(self.size, dtype=np.int64)
+
+    def values(self, field: str) -> List[str]:
+        """Valores conhecidos de um campo (ex.: arquivos indexados)"""
+        return sorted(self._postings.get(field, {}))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'vectors': self.size,
+            'fields': {field: len(postings) for field, postings in self._postings.items()}
+        }
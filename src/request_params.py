@@ -0,0 +1,28 @@
+import math
+
+def number_param(data, name: str, default=None, integer: bool = False, minimum=None, maximum=None):
+    """Lê um parâmetro numérico opcional da requisição, levantando ValueError se inválido"""
+    value = data.get(name, default)
+    if value is None:
+        return None
+    kind = "inteiro" if integer else "número"
+    try:
+        if isinstance(value, bool):
+            raise ValueError
+        number = float(value)
+        if not math.isfinite(number) or (integer and not number.is_integer()):
+            raise ValueError
+    except (TypeError, ValueError):
+        raise ValueError(f"Parâmetro '{name}' deve ser um {kind}")
+    number = int(number) if integer else number
+    if (minimum is not None and number < minimum) or (maximum is not None and number > maximum):
+        limits = f"entre {minimum} e {maximum}" if maximum is not None else f"maior ou igual a {minimum}"
+        raise ValueError(f"Parâmetro '{name}' deve ser um {kind} {limits}")
+    return number
+
+def bool_param(data, name: str, default: bool) -> bool:
+    """Lê um parâmetro booleano da requisição, levantando ValueError se não for true/false"""
+    value = data.get(name, default)
+    if not isinstance(value, bool):
+        raise ValueError(f"Parâmetro '{name}' deve ser true ou false")
+    return value
@@ -0,0 +1,111 @@
+import logging
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Sobreposição mínima para descartar texto repetido entre chunks vizinhos;
+# coincidências menores (uma letra, uma pontuação) não são overlap do splitter
+MIN_OVERLAP = 10
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def mmr(query_vector, candidate_vectors, k: int, lambda_mult: float = 0.5) -> List[int]:
+    """Seleciona k candidatos por maximal marginal relevance (MMR).
+
+    A cada passo escolhe o candidato que maximiza
+    lambda·sim(consulta, c) - (1 - lambda)·max sim(c, já escolhidos),
+    com similaridade de cosseno. lambda=1 mantém a ordem por relevância;
+    valores menores penalizam trechos parecidos com os já escolhidos (ex.:
+    chunks vizinhos que compartilham o overlap).
+
+    As similaridades vêm de dois produtos matriciais (consulta × candidatos
+    e candidatos × candidatos); cada passo só atualiza um vetor com o
+    máximo por candidato. Retorna os índices escolhidos, em ordem.
+    """
+    candidates = _normalize_rows(np.asarray(candidate_vectors, dtype=np.float32).reshape(-1, np.size(query_vector)))
+    count = len(candidates)
+    k = min(k, count)
+    if k <= 0:
+        return []
+    query = _normalize_rows(np.asarray(query_vector, dtype=np.float32).reshape(1, -1))[0]
+
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+    redundancy = np.full(count, -np.inf, dtype=np.float32)
+    available = np.ones(count, dtype=bool)
+    selected = []
+    for _ in range(k):
+        # No primeiro passo não há redundância: vence o mais relevante
+        scores = relevance if not selected else lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores = np.where(available, scores, -np.inf)
+        chosen = int(np.argmax(scores))
+        selected.append(chosen)
+        available[chosen] = False
+        redundancy = np.maximum(redundancy, similarity[chosen])
+    return selected
+
+def _overlap_length(first: str, second: str, max_overlap: Optional[int] = None,
+                    min_overlap: int = MIN_OVERLAP) -> int:
+    """Tamanho do maior final de first que é também o início de second"""
+    limit = min(len(first), len(second))
+    if max_overlap is not None:
+        limit = min(limit, max_overlap)
+    for length in range(limit, min_overlap - 1, -1):
+        if first.endswith(second[:length]):
+            return length
+    return 0
+
+def _merge_run(run: List[Tuple[int, int, Document, float]], max_overlap: Optional[int]) -> Tuple[Document, float]:
+    """Junta chunks consecutivos (chunk_id, posição, documento, score) em um único trecho"""
+    first = run[0][2]
+    if len(run) == 1:
+        return first, run[0][3]
+    content = first.page_content
+    for _, _, doc, _ in run[1:]:
+        overlap = _overlap_length(content, doc.page_content, max_overlap)
+        # Sem overlap reconhecível os textos são apenas concatenados: nada é perdido
+        content += doc.page_content[overlap:] if overlap else "\n" + doc.page_content
+    metadata = dict(first.metadata)
+    metadata['chunk_ids'] = [chunk_id for chunk_id, _, _, _ in run]
+    return Document(id=first.id, page_content=content, metadata=metadata), min(score for _, _, _, score in run)
+
+def merge_adjacent_chunks(documents_with_scores: List[Tuple[Document, float]],
+                          max_overlap: Optional[int] = None) -> List[Tuple[Document, float]]:
+    """Une chunks recuperados que são vizinhos no mesmo arquivo, sem repetir o overlap.
+
+    Chunks do mesmo source com chunk_id consecutivos (ex.: 7, 8 e 9) viram
+    um único trecho: o início de cada chunk que repete o final do anterior
+    (até max_overlap caracteres, o CHUNK_OVERLAP da ingestão) é removido. O
+    trecho fica na posição do seu chunk mais bem colocado, com o melhor
+    score entre eles e a lista de chunks em metadata['chunk_ids'].
+    """
+    runs = []
+    by_source: Dict[str, List[Tuple[int, int, Document, float]]] = {}
+    for position, (doc, score) in enumerate(documents_with_scores):
+        chunk_id = doc.metadata.get('chunk_id')
+        if isinstance(chunk_id, int) and 'source' in doc.metadata:
+            by_source.setdefault(doc.metadata['source'], []).append((chunk_id, position, doc, score))
+        else:
+            runs.append([(chunk_id, position, doc, score)])
+
+    for items in by_source.values():
+        items.sort(key=lambda item: (item[0], item[1]))
+        run = [items[0]]
+        for item in items[1:]:
+            if item[0] == run[-1][0] + 1:
+                run.append(item)
+            else:
+                runs.append(run)
+                run = [item]
+        runs.append(run)
+
+    runs.sort(key=lambda run: min(position for _, position, _, _ in run))
+    merged = [_merge_run(run, max_overlap) for run in runs]
+    if len(merged) < len(documents_with_scores):
+        logger.info(f"{len(documents_with_scores)} chunks unidos em {len(merged)} trechos")
+    return merged
@@ -0,0 +1,86 @@
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any
+
+class ReadWriteLock:
+    """Lock de leitores/escritor com preferência para o escritor.
+
+    Vários leitores (buscas) entram ao mesmo tempo; o escritor (alteração
+    do índice) espera os leitores em andamento terminarem e impede a
+    entrada de novos enquanto aguarda, para que buscas contínuas não o
+    deixem esperando indefinidamente.
+
+    O escritor é reentrante e pode abrir seções de leitura na mesma thread.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._writer_depth = 0
+        self._writers_waiting = 0
+        self._write_wait_seconds = 0.0
+        self._writes = 0
+        self._reads = 0
+
+    @contextmanager
+    def read_lock(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                # Leitura dentro de uma escrita da própria thread
+                self._reads += 1
+                reentrant = True
+            else:
+                reentrant = False
+                while self._writer is not None or self._writers_waiting:
+                    self._cond.wait()
+                self._readers += 1
+                self._reads += 1
+        try:
+            yield
+        finally:
+            if not reentrant:
+                with self._cond:
+                    self._readers -= 1
+                    if self._readers == 0:
+                        self._cond.notify_all()
+
+    @contextmanager
+    def write_lock(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._writer_depth += 1
+            else:
+                start = time.perf_counter()
+                self._writers_waiting += 1
+                try:
+                    while self._writer is not None or self._readers:
+                        self._cond.wait()
+                finally:
+                    self._writers_waiting -= 1
+                self._writer = me
+                self._writer_depth = 1
+                self._writes += 1
+                self._write_wait_seconds += time.perf_counter() - start
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer_depth -= 1
+                if self._writer_depth == 0:
+                    self._writer = None
+                    self._cond.notify_all()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'active_readers': self._readers,
+                'writer_active': self._writer is not None,
+                'writers_waiting': self._writers_waiting,
+                'reads': self._reads,
+                'writes': self._writes,
+                'write_wait_seconds': round(self._write_wait_seconds, 4)
+            }
@@ -1,112 +1,1179 @@
 import os
-import pickle
+import copy
+import time
+import uuid
+import shutil
 import logging
-from typing import List, Dict, Tuple
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Set, Tuple, Iterable, Optional
 import numpy as np
+import faiss
 from langchain_community.vectorstores import FAISS
-from langchain_aws import BedrockEmbeddings
 from langchain_core.documents import Document
-import boto3
+from src.bedrock_client import get_client_factory
+from src.chunk_store import ChunkStore, read_meta
+from src.index_wal import IndexWAL, CheckpointThread
+from src.rwlock import ReadWriteLock
+from src.metadata_index import MetadataIndex, FILTER_FIELDS, parse_filters
+from src.lexical_index import LexicalIndex
+from src.reranking import mmr
+from src import index_factory
+from src.ingestion_manifest import IngestionManifest, IngestionPlan
+from src.document_processor import ChunkIdAssigner
+from src.embedding_pipeline import EmbeddingPipeline, create_embeddings
+from src.embedding_cache import EmbeddingCache, CachedEmbeddings, QueryEmbeddingCache
+
+try:
+    import fcntl
+except ImportError:
+    # Sem flock (Windows): todo processo abre o vector store para escrita
+    fcntl = None
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class EmbeddingMismatchError(ValueError):
+    """O índice em disco foi criado com outro modelo ou dimensão de embedding"""
+
+class ReadOnlyVectorStoreError(RuntimeError):
+    """Alteração pedida a um processo que não é o escritor do vector store"""
+
+def find_index_file(vector_store_path: str) -> str:
+    """Arquivo .faiss em uso em um vector store, para ferramentas que leem o índice direto.
+    
+    Segue o ponteiro CURRENT até a versão ativa (layout antigo: o próprio
+    diretório) e usa o nome registrado no chunk store pelo último checkpoint.
+    """
+    active_path = vector_store_path
+    try:
+        with open(os.path.join(vector_store_path, 'CURRENT'), encoding='utf-8') as f:
+            version = f.read().strip()
+        if version and os.path.isdir(os.path.join(vector_store_path, 'versions', version)):
+            active_path = os.path.join(vector_store_path, 'versions', version)
+    except FileNotFoundError:
+        pass
+    name = read_meta(os.path.join(active_path, 'chunks.sqlite'), 'index_file')
+    return os.path.join(active_path, name or 'index.faiss')
+
 class VectorStore:
-    def __init__(self, aws_region: str, embedding_model_id: str, vector_store_path: str):
+    def __init__(self, aws_region: str, embedding_model_id: str, vector_store_path: str,
+                 embedding_concurrency: int = 8, embedding_batch_size: int = 32,
+                 embedding_backend: str = 'bedrock', fake_embedding_latency: float = 0.0,
+                 fake_embedding_size: int = 1024, embedding_cache_path: Optional[str] = None,
+                 embedding_cache_max_entries: int = 200000, query_cache_size: int = 1024,
+                 query_cache_ttl: float = 3600, bedrock_client=None, index_mmap: bool = False,
+                 index_type: str = 'flat', index_nprobe: int = 16, index_ef_search: int = 64,
+                 index_rerank_factor: int = 4, index_retrain_factor: float = 4,
+                 index_metric: str = 'cosine', embedding_dimensions: Optional[int] = None,
+                 reset_on_embedding_change: bool = False, wal_enabled: bool = True,
+                 wal_checkpoint_interval: float = 60, wal_checkpoint_bytes: int = 64 * 1024 * 1024,
+                 keep_index_versions: int = 2, version_check_interval: float = 5.0,
+                 filter_exact_max: int = 2048, hybrid_search: bool = False, hybrid_rrf_k: int = 60,
+                 hybrid_candidate_factor: int = 4,
+                 mmr_lambda: float = 0.5, mmr_candidate_factor: int = 4):
         self.aws_region = aws_region
         self.embedding_model_id = embedding_model_id
         self.vector_store_path = vector_store_path
         self.vector_store = None
+        # Versões do índice (builds blue/green): versions/<versão>, apontada por CURRENT.
+        # Sem CURRENT, o índice fica direto em vector_store_path (layout antigo).
+        self.keep_index_versions = max(keep_index_versions, 1)
+        self.version_check_interval = version_check_interval
+        self._last_version_check = time.monotonic()
+        self._version_lock = threading.Lock()
+        self._set_active_version(self._read_current_version())
+        # Índice FAISS mapeado em memória (somente leitura até a primeira alteração)
+        self.index_mmap = index_mmap
+        self._index_mmapped = False
+        self.index_load_seconds = 0.0
+        # Tipo de índice (flat, ivf, hnsw ou auto) e parâmetros de busca padrão
+        index_factory.resolve_index_type(index_type, 0)
+        self.index_type = index_type
+        self.index_nprobe = index_nprobe
+        self.index_ef_search = index_ef_search
+        # Métrica dos índices novos; um índice existente mantém a sua até ser reconstruído
+        if index_metric not in index_factory.METRICS:
+            raise ValueError(f"Métrica inválida: {index_metric} (use {', '.join(index_factory.METRICS)})")
+        self.index_metric = index_metric
+        # Índices quantizados buscam k·fator candidatos e re-ranqueiam com os vetores originais
+        self.index_rerank_factor = index_rerank_factor
+        # IVF/SQ8/PQ são treinados de novo quando o corpus passa de fator × vetores do treino (0 desativa)
+        self.index_retrain_factor = index_retrain_factor
+        self._index_trained_vectors: Optional[int] = None
+        # Textos e metadados dos chunks, lidos do disco sob demanda
+        self.chunk_store: Optional[ChunkStore] = None
+        # Posições do índice por source/file_type, para buscas filtradas dentro do faiss;
+        # filtros com até filter_exact_max chunks são buscados de forma exata só entre eles
+        self.metadata_index = MetadataIndex()
+        self.filter_exact_max = filter_exact_max
+        # Posições apagadas de índices que não compactam (IVF, HNSW): ficam fora das buscas
+        # por seletor até a reconstrução do índice em background
+        self._deleted_positions = np.zeros(0, dtype=np.int64)
+        self._live_positions: Optional[np.ndarray] = None
+        # Índice BM25 dos chunks para a busca híbrida (lexical + vetorial, fundidas por RRF).
+        # Carregado na inicialização só com hybrid_search; senão, na primeira busca híbrida
+        self.lexical_preload = hybrid_search
+        self.lexical_index: Optional[LexicalIndex] = None
+        self._lexical_lock = threading.Lock()
+        self.hybrid_rrf_k = hybrid_rrf_k
+        self.hybrid_candidate_factor = hybrid_candidate_factor
+        # Diversificação por MMR: busca k·fator candidatos e escolhe k pouco redundantes entre si
+        self.mmr_lambda = mmr_lambda
+        self.mmr_candidate_factor = mmr_candidate_factor
+        # Versão do corpus: muda a cada alteração do índice (invalida caches de respostas)
+        self.corpus_version = uuid.uuid4().hex
+        # Write-ahead log: alterações confirmadas sem regravar o índice inteiro
+        self.wal_enabled = wal_enabled
+        self.wal: Optional[IndexWAL] = None
+        self.last_checkpoint_seconds = 0.0
+        # Escritores (ingestão, checkpoint, troca de versão) se revezam no mutation lock;
+        # buscas compartilham o lock de leitura e só esperam as alterações do índice em memória
+        self._mutation_lock = threading.RLock()
+        self._index_lock = ReadWriteLock()
         
-        # Inicializa cliente Bedrock
-        self.bedrock_client = boto3.client(
-            service_name='bedrock-runtime',
-            region_name=aws_region
-        )
+        # Cliente Bedrock compartilhado (injetado ou obtido da fábrica única)
+        self.bedrock_client = bedrock_client or self._create_bedrock_client()
         
-        # Inicializa embeddings
-        self.embeddings = BedrockEmbeddings(
+        # Inicializa embeddings; a chave (modelo + dimensão) identifica o espaço vetorial
+        self.reset_on_embedding_change = reset_on_embedding_change
+        # embedding_dimensions passa a ser a dimensão aplicada (None se o modelo a ignora)
+        self.embeddings, self.embedding_key, self.embedding_dimensions = create_embeddings(
+            embedding_backend,
+            embedding_model_id,
             client=self.bedrock_client,
-            model_id=embedding_model_id
+            dimensions=embedding_dimensions,
+            fake_size=fake_embedding_size,
+            fake_latency=fake_embedding_latency
         )
         
-        # Carrega ou cria vector store
-        self._load_or_create_vector_store()
+        # Cache persistente de embeddings, consultado antes de chamar o Bedrock
+        self.embedding_cache = None
+        if embedding_cache_path:
+            self.embedding_cache = EmbeddingCache(embedding_cache_path, max_entries=embedding_cache_max_entries)
+            self.embeddings = CachedEmbeddings(self.embeddings, self.embedding_cache, self.embedding_key)
+        
+        # Cache LRU/TTL dos embeddings de consultas (caminho quente do /chat)
+        self.query_cache = QueryEmbeddingCache(capacity=query_cache_size, ttl_seconds=query_cache_ttl)
+        
+        # Pipeline de embeddings concorrentes usado na ingestão
+        self.embedding_pipeline = EmbeddingPipeline(
+            self.embeddings,
+            max_concurrency=embedding_concurrency,
+            batch_size=embedding_batch_size
+        )
+        
+        # Só o processo com o lock de escritor grava WAL, checkpoints e chunk store;
+        # os demais abrem o índice somente para leitura e adotam os checkpoints dele
+        self._writer_lock_file = None
+        self._checkpoint_thread = None
+        self._index_generation = None
+        self.read_only = not self._acquire_writer_lock()
+        self.wal_enabled = self.wal_enabled and not self.read_only
+        
+        # Carrega ou cria vector store e reaplica o que ficou no WAL desde o último checkpoint
+        try:
+            self._load_or_create_vector_store()
+            if self.wal_enabled:
+                self._replay_wal()
+        except Exception:
+            # Sem a instância, ninguém mais liberaria o lock de escritor
+            self.close()
+            raise
+        if self.wal_enabled and wal_checkpoint_interval > 0:
+            self._checkpoint_thread = CheckpointThread(
+                self._checkpoint_in_background,
+                lambda: self.wal.size_bytes() if self.wal else 0,
+                interval=wal_checkpoint_interval,
+                max_bytes=wal_checkpoint_bytes
+            )
+            self._checkpoint_thread.start()
+    
+    def _writer_lock_path(self) -> str:
+        # Fora do diretório do vector store, que é apagado e recriado por clear_vector_store
+        return self.vector_store_path.rstrip(os.sep) + '_writer.lock'
+    
+    def _acquire_writer_lock(self) -> bool:
+        """Tenta ser o único processo escritor (flock exclusivo, liberado ao fechar ou sair)"""
+        if fcntl is None:
+            return True
+        directory = os.path.dirname(self._writer_lock_path())
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lock_file = open(self._writer_lock_path(), 'a')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            logger.info(f"Outro processo é o escritor de {self.vector_store_path}; abrindo somente para leitura")
+            return False
+        self._writer_lock_file = lock_file
+        return True
+    
+    def _require_writer(self):
+        if self.read_only:
+            raise ReadOnlyVectorStoreError(
+                f"Vector store {self.vector_store_path} aberto somente para leitura: outro processo é o "
+                f"escritor; faça as alterações por ele"
+            )
+    
+    def _bump_corpus_version(self):
+        """Marca que o conteúdo do índice mudou"""
+        self.corpus_version = uuid.uuid4().hex
+    
+    def _create_bedrock_client(self):
+        """Obtém o cliente do Bedrock Runtime da fábrica compartilhada"""
+        return get_client_factory().get_client('bedrock-runtime', region_name=self.aws_region)
     
     def _load_or_create_vector_store(self):
-        """Carrega vector store existente ou cria um novo"""
+        """Carrega o vector store existente ou cria um novo se ainda não há nada salvo.
+        
+        Um erro inesperado na carga é propagado: criar um índice vazio por
+        cima de um corpus que só não pôde ser lido agora o apagaria no
+        próximo checkpoint.
+        """
+        if self.read_only and (not os.path.exists(os.path.join(self.active_path, 'chunks.sqlite')) or
+                               not os.path.exists(self._index_file())):
+            # O escritor ainda não salvou nada: o índice é adotado em refresh_version
+            logger.info("Vector store ainda não criado pelo processo escritor")
+            return
         try:
-            if os.path.exists(self.vector_store_path):
+            if os.path.exists(self._index_file()):
                 logger.info("Carregando vector store existente...")
-                self.vector_store = FAISS.load_local(
-                    self.vector_store_path, 
-                    self.embeddings,
-                    allow_dangerous_deserialization=True
-                )
+                self.vector_store = self._read_vector_store()
                 logger.info("Vector store carregado com sucesso")
+            elif self._open_chunk_store().load_index_map():
+                raise FileNotFoundError(
+                    f"Chunk store com chunks indexados, mas o índice {self._index_file()} não existe; "
+                    f"restaure o arquivo ou reconstrua com: python ingest.py --full"
+                )
             else:
                 logger.info("Criando novo vector store...")
-                # Cria um vector store vazio
-                dummy_doc = Document(page_content="dummy", metadata={})
-                self.vector_store = FAISS.from_documents([dummy_doc], self.embeddings)
-                # Remove o documento dummy
-                self.vector_store.delete([0])
+                self.vector_store = self._create_empty_vector_store()
                 logger.info("Novo vector store criado")
+        except EmbeddingMismatchError as e:
+            if not self.reset_on_embedding_change or self.read_only:
+                raise
+            logger.warning(f"{e}. Descartando o índice existente para reconstruí-lo")
+            self._remove_vector_store_files()
+            self.vector_store = self._create_empty_vector_store()
         except Exception as e:
-            logger.error(f"Erro ao carregar/criar vector store: {str(e)}")
-            # Cria um novo em caso de erro
-            dummy_doc = Document(page_content="dummy", metadata={})
-            self.vector_store = FAISS.from_documents([dummy_doc], self.embeddings)
+            logger.error(f"Erro ao carregar o vector store de {self.active_path}: {str(e)}")
+            raise
     
-    def add_documents(self, documents: List[Document]):
-        """Adiciona documentos ao vector store"""
-        if not documents:
-            logger.warning("Nenhum documento para adicionar")
+    def _index_file(self) -> str:
+        """Arquivo do índice confirmado no último checkpoint (registrado no chunk store)"""
+        name = self._open_chunk_store().get_meta('index_file')
+        # Índices salvos antes da numeração por checkpoint usam o nome fixo
+        return os.path.join(self.active_path, name or 'index.faiss')
+    
+    def _current_file(self) -> str:
+        return os.path.join(self.vector_store_path, 'CURRENT')
+    
+    def _version_dir(self, version: str) -> str:
+        return os.path.join(self.vector_store_path, 'versions', version)
+    
+    def _read_current_version(self) -> Optional[str]:
+        """Versão ativa indicada pelo ponteiro CURRENT (None no layout antigo)"""
+        try:
+            with open(self._current_file(), encoding='utf-8') as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return version if version and os.path.isdir(self._version_dir(version)) else None
+    
+    def _write_current_version(self, version: str):
+        """Troca o ponteiro CURRENT de forma atômica"""
+        tmp_file = self._current_file() + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self._current_file())
+    
+    def _set_active_version(self, version: Optional[str]):
+        """Aponta índice, chunk store, WAL e manifesto para o diretório da versão"""
+        self.version = version
+        if version:
+            self.active_path = self._version_dir(version)
+            manifest_path = os.path.join(self.active_path, 'manifest.json')
+        else:
+            self.active_path = self.vector_store_path
+            # Manifesto de ingestão incremental, mantido ao lado do vector store
+            manifest_path = self.vector_store_path.rstrip(os.sep) + '_manifest.json'
+        self.manifest = IngestionManifest(manifest_path)
+    
+    def list_versions(self) -> List[str]:
+        """Versões do índice em disco, da mais antiga para a mais nova"""
+        versions_dir = os.path.join(self.vector_store_path, 'versions')
+        if not os.path.isdir(versions_dir):
+            return []
+        return sorted(name for name in os.listdir(versions_dir)
+                      if os.path.isdir(os.path.join(versions_dir, name)))
+    
+    def _version_copy(self, version: str) -> 'VectorStore':
+        """Instância apontando para outra versão, compartilhando embeddings e caches"""
+        staging = copy.copy(self)
+        staging._set_active_version(version)
+        staging.vector_store = None
+        staging.chunk_store = None
+        staging.metadata_index = MetadataIndex()
+        staging._set_deleted_positions([])
+        staging._index_trained_vectors = None
+        staging.lexical_index = LexicalIndex() if self.lexical_index is not None else None
+        staging._lexical_lock = threading.Lock()
+        staging.wal = None
+        # A versão em construção é salva uma vez ao final; não precisa de WAL
+        staging.wal_enabled = False
+        staging._checkpoint_thread = None
+        # O lock de escritor continua sendo desta instância
+        staging._writer_lock_file = None
+        staging._mutation_lock = threading.RLock()
+        staging._index_lock = ReadWriteLock()
+        staging._index_mmapped = False
+        return staging
+    
+    def create_version(self) -> 'VectorStore':
+        """Cria uma versão vazia do índice em um diretório novo (build blue/green).
+        
+        A instância retornada recebe a ingestão completa enquanto esta
+        continua atendendo buscas na versão atual; depois de salva, é
+        publicada com activate_version.
+        """
+        self._require_writer()
+        # Nome ordenável pelo momento da criação (microssegundos desempatam builds seguidos)
+        now = time.time()
+        version = time.strftime('%Y%m%d-%H%M%S', time.localtime(now)) + f"-{int(now * 1e6) % 1000000:06d}"
+        os.makedirs(self._version_dir(version))
+        staging = self._version_copy(version)
+        staging.vector_store = staging._create_empty_vector_store()
+        logger.info(f"Construindo nova versão do índice: {version}")
+        return staging
+    
+    def discard_version(self, staging: 'VectorStore'):
+        """Apaga uma versão construída que não será ativada"""
+        if staging.chunk_store is not None:
+            staging.chunk_store.close()
+        if staging.version and staging.version != self.version:
+            shutil.rmtree(staging.active_path, ignore_errors=True)
+    
+    def activate_version(self, staging: 'VectorStore') -> str:
+        """Publica uma versão já salva: troca o ponteiro CURRENT e o índice em uso.
+        
+        Buscas em andamento terminam na versão anterior; as seguintes já usam
+        a nova. Outros processos a adotam em refresh_version. A versão
+        anterior é mantida para rollback.
+        """
+        self._require_writer()
+        previous_version = self.version
+        self._write_current_version(staging.version)
+        self._adopt(staging)
+        if previous_version is None:
+            self._remove_unversioned_files()
+        self._prune_versions()
+        logger.info(f"Versão {staging.version} do índice ativada (anterior: {previous_version or 'sem versão'})")
+        return staging.version
+    
+    def rollback_version(self) -> str:
+        """Volta para a versão anterior à ativa"""
+        self._require_writer()
+        versions = self.list_versions()
+        older = [version for version in versions if self.version is None or version < self.version]
+        if not older or self.version not in versions:
+            raise ValueError("Nenhuma versão anterior do índice disponível para rollback")
+        target = older[-1]
+        staging = self._open_version(target)
+        self._write_current_version(target)
+        self._adopt(staging)
+        logger.info(f"Rollback do índice para a versão {target}")
+        return target
+    
+    def refresh_version(self, force: bool = False) -> bool:
+        """Adota a versão apontada por CURRENT se outro processo publicou uma nova.
+        
+        Chamado nas buscas, no máximo uma vez a cada version_check_interval
+        segundos, para que workers em execução troquem de versão sem reiniciar.
+        Um processo somente leitura também adota aqui os checkpoints do escritor.
+        """
+        if not force and (self.version_check_interval <= 0 or
+                          time.monotonic() - self._last_version_check < self.version_check_interval):
+            return False
+        if not self._version_lock.acquire(blocking=False):
+            return False
+        try:
+            self._last_version_check = time.monotonic()
+            current = self._read_current_version()
+            if current is not None and current != self.version:
+                logger.info(f"Nova versão do índice publicada: {current}")
+                self._adopt(self._open_version(current))
+                return True
+            if self.read_only and self._checkpoint_changed():
+                logger.info("Novo checkpoint do índice gravado pelo processo escritor")
+                self._adopt(self._open_version(self.version))
+                return True
+            return False
+        except Exception as e:
+            logger.error(f"Erro ao carregar a versão publicada do índice: {e}")
+            return False
+        finally:
+            self._version_lock.release()
+    
+    def _checkpoint_changed(self) -> bool:
+        generation = read_meta(os.path.join(self.active_path, 'chunks.sqlite'), 'index_generation')
+        return generation is not None and generation != self._index_generation
+    
+    def _open_version(self, version: Optional[str]) -> 'VectorStore':
+        staging = self._version_copy(version)
+        staging.vector_store = staging._read_vector_store()
+        return staging
+    
+    def _adopt(self, staging: 'VectorStore'):
+        """Passa a usar o índice, chunk store e manifesto de outra versão"""
+        with self._writing():
+            if self.wal is not None:
+                # Alterações ainda só no WAL ficam salvas na versão que sai de uso
+                if self.wal.size_bytes() > 0:
+                    self.checkpoint()
+                self.wal.close()
+                self.wal = None
+            previous_chunk_store = self.chunk_store
+            self.chunk_store = staging.chunk_store
+            self.vector_store = staging.vector_store
+            self.metadata_index = staging.metadata_index
+            self._deleted_positions = staging._deleted_positions
+            self._live_positions = staging._live_positions
+            self._index_trained_vectors = staging._index_trained_vectors
+            self.lexical_index = staging.lexical_index
+            self._index_mmapped = staging._index_mmapped
+            self.index_load_seconds = staging.index_load_seconds
+            self._index_generation = staging._index_generation
+            self.version = staging.version
+            self.active_path = staging.active_path
+            self.manifest = staging.manifest
+            # Buscas leem o chunk store sob o lock de leitura: com o de escrita, ninguém mais o usa
+            if previous_chunk_store is not None and previous_chunk_store is not self.chunk_store:
+                previous_chunk_store.close()
+        self._bump_corpus_version()
+    
+    def _prune_versions(self):
+        """Mantém a versão ativa e as keep_index_versions - 1 mais recentes"""
+        others = [version for version in self.list_versions() if version != self.version]
+        for version in others[:max(len(others) - (self.keep_index_versions - 1), 0)]:
+            shutil.rmtree(self._version_dir(version), ignore_errors=True)
+            logger.info(f"Versão antiga do índice removida: {version}")
+    
+    def _remove_unversioned_files(self):
+        """Apaga o índice do layout antigo, substituído pela primeira versão"""
+        names = ['index.pkl', 'index.wal', 'lexical.pkl', 'chunks.sqlite', 'chunks.sqlite-wal', 'chunks.sqlite-shm']
+        names += [name for name in os.listdir(self.vector_store_path)
+                  if name.startswith('index') and name.endswith(('.faiss', '.faiss.tmp'))]
+        for name in names:
+            path = os.path.join(self.vector_store_path, name)
+            if os.path.exists(path):
+                os.remove(path)
+        IngestionManifest(self.vector_store_path.rstrip(os.sep) + '_manifest.json').clear()
+    
+    def _open_chunk_store(self) -> ChunkStore:
+        """Abre (uma única vez) o chunk store SQLite ao lado do índice"""
+        if self.chunk_store is None:
+            self.chunk_store = ChunkStore(os.path.join(self.active_path, 'chunks.sqlite'), read_only=self.read_only)
+        return self.chunk_store
+    
+    def _open_wal(self) -> Optional[IndexWAL]:
+        """Abre o WAL ao lado do índice, continuando a sequência do último checkpoint"""
+        if self.wal_enabled and self.wal is None:
+            checkpoint_seq = int(self._open_chunk_store().get_meta('wal_seq') or 0)
+            self.wal = IndexWAL(os.path.join(self.active_path, 'index.wal'), checkpoint_seq)
+        return self.wal
+    
+    def _replay_wal(self):
+        """Reaplica adições e remoções registradas após o último checkpoint.
+        
+        O índice e o chunk store em disco estão no estado do checkpoint; os
+        registros seguintes são aplicados por id, então uma reconstrução do
+        índice entre eles não atrapalha.
+        """
+        wal = self._open_wal()
+        checkpoint_seq = int(self.chunk_store.get_meta('wal_seq') or 0)
+        replayed = 0
+        for _, record in wal.read_records(after_seq=checkpoint_seq):
+            self._ensure_writable_index()
+            existing_ids = set(self.vector_store.index_to_docstore_id.values())
+            if record['op'] == 'add':
+                new = [i for i, doc_id in enumerate(record['ids']) if doc_id not in existing_ids]
+                if new:
+                    vectors = record['vectors'][new]
+                    ids = self._add_to_index([record['texts'][i] for i in new], self._index_vectors(vectors),
+                                             [record['metadatas'][i] for i in new],
+                                             [record['ids'][i] for i in new])
+                    self.metadata_index.add([record['metadatas'][i] for i in new])
+                    if self.lexical_index is not None:
+                        self.lexical_index.add(ids, [record['texts'][i] for i in new])
+                    self.chunk_store.put_vectors(dict(zip(ids, vectors)))
+            else:
+                ids = [doc_id for doc_id in record['ids'] if doc_id in existing_ids]
+                if ids:
+                    self._remove_from_index(ids)
+            replayed += 1
+        if replayed:
+            self._bump_corpus_version()
+            logger.info(f"{replayed} registros do WAL reaplicados ({len(self.vector_store.index_to_docstore_id)} vetores)")
+    
+    def checkpoint(self):
+        """Grava o índice completo e esvazia o WAL"""
+        if self.vector_store is None:
             return
+        start = time.perf_counter()
+        self._write_vector_store()
+        self.last_checkpoint_seconds = time.perf_counter() - start
+        logger.info(f"Checkpoint do índice em {self.last_checkpoint_seconds * 1000:.1f} ms")
+    
+    def _checkpoint_in_background(self):
+        """Checkpoint da thread em background; antes, compacta o índice se as
+        posições apagadas passaram do limite (o checkpoint já salva o compactado)"""
+        if self.vector_store is not None and self._needs_compaction():
+            self._compact_index()
+        self.checkpoint()
+    
+    def close(self):
+        """Para o checkpoint em background e libera o lock de escritor.
+
+        O que está pendente no WAL não é salvo: fica para o próximo escritor
+        reaplicar. A instância passa a ser somente leitura.
+        """
+        if self._checkpoint_thread is not None:
+            self._checkpoint_thread.stop()
+            self._checkpoint_thread = None
+        with self._mutation_lock:
+            if self.wal is not None:
+                self.wal.close()
+                self.wal = None
+            self.wal_enabled = False
+            self.read_only = True
+            if self._writer_lock_file is not None:
+                self._writer_lock_file.close()
+                self._writer_lock_file = None
+    
+    def _create_empty_vector_store(self) -> FAISS:
+        """Cria um índice vazio com a dimensão do modelo de embeddings"""
+        dimension = len(self.embeddings.embed_query("dummy"))
+        chunk_store = self._open_chunk_store()
+        # Descarta chunks órfãos de uma execução anterior sem índice salvo (o WAL os regrava);
+        # chunks de um checkpoint nunca são apagados aqui
+        chunk_store.delete_unmapped()
+        self._index_mmapped = False
+        self.metadata_index = MetadataIndex()
+        self._set_deleted_positions([])
+        self._index_trained_vectors = None
+        self.lexical_index = LexicalIndex() if self._uses_lexical_index() else None
+        chunk_store.set_meta('embedding_key', self.embedding_key)
+        chunk_store.set_meta('embedding_dimensions', dimension)
+        index = index_factory.build_index('flat', dimension, metric=self.index_metric)
+        return FAISS(self.embeddings, index, chunk_store, {})
+    
+    def _check_embedding_compatibility(self, index):
+        """Impede buscar/adicionar vetores de um espaço diferente do usado no índice"""
+        stored_key = self.chunk_store.get_meta('embedding_key')
+        if stored_key is not None and stored_key != self.embedding_key:
+            raise EmbeddingMismatchError(
+                f"Índice criado com embeddings '{stored_key}', mas a configuração atual é "
+                f"'{self.embedding_key}'; reconstrua com: python ingest.py --full"
+            )
+        if self.embedding_dimensions and index.d != self.embedding_dimensions:
+            raise EmbeddingMismatchError(
+                f"Índice com vetores de dimensão {index.d}, mas EMBEDDING_DIMENSIONS={self.embedding_dimensions}; "
+                f"reconstrua com: python ingest.py --full"
+            )
+        if stored_key is None and not self.read_only:
+            # Índice de versão anterior, sem metadados: adota a configuração atual
+            self.chunk_store.set_meta('embedding_key', self.embedding_key)
+            self.chunk_store.set_meta('embedding_dimensions', index.d)
+    
+    def _read_vector_store(self) -> FAISS:
+        """Lê o índice do disco, mapeando o arquivo .faiss em memória se configurado.
+        
+        Com mmap o índice não é copiado para o heap do processo: os workers
+        compartilham as páginas do page cache e só os trechos tocados pelas
+        buscas são carregados. Textos e metadados ficam no chunk store e são
+        lidos sob demanda; um index.pkl do formato antigo é migrado uma vez.
+        """
+        start = time.perf_counter()
+        mmap_flag = getattr(faiss, 'IO_FLAG_MMAP_IFC', None)
+        if self.index_mmap and mmap_flag is not None:
+            index = faiss.read_index(self._index_file(), mmap_flag | faiss.IO_FLAG_READ_ONLY)
+            self._index_mmapped = True
+        else:
+            if self.index_mmap:
+                logger.warning("Versão do faiss sem suporte a mmap de índices flat; carregando em memória")
+            index = faiss.read_index(self._index_file())
+            self._index_mmapped = False
+        
+        chunk_store = self._open_chunk_store()
+        pickle_path = os.path.join(self.active_path, 'index.pkl')
+        if os.path.exists(pickle_path) and not self.read_only:
+            logger.info("Migrando docstore pickled (index.pkl) para o chunk store SQLite...")
+            index_to_docstore_id = chunk_store.import_pickled_docstore(pickle_path)
+            os.remove(pickle_path)
+        else:
+            index_to_docstore_id = chunk_store.load_index_map()
+            # Lotes confirmados após o checkpoint: os que estão no WAL voltam ao reaplicá-lo
+            orphans = 0 if chunk_store.read_only else chunk_store.delete_unmapped()
+            if orphans:
+                logger.info(f"{orphans} chunks fora do último checkpoint descartados do chunk store")
+        if index_factory.compacts_on_remove(index):
+            deleted = []
+            if len(index_to_docstore_id) != index.ntotal:
+                logger.warning(f"Índice com {index.ntotal} vetores, mas {len(index_to_docstore_id)} ids mapeados")
+        else:
+            # IVF/HNSW salvos com posições apagadas ainda não compactadas
+            deleted = np.setdiff1d(np.arange(index.ntotal, dtype=np.int64),
+                                   np.fromiter(index_to_docstore_id, dtype=np.int64, count=len(index_to_docstore_id)))
+        self._set_deleted_positions(deleted)
+        self._index_trained_vectors = None
+        if index_factory.index_type_of(index) in index_factory.TRAINED_TYPES:
+            # Checkpoints anteriores não registravam o tamanho do treino: estima pelo índice
+            self._index_trained_vectors = (int(chunk_store.get_meta('index_trained_vectors') or 0) or
+                                           index_factory.estimate_trained_vectors(index))
+        self._check_embedding_compatibility(index)
+        values = chunk_store.field_values(FILTER_FIELDS)
+        self.metadata_index = MetadataIndex.build(
+            ((position, values.get(doc_id, {})) for position, doc_id in sorted(index_to_docstore_id.items())),
+            size=index.ntotal
+        )
+        self.lexical_index = (self._read_lexical_index(chunk_store, set(index_to_docstore_id.values()))
+                              if self._uses_lexical_index() else None)
+        self._index_generation = chunk_store.get_meta('index_generation')
         
+        self.index_load_seconds = time.perf_counter() - start
+        logger.info(f"Índice carregado em {self.index_load_seconds * 1000:.1f} ms "
+                    f"({'mmap' if self._index_mmapped else 'memória'})")
+        return FAISS(self.embeddings, index, chunk_store, index_to_docstore_id)
+    
+    def _read_lexical_index(self, chunk_store: ChunkStore, doc_ids: Set[str]) -> LexicalIndex:
+        """Lê o índice BM25 salvo no chunk store pelo último checkpoint ou o reconstrói.
+        
+        Um índice salvo por versão anterior, ausente (busca híbrida desligada
+        até então) ou fora de sincronia com o índice vetorial é reconstruído
+        com os textos do chunk store.
+        """
+        records = chunk_store.load_lexical()
+        lexical_index = LexicalIndex.from_records(*records) if records is not None else None
+        if lexical_index is not None and lexical_index.ids() == doc_ids:
+            return lexical_index
+        start = time.perf_counter()
+        lexical_index = LexicalIndex.build((doc_id, text) for doc_id, text in chunk_store.iter_contents()
+                                           if doc_id in doc_ids)
+        logger.info(f"Índice lexical reconstruído com {len(lexical_index)} chunks "
+                    f"em {time.perf_counter() - start:.2f}s")
+        return lexical_index
+    
+    def _uses_lexical_index(self) -> bool:
+        """Mantém o índice BM25: busca híbrida configurada ou já usada neste processo"""
+        return self.lexical_preload or self.lexical_index is not None
+    
+    def _ensure_lexical_index(self) -> LexicalIndex:
+        """Índice BM25 em uso, carregado na primeira busca híbrida se ainda não estiver.
+        
+        Entre escritores (mutation lock): nenhum lote entra no meio da
+        carga. Não pode ser chamado com o lock de leitura já obtido.
+        """
+        if self.lexical_index is None:
+            with self._lexical_lock, self._mutation_lock:
+                if self.lexical_index is None:
+                    self.lexical_index = self._read_lexical_index(
+                        self.chunk_store, set(self.vector_store.index_to_docstore_id.values())
+                    )
+        return self.lexical_index
+    
+    def _ensure_writable_index(self):
+        """Copia o índice mapeado para memória própria antes de alterá-lo.
+        
+        Um índice lido com mmap é somente leitura: add/remove abortariam o
+        processo dentro do faiss.
+        """
+        if self._index_mmapped and self.vector_store is not None:
+            self.vector_store.index = faiss.deserialize_index(faiss.serialize_index(self.vector_store.index))
+            self._index_mmapped = False
+            logger.info("Índice mapeado copiado para memória para permitir alterações")
+    
+    def _write_vector_store(self):
+        """Salva o índice e confirma as alterações do chunk store.
+        
+        Cada checkpoint grava o índice em um arquivo novo (index-<geração>.faiss)
+        e registra o nome na mesma transação do chunk store que confirma o
+        mapeamento posição → id e a sequência do WAL. Uma queda antes do
+        commit deixa o arquivo anterior em uso, coerente com o mapeamento e o
+        WAL; o arquivo antigo só é apagado depois do commit. Isso também
+        preserva as páginas de outros processos com o .faiss anterior mapeado.
+        
+        Só depois do commit o WAL é esvaziado. Só exclui outros escritores:
+        as buscas continuam durante a gravação.
+        """
+        self._require_writer()
+        with self._mutation_lock:
+            os.makedirs(self.active_path, exist_ok=True)
+            generation = int(self._open_chunk_store().get_meta('index_generation') or 0) + 1
+            index_name = f'index-{generation:06d}.faiss'
+            tmp_file = os.path.join(self.active_path, index_name + '.tmp')
+            faiss.write_index(self.vector_store.index, tmp_file)
+            with open(tmp_file, 'rb') as f:
+                os.fsync(f.fileno())
+            os.replace(tmp_file, os.path.join(self.active_path, index_name))
+            wal = self._open_wal()
+            meta = {'index_generation': generation, 'index_file': index_name,
+                    'index_trained_vectors': self._index_trained_vectors or 0}
+            if wal is not None:
+                meta['wal_seq'] = wal.last_seq
+            lexical = self.lexical_index.to_records() if self.lexical_index is not None else None
+            self.chunk_store.commit(self.vector_store.index_to_docstore_id, meta, lexical)
+            self._index_generation = str(generation)
+            self._remove_stale_index_files(index_name)
+            if wal is not None:
+                wal.truncate()
+    
+    def _remove_stale_index_files(self, current: str):
+        """Apaga índices de checkpoints anteriores, os que uma queda deixou sem commit
+        e o lexical.pkl de versões anteriores (o índice BM25 agora fica no chunk store)"""
+        for name in os.listdir(self.active_path):
+            if (name != current and name.startswith('index') and name.endswith(('.faiss', '.faiss.tmp'))) or \
+                    name in ('lexical.pkl', 'lexical.pkl.tmp'):
+                os.remove(os.path.join(self.active_path, name))
+    
+    def add_documents(self, documents: List[Document]) -> List[str]:
+        """Adiciona documentos ao vector store e retorna os ids atribuídos.
+        
+        Os embeddings são gerados pelo pipeline concorrente e cada lote é
+        adicionado ao índice assim que fica pronto. Documentos com id usam
+        esse id; os demais recebem um uuid.
+        """
+        if not documents:
+            logger.warning("Nenhum documento para adicionar")
+            return []
+        return self._add_documents_batch(documents)
+    
+    def _add_documents_batch(self, documents: List[Document]) -> List[str]:
+        self._require_writer()
         try:
             logger.info(f"Adicionando {len(documents)} documentos ao vector store...")
             
+            texts = [doc.page_content for doc in documents]
+            metadatas = [doc.metadata for doc in documents]
+            doc_ids = [doc.id or str(uuid.uuid4()) for doc in documents]
+            ids = []
+            
             if self.vector_store is None:
                 # Cria novo vector store se não existir
-                self.vector_store = FAISS.from_documents(documents, self.embeddings)
-            else:
-                # Adiciona ao vector store existente
-                self.vector_store.add_documents(documents)
+                self.vector_store = self._create_empty_vector_store()
+            
+            for start, vectors in self.embedding_pipeline.iter_batches(texts):
+                end = start + len(vectors)
+                with self._writing():
+                    self._ensure_writable_index()
+                    batch_ids = self._add_to_index(texts[start:end], self._index_vectors(vectors),
+                                                   metadatas[start:end], doc_ids[start:end])
+                    self.metadata_index.add(metadatas[start:end])
+                    if self.lexical_index is not None:
+                        self.lexical_index.add(batch_ids, texts[start:end])
+                    # Vetores originais (sem normalizar) ficam no chunk store e no WAL
+                    self.chunk_store.put_vectors(dict(zip(batch_ids, vectors)))
+                    if self._open_wal() is not None:
+                        self.wal.append_add(batch_ids, texts[start:end], metadatas[start:end], vectors)
+                ids.extend(batch_ids)
+                self._notify_checkpoint()
             
+            self._bump_corpus_version()
             logger.info("Documentos adicionados com sucesso")
+            return ids
         except Exception as e:
             logger.error(f"Erro ao adicionar documentos: {str(e)}")
             raise
     
+    def _add_to_index(self, texts: List[str], vectors: np.ndarray, metadatas: List[Dict],
+                      ids: List[str]) -> List[str]:
+        """Adiciona vetores (já no formato do índice) no fim do índice e do chunk store.
+        
+        Faz o mesmo que o FAISS.add_embeddings do LangChain, mas numera as
+        posições pelo tamanho do índice: com posições apagadas ainda no
+        IVF/HNSW, o mapeamento tem menos entradas que o índice.
+        """
+        if len(ids) != len(set(ids)):
+            raise ValueError("Ids duplicados no lote")
+        store = self.vector_store
+        start = store.index.ntotal
+        store.index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+        store.docstore.add({doc_id: Document(id=doc_id, page_content=text, metadata=metadata)
+                            for doc_id, text, metadata in zip(ids, texts, metadatas)})
+        store.index_to_docstore_id.update({start + offset: doc_id for offset, doc_id in enumerate(ids)})
+        self._live_positions = None
+        return list(ids)
+    
+    def _index_vectors(self, vectors) -> np.ndarray:
+        """Vetores no formato do índice atual: normalizados se a métrica é cosseno"""
+        if index_factory.metric_of(self.vector_store.index) == 'cosine':
+            return index_factory.normalize(vectors)
+        return np.asarray(vectors, dtype=np.float32)
+    
+    def add_documents_stream(self, documents: Iterable[Document], batch_size: Optional[int] = None) -> List[str]:
+        """Adiciona documentos de um iterador em lotes, sem materializar a lista inteira"""
+        if batch_size is None:
+            # Lotes grandes o bastante para manter todas as chamadas concorrentes ocupadas
+            batch_size = max(self.embedding_pipeline.batch_size, 4 * self.embedding_pipeline.max_concurrency)
+        
+        ids = []
+        batch = []
+        for doc in documents:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                ids.extend(self.add_documents(batch))
+                batch = []
+        if batch:
+            ids.extend(self.add_documents(batch))
+        return ids
+    
+    def upsert_documents(self, documents: Iterable[Document], batch_size: Optional[int] = None,
+                         progress=None) -> Dict:
+        """Adiciona apenas chunks ainda não indexados, com ids estáveis (arquivo + conteúdo).
+        
+        Chunks já presentes não geram embedding de novo; só os metadados são
+        atualizados (a posição no arquivo pode ter mudado). Chamar duas vezes
+        com os mesmos documentos não duplica nada. Retorna os ids de todos
+        os documentos, na ordem recebida, e as contagens.
+        
+        progress (ex.: IngestionJob) recebe os chunks de cada lote e pode
+        interromper a ingestão entre lotes com raise_if_cancelled.
+        """
+        self._require_writer()
+        if batch_size is None:
+            batch_size = max(self.embedding_pipeline.batch_size, 4 * self.embedding_pipeline.max_concurrency)
+        if self.vector_store is None:
+            self.vector_store = self._create_empty_vector_store()
+        
+        with self._index_lock.read_lock():
+            existing = set(self.vector_store.index_to_docstore_id.values())
+        ids = []
+        added = 0
+        batch = []
+        metadata_updates = {}
+        chunk_ids = ChunkIdAssigner()
+        for doc in documents:
+            doc_id = doc.id or chunk_ids.assign(doc.metadata.get('source', ''), doc.page_content)
+            ids.append(doc_id)
+            if doc_id in existing:
+                metadata_updates[doc_id] = doc.metadata
+                continue
+            existing.add(doc_id)
+            batch.append(Document(id=doc_id, page_content=doc.page_content, metadata=doc.metadata))
+            if len(batch) >= batch_size:
+                added += self._add_progress_batch(batch, progress)
+                batch = []
+        if batch:
+            added += self._add_progress_batch(batch, progress)
+        if metadata_updates:
+            self.chunk_store.update_metadata(metadata_updates)
+        if progress is not None:
+            progress.add_chunks(skipped=len(ids) - added)
+        
+        logger.info(f"Upsert: {added} chunks adicionados, {len(ids) - added} já existentes")
+        return {'ids': ids, 'added': added, 'skipped': len(ids) - added}
+    
+    def _add_progress_batch(self, batch: List[Document], progress=None) -> int:
+        if progress is not None:
+            progress.raise_if_cancelled()
+        added = len(self._add_documents_batch(batch))
+        if progress is not None:
+            progress.add_chunks(embedded=added)
+        return added
+    
+    def delete_by_source(self, file_name: str) -> int:
+        """Remove todos os chunks de um arquivo, sem reconstruir o índice"""
+        if self.vector_store is None:
+            return 0
+        removed = self.delete_documents(self.chunk_store.ids_for_source(file_name))
+        # Esquece o arquivo no manifesto para que uma nova ingestão o reindexe
+        for file_path in [path for path in self.manifest.files if os.path.basename(path) == file_name]:
+            self.manifest.remove_file(file_path)
+        logger.info(f"{removed} chunks de {file_name} removidos")
+        return removed
+    
+    def delete_documents(self, ids: List[str]) -> int:
+        """Remove documentos do vector store pelos ids, ignorando ids inexistentes"""
+        self._require_writer()
+        if self.vector_store is None or not ids:
+            return 0
+        
+        with self._writing():
+            existing_ids = set(self.vector_store.index_to_docstore_id.values())
+            ids_to_delete = [doc_id for doc_id in ids if doc_id in existing_ids]
+            if ids_to_delete:
+                self._ensure_writable_index()
+                self._remove_from_index(ids_to_delete)
+                if self._open_wal() is not None:
+                    self.wal.append_delete(ids_to_delete)
+        if ids_to_delete:
+            # Muitas posições apagadas: acorda o checkpoint para compactar o índice
+            self._notify_checkpoint(force=self._needs_compaction())
+            self._bump_corpus_version()
+            logger.info(f"{len(ids_to_delete)} documentos removidos do vector store")
+        return len(ids_to_delete)
+    
+    @contextmanager
+    def _writing(self):
+        """Seção que altera o índice em memória: exclusiva entre escritores e sem buscas em andamento"""
+        with self._mutation_lock, self._index_lock.write_lock():
+            yield
+    
+    def _notify_checkpoint(self, force: bool = False):
+        if self._checkpoint_thread is not None:
+            self._checkpoint_thread.notify(force)
+    
+    def _remove_from_index(self, ids: List[str]):
+        """Remove ids do índice e do chunk store.
+        
+        Em flat, SQ8 e PQ o faiss compacta o índice e o mapeamento de
+        posições é renumerado, como no FAISS.delete do LangChain. IVF e HNSW
+        não compactam: as posições só saem do mapeamento e ficam marcadas
+        como apagadas, fora das buscas, até a compactação em background
+        (_compact_index), em vez de readicionar todos os vetores sob o lock
+        de escrita.
+        """
+        ids_set = set(ids)
+        mapping = self.vector_store.index_to_docstore_id
+        positions = [position for position, doc_id in mapping.items() if doc_id in ids_set]
+        if self.lexical_index is not None:
+            self.lexical_index.delete(ids)
+        self.vector_store.docstore.delete(ids)
+        if index_factory.compacts_on_remove(self.vector_store.index):
+            index_factory.remove_positions(self.vector_store.index, positions)
+            self.metadata_index.remove(positions)
+            remaining = [doc_id for _, doc_id in sorted(mapping.items()) if doc_id not in ids_set]
+            self.vector_store.index_to_docstore_id = dict(enumerate(remaining))
+        else:
+            for position in positions:
+                del mapping[position]
+            self.metadata_index.discard(positions)
+            self._set_deleted_positions(np.union1d(self._deleted_positions, positions))
+    
+    def _set_deleted_positions(self, positions):
+        self._deleted_positions = np.asarray(positions, dtype=np.int64)
+        self._live_positions = None
+    
+    def _allowed_positions(self, index, filters: Optional[Dict[str, List[str]]]) -> Optional[np.ndarray]:
+        """Posições que a busca pode retornar (None = todas).
+        
+        As do filtro de metadados (que já não tem as apagadas) ou, com
+        posições apagadas pendentes de compactação, todas as demais.
+        """
+        if filters:
+            return self.metadata_index.positions(filters)
+        if len(self._deleted_positions) == 0:
+            return None
+        live = self._live_positions
+        if live is None or len(live) + len(self._deleted_positions) != index.ntotal:
+            live = np.setdiff1d(np.arange(index.ntotal, dtype=np.int64), self._deleted_positions,
+                                assume_unique=True)
+            self._live_positions = live
+        return live
+    
+    def _needs_compaction(self) -> bool:
+        """Posições apagadas passaram de COMPACT_DELETED_RATIO do índice"""
+        deleted = len(self._deleted_positions)
+        return deleted > 0 and deleted >= index_factory.COMPACT_DELETED_RATIO * self.vector_store.index.ntotal
+    
+    def _compact_index(self):
+        """Reconstrói o índice no mesmo tipo e métrica, sem as posições apagadas"""
+        index = self.vector_store.index
+        logger.info(f"Compactando índice {index_factory.index_type_of(index)}: "
+                    f"{len(self._deleted_positions)} de {index.ntotal} posições apagadas")
+        self.rebuild_index(index_factory.index_type_of(index), index_factory.metric_of(index))
+    
+    def rebuild_index(self, index_type: Optional[str] = None, metric: Optional[str] = None) -> Dict:
+        """Reconstrói o índice no tipo e métrica pedidos a partir dos vetores já armazenados.
+        
+        Migra, por exemplo, um índice flat existente para IVF ou HNSW, ou um
+        índice L2 antigo para cosseno, sem gerar embeddings novamente. Os ids
+        e o chunk store não mudam.
+        
+        O novo índice é construído à parte, com as buscas ainda usando o
+        atual, e trocado no final (copy-on-write). Posições apagadas de um
+        IVF/HNSW ficam de fora e o mapeamento de posições é renumerado.
+        """
+        self._require_writer()
+        index_type = index_type or self.index_type
+        metric = metric or self.index_metric
+        start = time.perf_counter()
+        with self._mutation_lock:
+            with self._index_lock.read_lock():
+                # A extração de vetores de um IVF cria o direct map; não pode correr com buscas
+                vectors = self._full_precision_vectors()
+            rebuilt = index_factory.build_index(index_type, self.vector_store.index.d, vectors, metric=metric)
+            with self._writing():
+                self.vector_store.index = rebuilt
+                self._index_mmapped = False
+                trained = index_factory.index_type_of(rebuilt) in index_factory.TRAINED_TYPES
+                self._index_trained_vectors = len(vectors) if trained else None
+                if len(self._deleted_positions):
+                    mapping = self.vector_store.index_to_docstore_id
+                    self.vector_store.index_to_docstore_id = dict(enumerate(mapping[p] for p in sorted(mapping)))
+                    self.metadata_index.remove(self._deleted_positions)
+                    self._set_deleted_positions([])
+        self._bump_corpus_version()
+        info = index_factory.describe_index(self.vector_store.index)
+        info['rebuild_seconds'] = round(time.perf_counter() - start, 3)
+        logger.info(f"Índice reconstruído: {info}")
+        return info
+    
+    def _full_precision_vectors(self) -> np.ndarray:
+        """Vetores das posições mapeadas, em ordem, sem a perda da quantização.
+        
+        Usa os vetores originais do chunk store; se faltar algum (chunk store
+        antigo), reconstrói a partir do índice e, se ele não for quantizado,
+        completa o chunk store. Posições apagadas ficam de fora.
+        """
+        index = self.vector_store.index
+        mapping = self.vector_store.index_to_docstore_id
+        positions = sorted(mapping)
+        doc_ids = [mapping[position] for position in positions]
+        stored = self.chunk_store.get_vectors(doc_ids)
+        if len(stored) == len(doc_ids):
+            return np.vstack([stored[doc_id] for doc_id in doc_ids]) if doc_ids else \
+                np.zeros((0, index.d), dtype=np.float32)
+        
+        vectors = index_factory.extract_vectors(index)[positions]
+        if index_factory.index_type_of(index) in index_factory.QUANTIZED_TYPES:
+            logger.warning("Vetores originais ausentes: reconstruindo a partir do índice quantizado (com perda)")
+        elif len(doc_ids) == len(vectors):
+            self.chunk_store.put_vectors(dict(zip(doc_ids, vectors)))
+        return vectors
+    
+    def _maybe_rebuild_index(self):
+        """Troca o tipo do índice quando o tamanho do corpus pede outro (modo auto)
+        ou a métrica configurada mudou, treina de novo um IVF/SQ8/PQ que o
+        corpus ultrapassou (ex.: nlist calculado para um corpus bem menor) e
+        compacta as posições apagadas se passaram do limite"""
+        index = self.vector_store.index
+        count = len(self.vector_store.index_to_docstore_id)
+        target = index_factory.resolve_index_type(self.index_type, count)
+        metric = index_factory.metric_of(index)
+        if target != index_factory.index_type_of(index) or metric != self.index_metric:
+            logger.info(f"Migrando índice de {index_factory.index_type_of(index)}/{metric} para "
+                        f"{target}/{self.index_metric} ({count} vetores)")
+            self.rebuild_index(target)
+        elif self._needs_retraining(count):
+            logger.info(f"Treinando de novo o índice {target}: {count} vetores, "
+                        f"treinado com {self._index_trained_vectors}")
+            self.rebuild_index(target)
+        elif self._needs_compaction():
+            self._compact_index()
+    
+    def _needs_retraining(self, count: int) -> bool:
+        """O corpus passou de index_retrain_factor × os vetores usados no treino do índice"""
+        trained = self._index_trained_vectors
+        return bool(self.index_retrain_factor and trained and count > self.index_retrain_factor * trained)
+    
+    def apply_ingestion_plan(self, plan: IngestionPlan,
+                             documents_by_file: Dict[str, List[Document]], progress=None) -> Dict:
+        """Aplica uma ingestão incremental: remove vetores antigos e adiciona os novos.
+        
+        Com progress (ex.: IngestionJob), informa arquivos e chunks processados.
+        Um arquivo só entra no manifesto depois de todos os seus chunks, então
+        uma ingestão cancelada no meio o reprocessa na próxima execução.
+        """
+        chunks_removed = 0
+        chunks_added = 0
+        if progress is not None:
+            progress.begin_files(plan.changed)
+        
+        for file_path in plan.removed:
+            chunks_removed += self.delete_documents(self.manifest.get_chunk_ids(file_path))
+            self.manifest.remove_file(file_path)
+        
+        for file_path, file_info in plan.changed.items():
+            if progress is not None:
+                progress.raise_if_cancelled()
+                progress.file_started(os.path.basename(file_path))
+            # Só chunks novos geram embeddings; os que sumiram do arquivo são removidos
+            previous_ids = set(self.manifest.get_chunk_ids(file_path))
+            result = self.upsert_documents(documents_by_file.get(file_path, []), progress=progress)
+            chunks_removed += self.delete_documents(list(previous_ids - set(result['ids'])))
+            chunks_added += result['added']
+            self.manifest.update_file(file_path, file_info, result['ids'])
+            if progress is not None:
+                progress.file_done(file_path, file_info.get('size', 0))
+        
+        if self.vector_store is not None and (chunks_added or chunks_removed):
+            self._maybe_rebuild_index()
+        
+        summary = plan.summary()
+        summary.update({'chunks_added': chunks_added, 'chunks_removed': chunks_removed})
+        logger.info(f"Ingestão incremental aplicada: {summary}")
+        return summary
+    
     def save_vector_store(self):
         """Salva o vector store no disco"""
         try:
             if self.vector_store is not None:
                 os.makedirs(os.path.dirname(self.vector_store_path), exist_ok=True)
-                self.vector_store.save_local(self.vector_store_path)
-                logger.info(f"Vector store salvo em {self.vector_store_path}")
+                self._write_vector_store()
+                self.manifest.save()
+                logger.info(f"Vector store salvo em {self.active_path}")
             else:
                 logger.warning("Nenhum vector store para salvar")
         except Exception as e:
             logger.error(f"Erro ao salvar vector store: {str(e)}")
             raise
     
-    def search_similar_documents(self, query: str, k: int = 5, score_threshold: float = 0.7) -> List[Tuple[Document, float]]:
-        """Busca documentos similares à query"""
+    def search_similar_documents(self, query: str, k: int = 5, score_threshold: float = 0.7,
+                                 nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                                 range_search: bool = False, filters: Optional[Dict] = None,
+                                 hybrid: bool = False, mmr: bool = False, mmr_lambda: Optional[float] = None,
+                                 query_embedding=None) -> List[Tuple[Document, float]]:
+        """Busca documentos similares à query.
+        
+        nprobe (IVF) e ef_search (HNSW) trocam precisão por latência apenas
+        nesta busca; sem eles valem os padrões configurados.
+        
+        Com range_search, retorna todos os chunks acima do limiar de
+        similaridade (até k), em vez de buscar k vizinhos e filtrar depois.
+        
+        filters (ex.: {'source': 'manual.pdf'}) restringe a busca aos chunks
+        com esses metadados; os k resultados já vêm todos de dentro do filtro.
+        
+        Com hybrid, combina a busca vetorial com a BM25 (ver hybrid_search);
+        com hybrid e range_search, todos os resultados respeitam o limiar.
+        
+        Com mmr, busca k·mmr_candidate_factor candidatos e devolve os k mais
+        diversos (ver diversify), evitando enviar ao modelo vários chunks
+        vizinhos com o mesmo texto de overlap.
+        
+        query_embedding evita gerar de novo o embedding de uma consulta que o
+        chamador já tem (ex.: também usado no cache de respostas).
+        """
         if self.vector_store is None:
             logger.warning("Vector store não inicializado")
             return []
         
         try:
-            # Busca com score
-            results = self.vector_store.similarity_search_with_score(query, k=k)
-            
-            # Filtra por threshold de similaridade
-            filtered_results = [
-                (doc, score) for doc, score in results 
-                if score <= (1.0 - score_threshold)  # FAISS usa distância, não similaridade
-            ]
+            # Busca com score (embedding da consulta vem do cache quando possível)
+            if query_embedding is None:
+                query_embedding = self.embed_query(query)
+            max_distance = 1.0 - score_threshold  # FAISS usa distância, não similaridade
+            fetch_k = k * max(self.mmr_candidate_factor, 1) if mmr else k
+            if hybrid:
+                filtered_results = self.hybrid_search(query, k=fetch_k, score_threshold=score_threshold,
+                                                      nprobe=nprobe, ef_search=ef_search, filters=filters,
+                                                      query_embedding=query_embedding, range_search=range_search)
+            elif range_search:
+                filtered_results = self.range_search_by_vector(
+                    query_embedding, max_distance, max_k=fetch_k, nprobe=nprobe, ef_search=ef_search,
+                    filters=filters
+                )
+            else:
+                results = self.search_by_vector(query_embedding, k=fetch_k, nprobe=nprobe, ef_search=ef_search,
+                                                filters=filters)
+                # Filtra por threshold de similaridade
+                filtered_results = [(doc, score) for doc, score in results if score <= max_distance]
+            if mmr:
+                filtered_results = self.diversify(query_embedding, filtered_results, k, mmr_lambda)
             
             logger.info(f"Encontrados {len(filtered_results)} documentos relevantes para a query")
             return filtered_results
@@ -115,35 +1182,361 @@ class VectorStore:
             logger.error(f"Erro na busca: {str(e)}")
             return []
     
+    def diversify(self, embedding, results: List[Tuple[Document, float]], k: int,
+                  lambda_mult: Optional[float] = None) -> List[Tuple[Document, float]]:
+        """Escolhe k resultados por MMR usando os vetores originais do chunk store.
+        
+        lambda_mult (padrão mmr_lambda) vai de 0 (máxima diversidade) a 1
+        (apenas relevância). Chunks sem vetor guardado ficam no fim.
+        """
+        if len(results) <= 1:
+            return results[:k]
+        lambda_mult = self.mmr_lambda if lambda_mult is None else lambda_mult
+        with self._index_lock.read_lock():
+            vectors = self.chunk_store.get_vectors([doc.id for doc, _ in results])
+        with_vectors = [item for item in results if item[0].id in vectors]
+        chosen = []
+        if with_vectors:
+            order = mmr(embedding, np.vstack([vectors[doc.id] for doc, _ in with_vectors]), k, lambda_mult)
+            chosen = [with_vectors[i] for i in order]
+        return (chosen + [item for item in results if item[0].id not in vectors])[:k]
+    
+    def hybrid_search(self, query: str, k: int = 5, score_threshold: Optional[float] = None,
+                      nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                      filters: Optional[Dict] = None, query_embedding=None,
+                      range_search: bool = False) -> List[Tuple[Document, float]]:
+        """Busca vetorial + BM25 fundidas por reciprocal rank fusion (RRF).
+        
+        Cada lado traz k·hybrid_candidate_factor candidatos e o score final
+        de um chunk é a soma de 1/(hybrid_rrf_k + posição) nas duas listas.
+        Códigos, artigos e SKUs que os embeddings aproximam mal entram pelo
+        lado lexical.
+        
+        O score retornado continua sendo a distância vetorial do chunk
+        (calculada com o vetor original para os que só vieram do BM25). O
+        score_threshold só descarta chunks sem nenhum termo em comum com a
+        consulta.
+        
+        Com range_search, o lado vetorial é uma busca por raio e o
+        score_threshold vale para todos os chunks, inclusive os que só
+        vieram do BM25.
+        """
+        pool = k * max(self.hybrid_candidate_factor, 1)
+        lexical_index = self._ensure_lexical_index()
+        embedding = query_embedding if query_embedding is not None else self.embed_query(query)
+        max_distance = 1.0 - score_threshold if score_threshold is not None else float('inf')
+        if range_search and score_threshold is not None:
+            vector_results = self.range_search_by_vector(embedding, max_distance, max_k=pool, nprobe=nprobe,
+                                                         ef_search=ef_search, filters=filters)
+        else:
+            range_search = False
+            vector_results = self.search_by_vector(embedding, k=pool, nprobe=nprobe, ef_search=ef_search,
+                                                   filters=filters)
+        filters = parse_filters(filters)
+        with self._index_lock.read_lock():
+            store = self.vector_store
+            index = store.index
+            allowed_ids = None
+            if filters:
+                mapping = store.index_to_docstore_id
+                allowed_ids = {mapping[int(position)] for position in self.metadata_index.positions(filters)}
+            lexical_results = lexical_index.search(query, k=pool, allowed_ids=allowed_ids)
+        
+        fused: Dict[str, float] = {}
+        for rank, doc_id in enumerate([doc.id for doc, _ in vector_results]):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (self.hybrid_rrf_k + rank + 1)
+        for rank, (doc_id, _) in enumerate(lexical_results):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (self.hybrid_rrf_k + rank + 1)
+        
+        found = {doc.id: (doc, distance) for doc, distance in vector_results}
+        lexical_only = [doc_id for doc_id, _ in lexical_results if doc_id not in found]
+        if lexical_only:
+            with self._index_lock.read_lock():
+                store = self.vector_store
+                index = store.index
+                query_vector = self._query_vector(index, embedding)[0]
+                candidates = self._rerank(index, query_vector,
+                                          [(float('inf'), doc_id) for doc_id in lexical_only], store.docstore)
+                candidates = self._reconstructed_distances(store, query_vector, candidates)
+                for doc, distance in self._load_documents(store, candidates):
+                    found[doc.id] = (doc, distance)
+        
+        # Sem range_search, chunks com termos da consulta passam mesmo abaixo do limiar
+        lexical_ids = set() if range_search else {doc_id for doc_id, _ in lexical_results}
+        ranked = sorted(fused, key=lambda doc_id: -fused[doc_id])
+        results = [found[doc_id] for doc_id in ranked
+                   if doc_id in found and (doc_id in lexical_ids or found[doc_id][1] <= max_distance)]
+        return results[:k]
+    
+    def search_by_vector(self, embedding, k: int = 5, nprobe: Optional[int] = None,
+                         ef_search: Optional[int] = None,
+                         filters: Optional[Dict] = None) -> List[Tuple[Document, float]]:
+        """Busca os k vizinhos de um embedding, com parâmetros de busca por requisição.
+        
+        Os scores são distâncias (menor = mais similar); no índice de cosseno,
+        1 - score é a similaridade de cosseno.
+        """
+        return self.search_by_vectors([embedding], k=k, nprobe=nprobe, ef_search=ef_search, filters=filters)[0]
+    
+    def search_by_vectors(self, embeddings, k: int = 5, nprobe: Optional[int] = None,
+                          ef_search: Optional[int] = None,
+                          filters: Optional[Dict] = None) -> List[List[Tuple[Document, float]]]:
+        """Busca os k vizinhos de vários embeddings com uma única chamada ao faiss.
+        
+        As consultas vão juntas, como uma matriz, para o index.search: o faiss
+        calcula as distâncias em bloco (BLAS) em vez de uma busca por consulta.
+        """
+        self.refresh_version()
+        filters = parse_filters(filters)
+        if len(embeddings) == 0:
+            return []
+        # Buscas rodam em paralelo entre si; alterações do índice esperam as em andamento
+        with self._index_lock.read_lock():
+            # Referência local: uma troca de versão logo após a busca não mistura índices
+            store = self.vector_store
+            index = store.index
+            vectors = self._query_vector(index, embeddings)
+            allowed = self._allowed_positions(index, filters)
+            if allowed is not None and len(allowed) == 0:
+                return [[] for _ in vectors]
+            rerank = (self.index_rerank_factor > 1 and
+                      index_factory.index_type_of(index) in index_factory.QUANTIZED_TYPES)
+            scores, positions = index_factory.search(
+                index, vectors, k * self.index_rerank_factor if rerank else k,
+                nprobe=nprobe or self.index_nprobe, ef_search=ef_search or self.index_ef_search,
+                allowed=allowed, exact_max=self.filter_exact_max
+            )
+            distances = index_factory.to_distances(index, scores)
+            mapping = store.index_to_docstore_id
+            candidates = [
+                [(float(distance), mapping[int(position)])
+                 for distance, position in zip(row_distances, row_positions) if position != -1]
+                for row_distances, row_positions in zip(distances, positions)
+            ]
+            
+            # Textos vêm do chunk store, ainda sob o lock: uma troca de versão fecha o anterior
+            if rerank:
+                candidates = [self._rerank(index, vector, row, store.docstore)[:k]
+                              for vector, row in zip(vectors, candidates)]
+            return [self._load_documents(store, row) for row in candidates]
+    
+    def search_batch(self, queries: List[str], k: int = 5, score_threshold: Optional[float] = None,
+                     nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                     filters: Optional[Dict] = None) -> List[List[Tuple[Document, float]]]:
+        """Busca várias consultas de uma vez (ex.: avaliação de QA).
+        
+        Os embeddings das consultas fora do cache são gerados em paralelo e a
+        busca no índice é uma só. Retorna uma lista de resultados por
+        consulta, na ordem recebida; com score_threshold, filtra como
+        search_similar_documents. filters vale para todas as consultas.
+        """
+        if not queries:
+            return []
+        if self.vector_store is None:
+            logger.warning("Vector store não inicializado")
+            return [[] for _ in queries]
+        
+        results = self.search_by_vectors(self.embed_queries(queries), k=k, nprobe=nprobe, ef_search=ef_search,
+                                         filters=filters)
+        if score_threshold is not None:
+            max_distance = 1.0 - score_threshold
+            results = [[(doc, score) for doc, score in row if score <= max_distance] for row in results]
+        logger.info(f"Busca em lote: {len(queries)} consultas, k={k}")
+        return results
+    
+    def range_search_by_vector(self, embedding, max_distance: float, max_k: Optional[int] = None,
+                               nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                               filters: Optional[Dict] = None) -> List[Tuple[Document, float]]:
+        """Retorna os chunks com distância até max_distance, do mais ao menos similar.
+        
+        A quantidade de resultados varia com a consulta: uma pergunta sem
+        trechos relevantes volta vazia, em vez de trazer k vizinhos fracos.
+        max_k limita o total enviado ao modelo.
+        """
+        self.refresh_version()
+        filters = parse_filters(filters)
+        with self._index_lock.read_lock():
+            store = self.vector_store
+            index = store.index
+            vector = self._query_vector(index, embedding)
+            allowed = self._allowed_positions(index, filters)
+            if allowed is not None and len(allowed) == 0:
+                return []
+            search_options = dict(nprobe=nprobe or self.index_nprobe, ef_search=ef_search or self.index_ef_search,
+                                  allowed=allowed, exact_max=self.filter_exact_max)
+            quantized = index_factory.index_type_of(index) in index_factory.QUANTIZED_TYPES
+            if quantized and max_k:
+                # A distância aproximada de um chunk dentro do raio pode cair fora dele:
+                # os candidatos são os k·fator vizinhos e o raio é conferido com as distâncias exatas
+                scores, positions = index_factory.search(
+                    index, vector, max_k * max(self.index_rerank_factor, 1), **search_options
+                )
+                scores, positions = scores[0], positions[0]
+            else:
+                limits, scores, positions = index_factory.range_search(
+                    index, vector, index_factory.range_radius(index, max_distance), **search_options
+                )
+                scores, positions = scores[limits[0]:limits[1]], positions[limits[0]:limits[1]]
+            distances = index_factory.to_distances(index, scores)
+            mapping = store.index_to_docstore_id
+            candidates = sorted((float(distance), mapping[int(position)])
+                                for distance, position in zip(distances, positions) if position != -1)
+            
+            if quantized:
+                candidates = [item for item in self._rerank(index, vector[0], candidates, store.docstore)
+                              if item[0] <= max_distance]
+            if max_k is not None:
+                candidates = candidates[:max_k]
+            return self._load_documents(store, candidates)
+    
+    def _query_vector(self, index, embedding) -> np.ndarray:
+        """Uma ou mais consultas como matriz float32, normalizadas no índice de cosseno"""
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1, index.d)
+        if index_factory.metric_of(index) == 'cosine':
+            return index_factory.normalize(vector)
+        return vector
+    
+    def _load_documents(self, store: FAISS, candidates: List[Tuple[float, str]]) -> List[Tuple[Document, float]]:
+        results = []
+        for score, doc_id in candidates:
+            doc = store.docstore.search(doc_id)
+            if isinstance(doc, Document):
+                results.append((doc, score))
+        return results
+    
+    def _rerank(self, index, query: np.ndarray, candidates: List[Tuple[float, str]],
+                chunk_store: ChunkStore) -> List[Tuple[float, str]]:
+        """Recalcula a distância exata dos candidatos com os vetores originais"""
+        vectors = chunk_store.get_vectors([doc_id for _, doc_id in candidates])
+        cosine = index_factory.metric_of(index) == 'cosine'
+        reranked = []
+        for score, doc_id in candidates:
+            if doc_id in vectors:
+                score = self._exact_distance(vectors[doc_id], query, cosine)
+            reranked.append((score, doc_id))
+        return sorted(reranked, key=lambda item: item[0])
+    
+    def _exact_distance(self, vector: np.ndarray, query: np.ndarray, cosine: bool) -> float:
+        if cosine:
+            return float(1.0 - np.dot(index_factory.normalize(vector)[0], query))
+        difference = vector - query
+        return float(np.dot(difference, difference))
+    
+    def _reconstructed_distances(self, store: FAISS, query: np.ndarray,
+                                 candidates: List[Tuple[float, str]]) -> List[Tuple[float, str]]:
+        """Distância dos candidatos sem vetor original, pelo vetor reconstruído do índice.
+        
+        Chunks de índices antigos podem não ter o vetor no chunk store; se o
+        índice também não reconstrói (IVF sem mapa direto), o candidato é
+        descartado em vez de voltar com distância infinita.
+        """
+        missing = {doc_id for score, doc_id in candidates if score == float('inf')}
+        if not missing:
+            return candidates
+        index = store.index
+        cosine = index_factory.metric_of(index) == 'cosine'
+        positions = {doc_id: position for position, doc_id in store.index_to_docstore_id.items() if doc_id in missing}
+        results = []
+        for score, doc_id in candidates:
+            if doc_id in missing:
+                try:
+                    score = self._exact_distance(index.reconstruct(positions[doc_id]), query, cosine)
+                except (KeyError, RuntimeError):
+                    logger.warning(f"Chunk {doc_id} sem vetor original nem reconstrução; fora da busca híbrida")
+                    continue
+            results.append((score, doc_id))
+        return sorted(results, key=lambda item: item[0])
+    
+    def embed_query(self, query: str) -> np.ndarray:
+        """Gera o embedding de uma consulta, usando o cache de consultas"""
+        vector = self.query_cache.get(query)
+        if vector is None:
+            vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+            self.query_cache.put(query, vector)
+        return vector
+    
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Embeddings de várias consultas (matriz), gerando em paralelo só os que faltam no cache"""
+        vectors = [self.query_cache.get(query) for query in queries]
+        missing = list(dict.fromkeys(query for query, vector in zip(queries, vectors) if vector is None))
+        computed = dict(zip(missing, self.embedding_pipeline.embed_queries(missing)))
+        for query, vector in computed.items():
+            self.query_cache.put(query, vector)
+        return np.vstack([
+            vector if vector is not None else np.asarray(computed[query], dtype=np.float32)
+            for query, vector in zip(queries, vectors)
+        ])
+    
     def get_vector_store_info(self) -> Dict:
         """Retorna informações sobre o vector store"""
         if self.vector_store is None:
             return {"status": "not_initialized", "document_count": 0}
         
         try:
-            # FAISS não tem método direto para contar documentos
-            # Vamos usar uma aproximação baseada no índice
-            index_size = self.vector_store.index.ntotal if hasattr(self.vector_store, 'index') else 0
-            
+            # Posições apagadas de um IVF/HNSW continuam no índice até a compactação
             return {
                 "status": "initialized",
-                "document_count": index_size,
-                "embedding_model": self.embedding_model_id
+                "document_count": len(self.vector_store.index_to_docstore_id),
+                "deleted_pending_compaction": len(self._deleted_positions),
+                "embedding_model": self.embedding_model_id,
+                "embedding_dimensions": int(self.vector_store.index.d),
+                "embedding_pipeline": self.embedding_pipeline.get_stats(),
+                "embedding_cache": self.embedding_cache.get_stats() if self.embedding_cache else None,
+                "query_cache": self.query_cache.get_stats(),
+                "corpus_version": self.corpus_version,
+                "index": index_factory.describe_index(self.vector_store.index),
+                "index_load": self._get_index_load_stats(),
+                "chunk_store": self.chunk_store.get_stats() if self.chunk_store else None,
+                "metadata_index": self.metadata_index.get_stats(),
+                "lexical_index": self.lexical_index.get_stats() if self.lexical_index is not None else None,
+                "wal": self._get_wal_stats(),
+                "version": self.version,
+                "versions": self.list_versions(),
+                "read_only": self.read_only,
+                "locks": self._index_lock.get_stats()
             }
         except Exception as e:
             logger.error(f"Erro ao obter informações do vector store: {str(e)}")
             return {"status": "error", "error": str(e)}
     
+    def _get_index_load_stats(self) -> Dict:
+        return {
+            "mode": "mmap" if self._index_mmapped else "memory",
+            "load_seconds": round(self.index_load_seconds, 4)
+        }
+    
+    def _get_wal_stats(self) -> Optional[Dict]:
+        if self.wal is None:
+            return None
+        stats = self.wal.get_stats()
+        stats['last_checkpoint_seconds'] = round(self.last_checkpoint_seconds, 4)
+        return stats
+    
+    def _remove_vector_store_files(self):
+        """Apaga índice, chunk store, WAL, manifesto e todas as versões do disco"""
+        if self.wal is not None:
+            self.wal.close()
+            self.wal = None
+        if self.chunk_store is not None:
+            self.chunk_store.close()
+            self.chunk_store = None
+        if os.path.exists(self.vector_store_path):
+            shutil.rmtree(self.vector_store_path)
+            logger.info("Vector store limpo")
+        # O manifesto do layout sem versões fica fora do diretório do vector store
+        self._set_active_version(None)
+        self.manifest.clear()
+    
     def clear_vector_store(self):
         """Limpa o vector store"""
+        self._require_writer()
         try:
-            if os.path.exists(self.vector_store_path):
-                import shutil
-                shutil.rmtree(self.vector_store_path)
-                logger.info("Vector store limpo")
-            
-            # Recria vector store vazio
-            self._load_or_create_vector_store()
+            with self._writing():
+                self._remove_vector_store_files()
+                
+                # Recria vector store vazio
+                self._load_or_create_vector_store()
+            self._bump_corpus_version()
             
         except Exception as e:
             logger.error(f"Erro ao limpar vector store: {str(e)}")
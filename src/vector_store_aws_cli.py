@@ -1,113 +1,99 @@
 import os
-import pickle
 import logging
-from typing import List, Dict, Tuple
-import numpy as np
-from langchain_community.vectorstores import FAISS
-from langchain_aws import BedrockEmbeddings
+from typing import List, Dict, Optional
 from langchain_core.documents import Document
-import boto3
+from src.bedrock_client import get_client_factory
+from src.vector_store import VectorStore
+from src import index_factory
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class VectorStoreAWSCLI:
+class VectorStoreAWSCLI(VectorStore):
     def __init__(self, aws_region: str, embedding_model_id: str, vector_store_path: str,
-                 aws_access_key_id: str, aws_secret_access_key: str, aws_session_token: str):
-        self.aws_region = aws_region
-        self.embedding_model_id = embedding_model_id
-        self.vector_store_path = vector_store_path
-        self.vector_store = None
+                 aws_access_key_id: str, aws_secret_access_key: str, aws_session_token: str,
+                 **kwargs):
+        self.aws_access_key_id = aws_access_key_id
+        self.aws_secret_access_key = aws_secret_access_key
+        self.aws_session_token = aws_session_token
         
-        # Inicializa cliente Bedrock com credenciais explícitas
-        self.bedrock_client = boto3.client(
-            service_name='bedrock-runtime',
-            region_name=aws_region,
-            aws_access_key_id=aws_access_key_id,
-            aws_secret_access_key=aws_secret_access_key,
-            aws_session_token=aws_session_token
-        )
-        
-        # Inicializa embeddings
-        self.embeddings = BedrockEmbeddings(
-            client=self.bedrock_client,
-            model_id=embedding_model_id
+        # Embeddings, pipeline e carregamento do índice ficam na classe base
+        super().__init__(aws_region, embedding_model_id, vector_store_path, **kwargs)
+    
+    def _create_bedrock_client(self):
+        """Obtém o cliente Bedrock com credenciais explícitas da fábrica compartilhada"""
+        return get_client_factory().get_client(
+            'bedrock-runtime',
+            region_name=self.aws_region,
+            aws_access_key_id=self.aws_access_key_id,
+            aws_secret_access_key=self.aws_secret_access_key,
+            aws_session_token=self.aws_session_token
         )
-        
-        # Carrega ou cria vector store
-        self._load_or_create_vector_store()
     
     def _load_or_create_vector_store(self):
         """Carrega vector store existente ou cria um novo"""
         try:
-            if os.path.exists(self.vector_store_path):
+            if os.path.exists(self._index_file()):
                 logger.info("Carregando vector store existente...")
-                self.vector_store = FAISS.load_local(
-                    self.vector_store_path, 
-                    self.embeddings,
-                    allow_dangerous_deserialization=True
-                )
+                self.vector_store = self._read_vector_store()
                 logger.info("✅ Vector store carregado com sucesso")
             else:
                 logger.info("Criando novo vector store...")
-                # Criar documento dummy para inicializar
-                dummy_doc = Document(
-                    page_content="Documento inicial para inicialização do vector store.",
-                    metadata={"source": "init", "type": "dummy"}
-                )
-                
-                
-
-                self.vector_store = FAISS.from_documents([dummy_doc], self.embeddings)
-                
-                # Criar diretório se não existir
-                os.makedirs(os.path.dirname(self.vector_store_path), exist_ok=True)
+                self.vector_store = self._create_empty_vector_store()
                 
                 # Salvar vector store
-                self.vector_store.save_local(self.vector_store_path)
+                self._write_vector_store()
                 logger.info("✅ Novo vector store criado e salvo")
                 
         except Exception as e:
             logger.error(f"Erro ao carregar/criar vector store: {e}")
             raise
     
-    def add_documents(self, documents: List[Document]):
-        """Adiciona documentos ao vector store"""
+    def add_documents(self, documents: List[Document], progress=None) -> List[str]:
+        """Adiciona documentos ao vector store, ignorando chunks já indexados"""
         try:
             if not documents:
                 logger.warning("Nenhum documento para adicionar")
-                return
+                return []
             
             logger.info(f"Adicionando {len(documents)} documentos ao vector store...")
             
-            # Adicionar documentos
-            self.vector_store.add_documents(documents)
+            # Upsert com ids estáveis: reenviar os mesmos arquivos não duplica chunks
+            ids = self.upsert_documents(documents, progress=progress)['ids']
             
-            # Salvar vector store atualizado
-            self.vector_store.save_local(self.vector_store_path)
+            # Com o WAL cada lote já foi gravado no log; o índice completo é
+            # salvo pelo checkpoint em background. Sem WAL, salva agora.
+            if self.wal is None:
+                self._write_vector_store()
             
             logger.info(f"✅ {len(documents)} documentos adicionados com sucesso")
+            return ids
             
         except Exception as e:
             logger.error(f"Erro ao adicionar documentos: {e}")
             raise
     
-    def similarity_search(self, query: str, k: int = 5, similarity_threshold: float = 0.7) -> List[Dict]:
-        """Busca documentos similares"""
+    def similarity_search(self, query: str, k: int = 5, similarity_threshold: float = 0.7,
+                          filters: Optional[Dict] = None) -> List[Dict]:
+        """Busca documentos similares (filters restringe por source/file_type)"""
         try:
             if not self.vector_store:
                 logger.error("Vector store não inicializado")
                 return []
             
             # Buscar documentos similares com scores
-            docs_with_scores = self.vector_store.similarity_search_with_score(query, k=k)
+            query_embedding = self.embed_query(query)
+            docs_with_scores = self.search_by_vector(query_embedding, k=k, filters=filters)
             
             # Filtrar por threshold e formatar resultado
             results = []
             for doc, score in docs_with_scores:
                 # FAISS retorna distância (menor = mais similar)
-                # Converter para similaridade (maior = mais similar)
-                similarity = 1 / (1 + score)
+                # Converter para similaridade (maior = mais similar); no cosseno a distância é 1 - similaridade
+                if index_factory.metric_of(self.vector_store.index) == 'cosine':
+                    similarity = 1 - score
+                else:
+                    similarity = 1 / (1 + score)
                 
                 if similarity >= similarity_threshold:
                     results.append({
@@ -136,7 +122,13 @@ class VectorStoreAWSCLI:
                 'documents_count': index_size,
                 'embedding_model': self.embedding_model_id,
                 'vector_store_path': self.vector_store_path,
-                'aws_region': self.aws_region
+                'aws_region': self.aws_region,
+                'embedding_cache': self.embedding_cache.get_stats() if self.embedding_cache else None,
+                'query_cache': self.query_cache.get_stats(),
+                'index': index_factory.describe_index(self.vector_store.index),
+                'index_load': self._get_index_load_stats(),
+                'chunk_store': self.chunk_store.get_stats() if self.chunk_store else None,
+                'wal': self._get_wal_stats()
             }
             
         except Exception as e:
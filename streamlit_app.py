@@ -61,6 +61,57 @@ def call_api(endpoint, method="GET", data=None):
     except Exception as e:
         return None, {"error": f"Erro inesperado: {str(e)}"}
 
+def wait_for_job(job_id, poll_interval=1.0):
+    """Acompanha um job de ingestão em /jobs/<id> com barra de progresso"""
+    progress_bar = st.progress(0.0)
+    status_text = st.empty()
+    job = {}
+    while True:
+        status_code, job = call_api(f"/jobs/{job_id}")
+        if status_code != 200:
+            return job or {}
+        if job['files_total']:
+            progress_bar.progress(min(job['files_done'] / job['files_total'], 1.0))
+        eta = f" | restante: ~{job['eta_seconds']:.0f}s" if job.get('eta_seconds') is not None else ""
+        status_text.caption(f"📄 {job['files_done']}/{job['files_total']} arquivos | "
+                            f"{job['chunks_embedded']} chunks ({job['chunks_per_second']}/s){eta}")
+        if job['status'] in ('succeeded', 'failed', 'cancelled'):
+            return job
+        time.sleep(poll_interval)
+
+def stream_chat(data, placeholder):
+    """Chama /chat/stream e renderiza a resposta parcial à medida que chega"""
+    url = f"{API_BASE_URL}/chat/stream"
+    text = ""
+    summary = {}
+    try:
+        with requests.post(url, json=data, stream=True, timeout=(5, 300)) as response:
+            if response.status_code != 200:
+                return None, response.json()
+            
+            # Formato SSE: linhas "event: ..." e "data: {...}" separadas por linha em branco
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data: "):
+                    continue
+                event = json.loads(line[len("data: "):])
+                if event['type'] == 'token':
+                    text += event['text']
+                    placeholder.markdown(text + "▌")
+                elif event['type'] == 'done':
+                    summary = event
+                elif event['type'] == 'error':
+                    return None, event
+        
+        placeholder.markdown(text)
+        summary['response'] = text
+        return 200, summary
+    except requests.exceptions.ConnectionError:
+        return None, {"error": "Não foi possível conectar à API. Certifique-se de que o servidor está rodando."}
+    except requests.exceptions.Timeout:
+        return None, {"error": "Timeout na requisição. Tente novamente."}
+    except Exception as e:
+        return None, {"error": f"Erro inesperado: {str(e)}"}
+
 def list_documents():
     """Lista documentos no diretório"""
     try:
@@ -122,6 +173,7 @@ def main():
             st.subheader("⚙️ Configurações")
             max_results = st.slider("Máx. Resultados", 1, 10, 5)
             similarity_threshold = st.slider("Limiar Similaridade", 0.1, 1.0, 0.7, 0.1)
+            use_streaming = st.checkbox("⚡ Resposta em streaming", value=True)
             
             if st.button("🗑️ Limpar Chat", use_container_width=True):
                 st.session_state.chat_history = []
@@ -153,32 +205,40 @@ def main():
             
             # Enviar mensagem
             if send_button and user_message.strip():
-                with st.spinner("🤖 Processando..."):
-                    # Adiciona mensagem do usuário ao histórico
+                # Adiciona mensagem do usuário ao histórico
+                st.session_state.chat_history.append({
+                    "role": "user",
+                    "content": user_message,
+                    "timestamp": datetime.now()
+                })
+                request_data = {
+                    "message": user_message,
+                    "max_results": max_results,
+                    "similarity_threshold": similarity_threshold
+                }
+                
+                if use_streaming:
+                    # Renderiza a resposta parcial enquanto o modelo gera
+                    st.markdown("**🤖 Agente**")
+                    status_code, response = stream_chat(request_data, st.empty())
+                    if status_code == 200 and response.get('time_to_first_token') is not None:
+                        st.caption(f"⏱️ Primeiro token em {response['time_to_first_token']:.2f}s")
+                else:
+                    with st.spinner("🤖 Processando..."):
+                        # Chama API
+                        status_code, response = call_api("/chat", "POST", request_data)
+                
+                if status_code == 200 and response.get('success'):
+                    # Adiciona resposta do agente ao histórico
                     st.session_state.chat_history.append({
-                        "role": "user",
-                        "content": user_message,
+                        "role": "assistant",
+                        "content": response.get('response', ''),
+                        "sources": response.get('sources', []),
+                        "documents_used": response.get('documents_used', 0),
                         "timestamp": datetime.now()
                     })
-                    
-                    # Chama API
-                    status_code, response = call_api("/chat", "POST", {
-                        "message": user_message,
-                        "max_results": max_results,
-                        "similarity_threshold": similarity_threshold
-                    })
-                    
-                    if status_code == 200 and response.get('success'):
-                        # Adiciona resposta do agente ao histórico
-                        st.session_state.chat_history.append({
-                            "role": "assistant",
-                            "content": response.get('response', ''),
-                            "sources": response.get('sources', []),
-                            "documents_used": response.get('documents_used', 0),
-                            "timestamp": datetime.now()
-                        })
-                    else:
-                        st.error(f"Erro: {response.get('error', 'Erro desconhecido')}")
+                else:
+                    st.error(f"Erro: {response.get('error', 'Erro desconhecido')}")
                 
                 st.rerun()
         
@@ -277,16 +337,21 @@ def main():
             st.subheader("🔧 Ações")
             
             if st.button("🔄 Reprocessar Documentos", use_container_width=True, type="primary"):
-                with st.spinner("Processando documentos..."):
-                    status_code, response = call_api("/documents/upload", "POST")
-                    
-                    if status_code == 200:
+                status_code, response = call_api("/documents/upload", "POST")
+                
+                if status_code == 202:
+                    job = wait_for_job(response['job_id'])
+                    if job.get('status') == 'succeeded':
                         st.success("✅ Documentos processados com sucesso!")
-                        st.json(response)
+                        st.json(job.get('result'))
                     else:
-                        st.error("❌ Erro ao processar documentos")
-                        if response:
-                            st.error(response.get('error', 'Erro desconhecido'))
+                        st.error(f"❌ Processamento {job.get('status', 'com erro')}")
+                        if job.get('error'):
+                            st.error(job['error'])
+                else:
+                    st.error("❌ Erro ao processar documentos")
+                    if response:
+                        st.error(response.get('error', 'Erro desconhecido'))
             
             if st.button("📁 Abrir Pasta Documentos", use_container_width=True):
                 st.info(f"📂 Caminho: {os.path.abspath(DOCUMENTS_PATH)}")
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Testes do agente Bedrock com o modelo substituído por um dublê local (não requer credenciais AWS)
+"""
+
+import os
+import sys
+import json
+import tempfile
+sys.path.insert(0, '.')
+
+import numpy as np
+from langchain_core.documents import Document
+
+from config.settings import Config
+from src.answer_cache import SemanticAnswerCache
+from src.bedrock_agent import BedrockAgent
+from src.fake_bedrock import FakeBedrockRuntimeClient
+from src.reranking import merge_adjacent_chunks
+
+def _create_agent(**kwargs):
+    """Cria um agente cujo modelo conta as chamadas em vez de acessar o Bedrock"""
+    agent = BedrockAgent(
+        aws_region='us-east-1',
+        model_id=Config.BEDROCK_MODEL_ID,
+        agent_instructions_path=os.path.join(Config.PROMPTS_PATH, Config.AGENT_INSTRUCTIONS_FILE),
+        **kwargs
+    )
+    agent.model_calls = []
+    agent._call_bedrock_model = lambda prompt: agent.model_calls.append(prompt) or "Resposta gerada"
+    return agent
+
+def _retrieved(ids):
+    return [(Document(id=doc_id, page_content=f"conteúdo {doc_id}", metadata={'source': 'manual.pdf'}), 0.1)
+            for doc_id in ids]
+
+def test_semantic_answer_cache():
+    """Perguntas quase idênticas sobre o mesmo corpus reutilizam a resposta"""
+    agent = _create_agent(answer_cache=SemanticAnswerCache(max_distance=0.05))
+    query = np.ones(8, dtype=np.float32)
+    similar = query + np.array([0.05] + [0] * 7, dtype=np.float32)
+    different = np.array([1, -1] * 4, dtype=np.float32)
+    documents = _retrieved(['a', 'b'])
+
+    first = agent.process_message("Qual a política?", documents, query, 'v1')
+    second = agent.process_message("Qual é a política?", list(reversed(documents)), similar, 'v1')
+    assert first['cached'] is False and second['cached'] is True
+    assert second['response'] == first['response'] and len(agent.model_calls) == 1
+
+    # Pergunta diferente, chunks diferentes ou corpus alterado: chama o modelo
+    agent.process_message("Outra coisa", documents, different, 'v1')
+    agent.process_message("Qual a política?", _retrieved(['a', 'c']), query, 'v1')
+    agent.process_message("Qual a política?", documents, query, 'v2')
+    assert len(agent.model_calls) == 4
+
+    stats = agent.get_agent_info()['answer_cache']
+    assert stats['hits'] == 1 and stats['invalidations'] == 1
+
+def test_stream_message():
+    """Os tokens chegam em ordem e o evento final traz as métricas"""
+    agent = _create_agent()
+    agent.bedrock_client = FakeBedrockRuntimeClient("um dois três quatro", first_token_delay=0.01)
+
+    events = list(agent.stream_message("pergunta", _retrieved(['a'])))
+    tokens = [event['text'] for event in events if event['type'] == 'token']
+    done = events[-1]
+
+    assert "".join(tokens) == "um dois três quatro" and len(tokens) == 4
+    assert done['type'] == 'done' and done['sources'] == ['manual.pdf']
+    assert done['time_to_first_token'] >= 0.01
+    assert agent.get_agent_info()['streaming']['streams'] == 1
+
+def test_adjacent_chunk_merging():
+    """Chunks vizinhos do mesmo arquivo entram no prompt uma vez só, sem o overlap repetido"""
+    from src.document_processor import DocumentProcessor
+
+    processor = DocumentProcessor(chunk_size=200, chunk_overlap=60)
+    text = " ".join(f"A cláusula {i} define o prazo de {i + 10} dias para o reembolso." for i in range(30))
+    chunks = processor.text_splitter.split_text(text)
+    documents = [Document(id=f"c{i}", page_content=chunk, metadata={'source': 'contrato.pdf', 'chunk_id': i})
+                 for i, chunk in enumerate(chunks)]
+    other = Document(id='x', page_content="Outro arquivo", metadata={'source': 'faq.pdf', 'chunk_id': 8})
+    retrieved = [(documents[8], 0.2), (other, 0.25), (documents[7], 0.1), (documents[9], 0.3), (documents[2], 0.4)]
+
+    merged = merge_adjacent_chunks(retrieved, max_overlap=60)
+    assert [doc.metadata.get('chunk_ids', doc.metadata['chunk_id']) for doc, _ in merged] == [[7, 8, 9], 8, 2]
+    span, score = merged[0]
+    assert score == 0.1 and span.page_content in text
+    assert all(documents[i].page_content in span.page_content for i in (7, 8, 9))
+    assert len(span.page_content) < sum(len(documents[i].page_content) for i in (7, 8, 9))
+
+    agent = _create_agent(chunk_overlap=60)
+    agent.process_message("Qual o prazo?", retrieved)
+    prompt = agent.model_calls[0]
+    assert prompt.count("[DOCUMENTO") == 3 and "Chunk: 7-9" in prompt
+    assert prompt.count(documents[8].page_content) == 1
+
+def test_chat_stream_endpoint():
+    """/chat/stream envia os tokens como Server-Sent Events"""
+    import src.app as app_module
+    from src.document_processor import DocumentProcessor
+    from test_vector_store import _create_vector_store, _documents
+
+    with tempfile.TemporaryDirectory() as directory:
+        agent = _create_agent()
+        agent.bedrock_client = FakeBedrockRuntimeClient("resposta em partes")
+        vector_store = _create_vector_store(directory, query_cache_size=0)
+        vector_store.add_documents(_documents(5))
+        # Sem cache de consultas, cada embedding da pergunta seria uma chamada ao Bedrock
+        embedded = []
+        embed_query = vector_store.embeddings.embed_query
+        vector_store.embeddings.embed_query = lambda text: embedded.append(text) or embed_query(text)
+        app_module.document_processor = DocumentProcessor()
+        app_module.vector_store = vector_store
+        app_module.bedrock_agent = agent
+
+        response = app_module.app.test_client().post('/chat/stream', json={'message': 'Trecho 1'})
+        assert response.status_code == 200
+        assert response.mimetype == 'text/event-stream'
+
+        events = [json.loads(line[len('data: '):])
+                  for line in response.get_data(as_text=True).splitlines() if line.startswith('data: ')]
+        assert "".join(e['text'] for e in events if e['type'] == 'token') == "resposta em partes"
+        assert events[-1]['type'] == 'done' and 'search_results_count' in events[-1]
+        assert embedded == ['Trecho 1']
+
+        app_module.bedrock_agent = _create_agent()
+        response = app_module.app.test_client().post('/chat', json={'message': 'Trecho 2', 'hybrid': True})
+        assert response.status_code == 200 and embedded == ['Trecho 1', 'Trecho 2']
+
+def test_request_params_validation():
+    """Parâmetros inválidos ou fora do intervalo voltam 400 com a mensagem, sem chegar à busca"""
+    import src.app as app_module
+    from src.document_processor import DocumentProcessor
+    from test_vector_store import _create_vector_store, _documents
+
+    with tempfile.TemporaryDirectory() as directory:
+        vector_store = _create_vector_store(directory)
+        vector_store.add_documents(_documents(5))
+        app_module.document_processor = DocumentProcessor()
+        app_module.vector_store = vector_store
+        app_module.bedrock_agent = _create_agent()
+        client = app_module.app.test_client()
+
+        invalid = [{'max_results': 0}, {'max_results': 'cinco'}, {'max_results': 2.5}, {'nprobe': -1},
+                   {'similarity_threshold': 2}, {'ef_search': True}, {'mmr_lambda': 1.5}, {'hybrid': 'sim'}]
+        for params in invalid:
+            for endpoint in ('/chat', '/chat/stream'):
+                response = client.post(endpoint, json={'message': 'Trecho 1', **params})
+                assert response.status_code == 400, (endpoint, params)
+                assert list(params)[0] in response.get_json()['error']
+        response = client.post('/search/batch', json={'queries': ['Trecho 1'], 'max_results': -3})
+        assert response.status_code == 400 and 'max_results' in response.get_json()['error']
+
+        response = client.post('/search/batch', json={'queries': ['Trecho 1'], 'max_results': '2'})
+        assert response.status_code == 200 and len(response.get_json()['results'][0]['documents']) == 2
+        response = client.post('/chat', json={'message': 'Trecho 1', 'mmr': True, 'mmr_lambda': 0.3})
+        assert response.status_code == 200
+
+        app_module.job_manager = object()
+        vector_store.manifest.files['manual.pdf'] = {}
+        response = client.post('/documents/upload', json={'workers': 'muitos'})
+        assert response.status_code == 400 and 'workers' in response.get_json()['error']
+
+        # O app da AWS CLI valida workers do mesmo jeito
+        import src.app_aws_cli as aws_cli_module
+        aws_cli_module.document_processor = app_module.document_processor
+        aws_cli_module.vector_store = vector_store
+        aws_cli_module.job_manager = object()
+        for workers in ('muitos', -2, 0):
+            response = aws_cli_module.app.test_client().post('/documents/upload', json={'workers': workers})
+            assert response.status_code == 400 and 'workers' in response.get_json()['error']
+
+def main():
+    """Executa os testes"""
+    test_semantic_answer_cache()
+    print("✓ Cache semântico de respostas")
+    test_stream_message()
+    print("✓ Streaming de tokens")
+    test_adjacent_chunk_merging()
+    print("✓ União de chunks vizinhos no prompt")
+    test_chat_stream_endpoint()
+    print("✓ Endpoint /chat/stream")
+    test_request_params_validation()
+    print("✓ Validação dos parâmetros das requisições")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
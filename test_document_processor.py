@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Testes do processamento de documentos (não requer credenciais AWS)
+"""
+
+import os
+import sys
+import tempfile
+sys.path.insert(0, '.')
+
+from docx import Document
+
+from src.document_processor import DocumentProcessor
+from src.ingestion_manifest import IngestionManifest
+
+def _create_docx(path, paragraphs):
+    """Cria um arquivo .docx com os parágrafos informados"""
+    doc = Document()
+    for paragraph in paragraphs:
+        doc.add_paragraph(paragraph)
+    doc.save(path)
+
+def _create_corpus(directory, files=4):
+    """Cria um diretório com alguns documentos de teste"""
+    for i in range(files):
+        paragraphs = [f"Documento {i} parágrafo {j}. " * 20 for j in range(10)]
+        _create_docx(os.path.join(directory, f"doc_{i}.docx"), paragraphs)
+    # Arquivo não suportado deve ser ignorado
+    with open(os.path.join(directory, "ignorar.txt"), 'w') as file:
+        file.write("texto")
+
+def test_parallel_matches_serial():
+    """O modo paralelo deve produzir os mesmos chunks, na mesma ordem"""
+    with tempfile.TemporaryDirectory() as directory:
+        _create_corpus(directory)
+        processor = DocumentProcessor(chunk_size=300, chunk_overlap=50)
+
+        serial = processor.process_documents_directory(directory)
+        serial_timings = processor.last_file_timings
+        parallel = processor.process_documents_directory(directory, max_workers=3)
+        parallel_timings = processor.last_file_timings
+
+        assert serial, "nenhum chunk gerado"
+        assert [d.page_content for d in serial] == [d.page_content for d in parallel]
+        assert [d.metadata for d in serial] == [d.metadata for d in parallel]
+        assert [t['file'] for t in parallel_timings] == [f"doc_{i}.docx" for i in range(4)]
+        assert [t['chunks'] for t in serial_timings] == [t['chunks'] for t in parallel_timings]
+
+def test_incremental_manifest():
+    """Somente arquivos novos/modificados são reprocessados; removidos são detectados"""
+    with tempfile.TemporaryDirectory() as directory:
+        documents_path = os.path.join(directory, 'documents')
+        os.makedirs(documents_path)
+        _create_corpus(documents_path, files=3)
+        processor = DocumentProcessor(chunk_size=300, chunk_overlap=50)
+        manifest = IngestionManifest(os.path.join(directory, 'vector_store_manifest.json'))
+
+        plan, documents_by_file = processor.process_changed_documents(documents_path, manifest)
+        assert len(plan.added) == 3 and not plan.removed
+        for file_path, file_info in plan.changed.items():
+            ids = [f"{file_path}:{i}" for i in range(len(documents_by_file[file_path]))]
+            manifest.update_file(file_path, file_info, ids)
+        manifest.save()
+
+        # Recarrega do disco: nada mudou
+        manifest = IngestionManifest(manifest.manifest_path)
+        plan, documents_by_file = processor.process_changed_documents(documents_path, manifest)
+        assert not plan.has_changes() and len(plan.unchanged) == 3
+        assert documents_by_file == {}
+
+        # touch sem alterar conteúdo não reprocessa
+        os.utime(os.path.join(documents_path, 'doc_0.docx'))
+        # Conteúdo alterado e arquivo removido
+        _create_docx(os.path.join(documents_path, 'doc_1.docx'), ["conteúdo novo"])
+        os.remove(os.path.join(documents_path, 'doc_2.docx'))
+
+        plan, documents_by_file = processor.process_changed_documents(documents_path, manifest)
+        assert [os.path.basename(p) for p in plan.modified] == ['doc_1.docx']
+        assert [os.path.basename(p) for p in plan.removed] == ['doc_2.docx']
+        assert [os.path.basename(p) for p in plan.unchanged] == ['doc_0.docx']
+        assert len(manifest.get_chunk_ids(plan.removed[0])) > 0
+        assert [d.page_content for d in documents_by_file[plan.modified[0]]] == ["conteúdo novo"]
+
+def test_streaming_chunker_is_incremental():
+    """O chunker emite chunks antes de consumir todas as páginas"""
+    processor = DocumentProcessor(chunk_size=200, chunk_overlap=40)
+    pages_read = []
+
+    def pages():
+        for i in range(1000):
+            pages_read.append(i)
+            yield " ".join(f"pagina{i}-palavra{j}" for j in range(30)) + "\n"
+
+    chunks = processor.iter_chunks(pages())
+    first = next(chunks)
+    assert len(pages_read) < 5, "o chunker leu o documento inteiro antes de emitir"
+    rest = list(chunks)
+
+    all_chunks = [first] + rest
+    assert all(len(chunk) <= 200 for chunk in all_chunks)
+    text = " ".join(all_chunks)
+    assert "pagina0-palavra0" in text and "pagina999-palavra29" in text
+    # Mesmo número de chunks (± alguns) que dividir o texto inteiro de uma vez
+    full = processor.text_splitter.split_text("".join(pages()))
+    assert abs(len(full) - len(all_chunks)) <= len(full) * 0.05
+
+def test_repeated_chunks_keep_distinct_ids():
+    """Textos repetidos no mesmo arquivo (rodapés, cláusulas) não são descartados no upsert"""
+    from test_vector_store import _create_vector_store
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "contrato.docx")
+        _create_docx(path, ["Cláusula padrão repetida em todas as seções. " * 20] * 6)
+        processor = DocumentProcessor(chunk_size=300, chunk_overlap=50)
+        chunks = processor.process_document(path)
+        assert len({chunk.page_content for chunk in chunks}) < len(chunks)
+        assert len({chunk.id for chunk in chunks}) == len(chunks)
+        assert [chunk.id for chunk in processor.process_document(path)] == [chunk.id for chunk in chunks]
+
+        vector_store = _create_vector_store(directory)
+        assert vector_store.upsert_documents(chunks)['added'] == len(chunks)
+        assert vector_store.upsert_documents(processor.process_document(path))['added'] == 0
+
+def main():
+    """Executa os testes"""
+    test_parallel_matches_serial()
+    print("✓ Processamento paralelo determinístico")
+    test_incremental_manifest()
+    print("✓ Manifesto de ingestão incremental")
+    test_streaming_chunker_is_incremental()
+    print("✓ Chunking incremental")
+    test_repeated_chunks_keep_distinct_ids()
+    print("✓ Ids distintos para chunks repetidos")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
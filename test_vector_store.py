@@ -0,0 +1,963 @@
+#!/usr/bin/env python3
+"""
+Testes do vector store usando o backend de embeddings local (não requer credenciais AWS)
+"""
+
+import os
+import sys
+import sqlite3
+import tempfile
+import time
+sys.path.insert(0, '.')
+
+from langchain_core.documents import Document
+
+from src.embedding_pipeline import EmbeddingPipeline, FakeEmbeddings
+from src.embedding_cache import EmbeddingCache
+from src.vector_store import VectorStore, find_index_file
+from src.bedrock_client import BedrockClientFactory
+
+def _create_vector_store(directory, **kwargs):
+    """Cria um VectorStore com embeddings fake em um diretório temporário"""
+    options = {'embedding_backend': 'fake', 'fake_embedding_size': 32, 'embedding_concurrency': 4,
+               'embedding_batch_size': 8}
+    options.update(kwargs)
+    return VectorStore(
+        aws_region='us-east-1',
+        embedding_model_id='amazon.titan-embed-text-v2:0',
+        vector_store_path=os.path.join(directory, 'vector_store'),
+        **options
+    )
+
+def _documents(count, source='manual.pdf'):
+    return [
+        Document(page_content=f"Trecho {i} do {source} sobre política {i % 7}",
+                 metadata={'source': source, 'chunk_id': i, 'file_type': '.pdf'})
+        for i in range(count)
+    ]
+
+def test_pipeline_preserves_order():
+    """Os lotes concorrentes são remontados na ordem original"""
+    embeddings = FakeEmbeddings(size=16, latency=0.001)
+    texts = [f"texto {i}" for i in range(50)]
+    pipeline = EmbeddingPipeline(embeddings, max_concurrency=8, batch_size=7)
+
+    starts = [start for start, _ in pipeline.iter_batches(texts)]
+    assert starts == list(range(0, 50, 7))
+    assert pipeline.embed_documents(texts) == embeddings.embed_documents(texts)
+    assert pipeline.get_stats()['texts_embedded'] == 100
+
+def test_add_and_search():
+    """Documentos adicionados pelo pipeline podem ser buscados"""
+    with tempfile.TemporaryDirectory() as directory:
+        vector_store = _create_vector_store(directory)
+        documents = _documents(40)
+        ids = vector_store.add_documents(documents)
+
+        assert len(ids) == 40
+        assert vector_store.get_vector_store_info()['document_count'] == 40
+
+        results = vector_store.search_similar_documents(documents[5].page_content, k=3, score_threshold=0.0)
+        assert results[0][0].page_content == documents[5].page_content
+
+def test_embedding_cache_survives_rebuild():
+    """Após limpar o índice, a reingestão usa apenas o cache persistente"""
+    with tempfile.TemporaryDirectory() as directory:
+        cache_path = os.path.join(directory, 'embedding_cache.sqlite')
+        vector_store = _create_vector_store(directory, embedding_cache_path=cache_path)
+        documents = _documents(20)
+        vector_store.add_documents(documents)
+        assert vector_store.embedding_cache.get_stats()['entries'] >= 20
+
+        vector_store.clear_vector_store()
+        misses_before = vector_store.embedding_cache.get_stats()['misses']
+        vector_store.add_documents(documents)
+        stats = vector_store.embedding_cache.get_stats()
+        assert stats['misses'] == misses_before
+        assert stats['hits'] >= 20
+
+def test_embedding_cache_eviction():
+    """O cache respeita o limite de entradas removendo as menos usadas"""
+    with tempfile.TemporaryDirectory() as directory:
+        cache = EmbeddingCache(os.path.join(directory, 'cache.sqlite'), max_entries=10)
+        cache.put_many('modelo', {f"h{i}": [float(i)] * 4 for i in range(8)})
+        cache.get_many('modelo', ['h0'])
+        cache.put_many('modelo', {f"h{i}": [float(i)] * 4 for i in range(8, 12)})
+
+        stats = cache.get_stats()
+        assert stats['entries'] <= 10 and stats['evictions'] > 0
+        assert 'h0' in cache.get_many('modelo', ['h0'])
+        assert cache.get_many('outro-modelo', ['h0']) == {}
+
+def test_pipeline_batches_cache_access():
+    """O pipeline consulta e grava o cache uma vez por lote e só calcula os ausentes"""
+    from src.embedding_cache import CachedEmbeddings
+
+    class CountingEmbeddings(FakeEmbeddings):
+        def __init__(self):
+            super().__init__(size=8)
+            self.texts = []
+
+        def embed_documents(self, texts):
+            self.texts.extend(texts)
+            return super().embed_documents(texts)
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = EmbeddingCache(os.path.join(directory, 'cache.sqlite'))
+        backend = CountingEmbeddings()
+        cached = CachedEmbeddings(backend, cache, 'modelo')
+        texts = [f"texto {i}" for i in range(20)]
+        cached.embed_documents(texts[:10])
+        backend.texts.clear()
+
+        calls = {'get_many': 0, 'put_many': 0}
+        for name in calls:
+            def counted(*args, _method=getattr(cache, name), _name=name):
+                calls[_name] += 1
+                return _method(*args)
+            setattr(cache, name, counted)
+        pipeline = EmbeddingPipeline(cached, max_concurrency=4, batch_size=5)
+        assert pipeline.embed_documents(texts) == FakeEmbeddings(size=8).embed_documents(texts)
+        assert sorted(backend.texts) == sorted(texts[10:])
+        assert calls == {'get_many': 4, 'put_many': 2}
+
+def test_query_embedding_cache():
+    """Perguntas repetidas não geram nova chamada de embedding"""
+    with tempfile.TemporaryDirectory() as directory:
+        vector_store = _create_vector_store(directory, query_cache_size=2)
+        vector_store.add_documents(_documents(10))
+        calls = []
+        embed_query = vector_store.embeddings.embed_query
+        vector_store.embeddings.embed_query = lambda text: calls.append(text) or embed_query(text)
+
+        for _ in range(3):
+            vector_store.search_similar_documents("  Qual é a política   de férias? ", k=2)
+        vector_store.search_similar_documents("Qual é a política de férias?", k=2)
+        assert len(calls) == 1
+
+        vector_store.search_similar_documents("outra pergunta", k=2)
+        vector_store.search_similar_documents("mais uma pergunta", k=2)
+        stats = vector_store.get_vector_store_info()['query_cache']
+        assert stats['hits'] == 3 and stats['entries'] == 2 and stats['evictions'] == 1
+
+def test_shared_bedrock_client():
+    """Componentes na mesma região reutilizam o mesmo cliente e pool de conexões"""
+    factory = BedrockClientFactory(max_pool_connections=16, max_attempts=3)
+    client = factory.get_client('bedrock-runtime', region_name='us-east-1')
+    assert factory.get_client('bedrock-runtime', region_name='us-east-1') is client
+    assert factory.get_client('bedrock-runtime', region_name='us-west-2') is not client
+    assert client.meta.config.max_pool_connections == 16
+    assert client.meta.config.retries['mode'] == 'adaptive'
+
+    with tempfile.TemporaryDirectory() as directory:
+        vector_store = _create_vector_store(directory, bedrock_client=client)
+        assert vector_store.bedrock_client is client
+
+    stats = factory.get_stats()
+    assert stats['max_pool_connections'] == 16 and len(stats['clients']) == 2
+    assert stats['clients'][0]['requests'] == 0 and stats['clients'][0]['pool_utilization'] == 0
+
+def test_mmap_index_load():
+    """O índice salvo é mapeado em memória e copiado apenas ao ser alterado"""
+    with tempfile.TemporaryDirectory() as directory:
+        vector_store = _create_vector_store(directory)
+        vector_store.add_documents(_documents(20))
+        vector_store.save_vector_store()
+        vector_store.close()
+
+        reloaded = _create_vector_store(directory, index_mmap=True)
+        assert reloaded.get_vector_store_info()['index_load']['mode'] == 'mmap'
+        results = reloaded.search_similar_documents("Trecho 3 do manual.pdf sobre política 3", k=1, score_threshold=0)
+        assert results[0][0].page_content == "Trecho 3 do manual.pdf sobre política 3"
+
+        # Alterações materializam o índice; o arquivo é trocado atomicamente
+        reloaded.add_documents(_documents(5, source='novo.pdf'))
+        reloaded.save_vector_store()
+        assert reloaded.get_vector_store_info()['index_load']['mode'] == 'memory'
+        reloaded.close()
+        assert _create_vector_store(directory, index_mmap=True).vector_store.index.ntotal == 25
+
+def test_chunk_store_replaces_pickle():
+    """Os chunks ficam no SQLite e um index.pkl antigo é migrado na carga"""
+    import pickle
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+
+    with tempfile.TemporaryDirectory() as directory:
+        vector_store = _create_vector_store(directory)
+        ids = vector_store.add_documents(_documents(10))
+        vector_store.save_vector_store()
+        store_path = vector_store.vector_store_path
+        assert 'chunks.sqlite' in os.listdir(store_path) and os.path.exists(vector_store._index_file())
+        assert not os.path.exists(os.path.join(store_path, 'index.pkl'))
+
+        # Simula um vector store salvo no formato antigo (docstore pickled)
+        docstore = InMemoryDocstore({doc_id: vector_store.chunk_store.search(doc_id) for doc_id in ids})
+        with open(os.path.join(store_path, 'index.pkl'), 'wb') as f:
+            pickle.dump((docstore, vector_store.vector_store.index_to_docstore_id), f)
+        vector_store.chunk_store.clear()
+        vector_store.chunk_store.commit({})
+        vector_store.close()
+
+        migrated = _create_vector_store(directory)
+        assert not os.path.exists(os.path.join(store_path, 'index.pkl'))
+        assert migrated.get_vector_store_info()['chunk_store']['chunks'] == 10
+        results = migrated.search_similar_documents("Trecho 4 do manual.pdf sobre política 4", k=1, score_threshold=0)
+        assert results[0][0].id == ids[4] and results[0][0].metadata['chunk_id'] == 4
+
+def test_chunk_store_does_not_block_other_processes():
+    """Lotes são confirmados na hora: outra conexão abre e lê o chunk store sem esperar o escritor"""
+    from src.chunk_store import ChunkStore
+
+    with tempfile.TemporaryDirectory() as directory:
+        vector_store = _create_vector_store(directory)
+        ids = vector_store.add_documents(_documents(10))
+        db_path = vector_store.chunk_store.db_path
+
+        # Sem espera por lock: um escritor com transação aberta faria estas conexões falharem
+        for read_only in (True, False):
+            other = ChunkStore(db_path, read_only=read_only)
+            assert other.count() == 10 and other.search(ids[3]).page_content == "Trecho 3 do manual.pdf sobre política 3"
+            other.close()
+        reader = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        assert reader.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        reader.close()
+        try:
+            ChunkStore(db_path, read_only=True).set_meta('x', 1)
+            assert False, "chunk store somente leitura não deveria gravar"
+        except sqlite3.OperationalError:
+            pass
+
+def test_ann_index_types():
+    """Migração do índice flat para IVF/HNSW preserva buscas, remoções e persistência"""
+    with tempfile.TemporaryDirectory() as directory:
+        vector_store = _create_vector_store(directory)
+        ids = vector_store.add_documents(_documents(120))
+        query = "Trecho 7 do manual.pdf sobre política 0"
+
+        for index_type in ('ivf', 'hnsw'):
+            info = vector_store.rebuild_index(index_type)
+            assert info['type'] == index_type and info['vectors'] == 120
+            results = vector_store.search_similar_documents(query, k=1, score_threshold=0, nprobe=64, ef_search=128)
+            assert results[0][0].id == ids[7]
+
+        # Remoção em HNSW só marca as posições como apagadas, sem quebrar o mapeamento
+        vector_store.delete_documents(ids[:5])
+        results = vector_store.search_similar_documents(query, k=1, score_threshold=0, ef_search=128)
+        assert results[0][0].id == ids[7]
+        vector_store.save_vector_store()
+        vector_store.close()
+
+        reloaded = _create_vector_store(directory, index_mmap=True, index_type='hnsw')
+        status = reloaded.get_vector_store_info()
+        info = status['index']
+        assert (info['type'], info['vectors'], info['dimension'], info['hnsw_m']) == ('hnsw', 120, 32, 32)
+        assert (status['document_count'], status['deleted_pending_compaction']) == (115, 5)
+
+def test_ann_delete_without_rebuild():
+    """Remoções em IVF/HNSW não reconstroem o índice: saem das buscas na hora e são compactadas depois"""
+    search = dict(score_threshold=-1, nprobe=64, ef_search=256)
+    for index_type in ('ivf', 'hnsw'):
+        with tempfile.TemporaryDirectory() as directory:
+            # Sem a thread de checkpoint, que compactaria logo após a remoção
+            vector_store = _create_vector_store(directory, wal_checkpoint_interval=0)
+            ids = vector_store.add_documents(_documents(200))
+            deleted = set(ids[:50])
+            vector_store.rebuild_index(index_type)
+            index = vector_store.vector_store.index
+            vector_store.delete_documents(ids[:50])
+            assert vector_store.vector_store.index is index and index.ntotal == 200
+
+            for query in ("Trecho 3 do manual.pdf sobre política 3", "Trecho 50 do manual.pdf sobre política 0"):
+                results = vector_store.search_similar_documents(query, k=200, **search)
+                assert len(results) == 150 and not deleted & {doc.id for doc, _ in results}
+                ranged = vector_store.search_similar_documents(query, k=200, range_search=True, **search)
+                assert ranged and not deleted & {doc.id for doc, _ in ranged}
+            filtered = vector_store.search_similar_documents("política", k=200, filters={'source': 'manual.pdf'},
+                                                             **search)
+            assert len(filtered) == 150 and not deleted & {doc.id for doc, _ in filtered}
+
+            # Adições depois da remoção entram no fim do índice, sem sobrescrever posições
+            new_ids = vector_store.add_documents([Document(page_content="SKU-9911 novo item",
+                                                           metadata={'source': 'novo.txt'})])
+            assert vector_store.search_similar_documents("SKU-9911 novo item", k=1,
+                                                         **search)[0][0].id == new_ids[0]
+            assert vector_store.get_vector_store_info()['deleted_pending_compaction'] == 50
+
+            # Checkpoint com posições apagadas: outro processo as exclui ao carregar
+            vector_store.save_vector_store()
+            vector_store.close()
+            reloaded = _create_vector_store(directory, wal_checkpoint_interval=0)
+            results = reloaded.search_similar_documents("política", k=300, **search)
+            assert len(results) == 151 and not deleted & {doc.id for doc, _ in results}
+
+            # 50 de 201 passa do limite: a compactação reconstrói o índice e renumera as posições
+            reloaded._checkpoint_in_background()
+            status = reloaded.get_vector_store_info()
+            assert status['index']['type'] == index_type and status['index']['vectors'] == 151
+            assert status['deleted_pending_compaction'] == 0
+            assert sorted(reloaded.vector_store.index_to_docstore_id) == list(range(151))
+            assert reloaded.search_similar_documents("SKU-9911 novo item", k=1, **search)[0][0].id == new_ids[0]
+            assert [doc.id for doc, _ in reloaded.search_similar_documents(
+                "política", k=5, filters={'source': 'novo.txt'}, **search)] == new_ids
+            reloaded.close()
+
+    # Com a thread de checkpoint, a remoção que passa do limite a acorda para compactar
+    with tempfile.TemporaryDirectory() as directory:
+        vector_store = _create_vector_store(directory, index_type='hnsw')
+        ids = vector_store.add_documents(_documents(100))
+        vector_store.rebuild_index()
+        vector_store.delete_documents(ids[:40])
+        deadline = time.monotonic() + 10
+        while vector_store.get_vector_store_info()['index']['vectors'] != 60 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        status = vector_store.get_vector_store_info()
+        assert (status['index']['vectors'], status['deleted_pending_compaction'], status['document_count']) == (60, 0, 60)
+        vector_store.close()
+
+def test_ivf_retrained_as_corpus_grows():
+    """Um IVF treinado com um corpus pequeno é treinado de novo quando o corpus cresce além do fator"""
+    from src.ingestion_manifest import IngestionPlan
+
+    with tempfile.TemporaryDirectory() as directory:
+        vector_store = _create_vector_store(directory, index_type='ivf', index_retrain_factor=4)
+        vector_store.add_documents(_documents(100))
+        assert vector_store.rebuild_index()['nlist'] == 2
+        vector_store.save_vector_store()
+        vector_store.close()
+
+        vector_store = _create_vector_store(directory, index_type='ivf', index_retrain_factor=4)
+        assert vector_store._index_trained_vectors == 100
+        plan = IngestionPlan()
+        for count, source in ((250, 'guia.pdf'), (300, 'anexo.pdf')):
+            plan.changed = {source: {'size': count, 'mtime': 0, 'sha256': source}}
+            vector_store.apply_ingestion_plan(plan, {source: _documents(count, source)})
+            info = vector_store.get_vector_store_info()['index']
+            if count == 250:
+                # 350 vetores: ainda dentro de 4 × 100
+                assert (info['type'], info['nlist']) == ('ivf', 2)
+        # 650 > 400: centróides novos, com nlist proporcional ao corpus atual
+        assert (info['type'], info['vectors'], info['nlist']) == ('ivf', 650, 16)
+        assert vector_store._index_trained_vectors == 650
+        results = vector_store.search_similar_documents("Trecho 7 do anexo.pdf sobre política 0", k=1,
+                                                        score_threshold=0, nprobe=16)
+        assert results[0][0].page_content == "Trecho 7 do anexo.pdf sobre política 0"
+        vector_store.save_vector_store()
+        vector_store.close()
+
+        # Checkpoint sem o tamanho do treino (versão anterior): estimado pelo nlist
+        from src.chunk_store import ChunkStore
+        chunk_store = ChunkStore(os.path.join(directory, 'vector_store', 'chunks.sqlite'))
+        chunk_store.set_meta('index_trained_vectors', 0)
+        chunk_store.close()
+        reloaded = _create_vector_store(directory, index_type='ivf')
+        assert reloaded._index_trained_vectors == 39 * 16
+        reloaded.close()
+
+def test_quantized_index_with_rerank():
+    """SQ8/PQ reduzem a memória por vetor e o re-ranking recupera a distância exata"""
+    with tempfile.TemporaryDirectory() as directory:
+        vector_store = _create_vector_store(directory)
+        ids = vector_store.add_documents(_documents(300))
+        query = "Trecho 42 do manual.pdf sobre política 0"
+        exact = vector_store.search_similar_documents(query, k=3, score_threshold=0)
+        flat_bytes = vector_store.get_vector_store_info()['index']['bytes_per_vector']
+
+        for index_type, expected_bytes in (('sq8', 32), ('pq', 4)):
+            info = vector_store.rebuild_index(index_type)
+            assert info['type'] == index_type and info['bytes_per_vector'] == expected_bytes < flat_bytes
+            reranked = vector_store.search_similar_documents(query, k=3, score_threshold=0)
+            assert reranked[0][0].id == ids[42]
+            assert abs(reranked[0][1] - exact[0][1]) < 1e-4
+
+        # Reconstruir de PQ para flat usa os vetores originais, sem perda
+        vector_store.rebuild_index('flat')
+        assert vector_store.search_similar_documents(query, k=3, score_threshold=0) == exact
+
+def test_embedding_dimensions_recorded():
+    """A dimensão vai para o Titan v2 e o índice recusa vetores de outro espaço"""
+    from src.embedding_pipeline import create_embeddings
+    from src.vector_store import EmbeddingMismatchError
+
+    client = BedrockClientFactory().get_client('bedrock-runtime', region_name='us-east-1')
+    embeddings, key, dimensions = create_embeddings('bedrock', 'amazon.titan-embed-text-v2:0', client=client,
+                                                    dimensions=512)
+    assert embeddings.model_kwargs == {'dimensions': 512} and key == 'amazon.titan-embed-text-v2:0:512'
+    assert dimensions == 512
+    # Modelos sem dimensão configurável não têm a dimensão verificada contra a configuração
+    embeddings, key, dimensions = create_embeddings('bedrock', 'amazon.titan-embed-text-v1', client=client,
+                                                    dimensions=1024)
+    assert embeddings.model_kwargs is None and key == 'amazon.titan-embed-text-v1' and dimensions is None
+    assert create_embeddings('bedrock', 'amazon.titan-embed-text-v2:0', client=client, dimensions=1024)[1] == \
+        'amazon.titan-embed-text-v2:0'
+
+    with tempfile.TemporaryDirectory() as directory:
+        vector_store = _create_vector_store(directory, embedding_dimensions=32)
+        vector_store.add_documents(_documents(5))
+        vector_store.save_vector_store()
+        assert vector_store.get_vector_store_info()['embedding_dimensions'] == 32
+        vector_store.close()
+
+        try:
+            _create_vector_store(directory, embedding_dimensions=16)
+            assert False, "índice de dimensão diferente não deveria carregar"
+        except EmbeddingMismatchError:
+            pass
+
+        rebuilt = _create_vector_store(directory, embedding_dimensions=16, reset_on_embedding_change=True)
+        assert rebuilt.get_vector_store_info()['embedding_dimensions'] == 16
+        assert rebuilt.vector_store.index.ntotal == 0
+
+def test_range_search_with_cosine():
+    """A busca por raio retorna só os chunks acima do limiar, em quantidade variável"""
+    import numpy as np
+
+    with tempfile.TemporaryDirectory() as directory:
+        vector_store = _create_vector_store(directory, index_metric='l2')
+        ids = vector_store.add_documents(_documents(200))
+        assert vector_store.get_vector_store_info()['index']['metric'] == 'l2'
+        # Índice L2 existente é migrado para cosseno com os vetores guardados
+        vector_store.index_metric = 'cosine'
+        assert vector_store.rebuild_index('flat')['metric'] == 'cosine'
+
+        query = "Trecho 9 do manual.pdf sobre política 2"
+        vectors = np.vstack([vector_store.chunk_store.get_vectors(ids)[doc_id] for doc_id in ids])
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        expected = int(np.sum(vectors @ vectors[9] >= 0.2))
+
+        for index_type in ('flat', 'hnsw', 'sq8'):
+            vector_store.rebuild_index(index_type)
+            exact = vector_store.search_similar_documents(query, k=5, score_threshold=0.99, range_search=True)
+            assert [doc.id for doc, _ in exact] == [ids[9]] and exact[0][1] < 1e-4
+
+            results = vector_store.search_similar_documents(query, k=500, score_threshold=0.2,
+                                                            range_search=True, ef_search=256)
+            scores = [score for _, score in results]
+            assert scores == sorted(scores) and all(score <= 0.8 + 1e-5 for score in scores)
+            assert abs(len(results) - expected) <= 2 and 1 < len(results) < 200
+            capped = vector_store.search_similar_documents(query, k=3, score_threshold=0.2, range_search=True)
+            assert len(capped) == 3
+
+def test_search_batch():
+    """Uma busca em lote equivale às buscas individuais, com uma única chamada ao índice"""
+    with tempfile.TemporaryDirectory() as directory:
+        vector_store = _create_vector_store(directory)
+        ids = vector_store.add_documents(_documents(150))
+        queries = [f"Trecho {i} do manual.pdf sobre política {i % 7}" for i in range(0, 150, 10)]
+        queries.append(queries[0])
+
+        for index_type in ('flat', 'sq8'):
+            vector_store.rebuild_index(index_type)
+            batch = vector_store.search_batch(queries, k=4)
+            assert len(batch) == len(queries)
+            assert [row[0][0].id for row in batch] == [ids[i] for i in range(0, 150, 10)] + [ids[0]]
+            for query, row in zip(queries, batch):
+                single = vector_store.search_by_vector(vector_store.embed_query(query), k=4)
+                assert [doc.id for doc, _ in row] == [doc.id for doc, _ in single]
+
+        assert all(len(row) == 1 for row in vector_store.search_batch(queries, k=4, score_threshold=0.99))
+        assert vector_store.search_batch([], k=4) == []
+
+def test_metadata_filtered_search():
+    """Filtros por source/file_type são aplicados dentro do índice, em todos os tipos"""
+    from src import index_factory
+    from src.metadata_index import parse_filters
+
+    with tempfile.TemporaryDirectory() as directory:
+        vector_store = _create_vector_store(directory)
+        guide = _documents(20, source='guia.docx')
+        for doc in guide:
+            doc.metadata['file_type'] = '.docx'
+        ids = vector_store.add_documents(_documents(300) + _documents(5, source='faq.pdf') + guide)
+        query = "Trecho 3 do manual.pdf sobre política 3"
+
+        subset_index = index_factory._subset_index
+        try:
+            for index_type in ('flat', 'ivf', 'hnsw', 'sq8', 'pq'):
+                vector_store.rebuild_index(index_type)
+                # 0: seletor dentro do faiss (PQ: tabela ADC só dos códigos do filtro); 2048: busca exata
+                for exact_max in (0, 2048):
+                    vector_store.filter_exact_max = exact_max
+                    # Acima de exact_max nenhum tipo reconstrói os vetores do filtro
+                    index_factory._subset_index = subset_index if exact_max else None
+                    results = vector_store.search_by_vector(vector_store.embed_query(query), k=5, nprobe=64,
+                                                            filters={'source': 'faq.pdf'})
+                    assert sorted(doc.id for doc, _ in results) == sorted(ids[300:305])
+                    results = vector_store.search_similar_documents(query, k=8, score_threshold=-1,
+                                                                    filters={'file_type': '.docx'})
+                    assert len(results) == 8 and {doc.metadata['source'] for doc, _ in results} == {'guia.docx'}
+                    results = vector_store.search_similar_documents(
+                        query, k=3, score_threshold=0.99, range_search=True,
+                        filters={'source': ['faq.pdf', 'manual.pdf'], 'file_type': '.pdf'}
+                    )
+                    assert [doc.id for doc, _ in results] == [ids[3]]
+        finally:
+            index_factory._subset_index = subset_index
+
+        vector_store.delete_by_source('faq.pdf')
+        assert vector_store.search_by_vector(vector_store.embed_query(query), filters={'source': 'faq.pdf'}) == []
+        results = vector_store.search_by_vector(vector_store.embed_query(query), k=3,
+                                                filters={'source': 'guia.docx'})
+        assert {doc.id for doc, _ in results} <= set(ids[305:])
+        vector_store.save_vector_store()
+
+        # O índice de metadados é remontado a partir do chunk store na carga
+        reloaded = _create_vector_store(directory)
+        assert reloaded.metadata_index.get_stats() == {'vectors': 320, 'fields': {'source': 2, 'file_type': 2}}
+        results = reloaded.search_by_vector(reloaded.embed_query(query), k=30, filters={'file_type': '.docx'})
+        assert sorted(doc.id for doc, _ in results) == sorted(ids[305:])
+
+        for invalid in ({'author': 'x'}, {'source': []}, {'source': 3}, ['manual.pdf']):
+            try:
+                parse_filters(invalid)
+                assert False, f"filtro inválido aceito: {invalid}"
+            except ValueError:
+                pass
+
+def test_hybrid_search():
+    """Códigos que os embeddings não aproximam são encontrados pela parte BM25"""
+    from src.lexical_index import analyze
+
+    assert analyze("Políticas do produto SKU-4471-B, Art. 5º") == \
+        ['politic', 'produt', 'sku-4471-b', 'sku', '4471', 'art', '5']
+    assert analyze("política") == analyze("politicas")
+
+    with tempfile.TemporaryDirectory() as directory:
+        vector_store = _create_vector_store(directory)
+        codes = [Document(page_content=f"O reembolso do produto SKU-{4400 + i}-B segue a regra {i}",
+                          metadata={'source': 'produtos.docx', 'chunk_id': i, 'file_type': '.docx'})
+                 for i in range(30)]
+        ids = vector_store.add_documents(_documents(200) + codes)
+        query = "Qual o prazo de reembolso do SKU-4417-B?"
+
+        vector_only = vector_store.search_similar_documents(query, k=5, score_threshold=-1)
+        assert ids[217] not in [doc.id for doc, _ in vector_only]
+        hybrid = vector_store.search_similar_documents(query, k=5, score_threshold=0.7, hybrid=True)
+        assert ids[217] in [doc.id for doc, _ in hybrid]
+        # O score continua sendo a distância vetorial, também para quem veio só do BM25
+        distances = {doc.id: score for doc, score in
+                     vector_store.search_by_vector(vector_store.embed_query(query), k=230)}
+        assert all(abs(score - distances[doc.id]) < 1e-5 for doc, score in hybrid)
+        # Com range_search o limiar vale também para os chunks que só vieram do BM25
+        threshold = 1.0 - sorted(distances.values())[3]
+        ranged = vector_store.search_similar_documents(query, k=5, score_threshold=threshold,
+                                                       hybrid=True, range_search=True)
+        assert ranged and all(score <= 1.0 - threshold + 1e-5 for _, score in ranged)
+        assert ids[217] not in [doc.id for doc, _ in ranged] and distances[ids[217]] > 1.0 - threshold
+        # Chunk antigo sem vetor original: distância pelo vetor reconstruído do índice, nunca infinita
+        with vector_store.chunk_store._lock:
+            vector_store.chunk_store._conn.execute("UPDATE chunks SET vector = NULL WHERE doc_id = ?", (ids[217],))
+        hybrid = dict((doc.id, score) for doc, score in
+                      vector_store.search_similar_documents(query, k=5, score_threshold=0.7, hybrid=True))
+        assert abs(hybrid[ids[217]] - distances[ids[217]]) < 1e-5
+        index = vector_store.vector_store.index
+        def no_reconstruct(position):
+            raise RuntimeError("direct map not initialized")
+        index.reconstruct = no_reconstruct
+        hybrid = vector_store.search_similar_documents(query, k=5, score_threshold=0.7, hybrid=True)
+        assert ids[217] not in [doc.id for doc, _ in hybrid] and all(score < 2 for _, score in hybrid)
+        del index.reconstruct
+        filtered = vector_store.hybrid_search("reembolso SKU-4417-B", k=5, filters={'source': 'manual.pdf'})
+        assert ids[217] not in [doc.id for doc, _ in filtered]
+
+        vector_store.delete_by_source('produtos.docx')
+        assert vector_store.lexical_index.search("SKU-4417-B") == []
+        vector_store.add_documents(codes[:10])
+        vector_store.save_vector_store()
+        vector_store.close()
+
+        # Sem busca híbrida configurada, o índice BM25 não é carregado na inicialização
+        lazy = _create_vector_store(directory)
+        assert lazy.lexical_index is None and lazy.get_vector_store_info()['lexical_index'] is None
+        lazy_results = lazy.search_similar_documents("Qual o prazo de reembolso do SKU-4407-B?", k=5, hybrid=True)
+        assert any('SKU-4407-B' in doc.page_content for doc, _ in lazy_results)
+        assert lazy.lexical_index.get_stats()['documents'] == 210
+        lazy.close()
+
+        # Com ela, vem do chunk store (gravado no checkpoint, sem pickle) ou é reconstruído se ausente
+        reloaded = _create_vector_store(directory, hybrid_search=True)
+        assert reloaded.lexical_index.get_stats()['documents'] == 210
+        assert not os.path.exists(os.path.join(reloaded.active_path, 'lexical.pkl'))
+        reloaded.close()
+        with sqlite3.connect(reloaded.chunk_store.db_path) as conn:
+            conn.execute("DELETE FROM meta WHERE key = 'lexical'")
+        rebuilt = _create_vector_store(directory, hybrid_search=True)
+        assert [doc_id for doc_id, _ in rebuilt.lexical_index.search("SKU-4407-B", k=1)] == \
+            [doc_id for doc_id, _ in reloaded.lexical_index.search("SKU-4407-B", k=1)]
+
+def test_mmr_diversity():
+    """O MMR troca chunks repetidos por trechos diferentes, mantendo o mais relevante"""
+    import numpy as np
+    from src.reranking import mmr
+
+    query = np.array([1.0, 0.0, 0.0])
+    # Três quase cópias muito relevantes e dois trechos distintos um pouco menos relevantes
+    candidates = np.array([[1.0, 0.05, 0.0], [1.0, 0.06, 0.0], [1.0, 0.04, 0.01],
+                           [0.7, 0.7, 0.0], [0.7, 0.0, 0.7]])
+    assert mmr(query, candidates, k=3, lambda_mult=1.0) == [2, 0, 1]
+    diverse = mmr(query, candidates, k=3, lambda_mult=0.3)
+    assert diverse[0] == 2 and set(diverse[1:]) == {3, 4}
+    assert sorted(mmr(query, candidates, k=10)) == [0, 1, 2, 3, 4]
+    assert mmr(query, candidates[:0], k=3) == []
+
+    with tempfile.TemporaryDirectory() as directory:
+        vector_store = _create_vector_store(directory)
+        text = "Prazo de reembolso de produtos com defeito"
+        copies = [Document(page_content=text, metadata={'source': f'copia{i}.pdf', 'chunk_id': 0,
+                                                         'file_type': '.pdf'}) for i in range(5)]
+        vector_store.add_documents(copies + _documents(60))
+
+        plain = vector_store.search_similar_documents(text, k=5, score_threshold=-1)
+        assert all(doc.page_content == text for doc, _ in plain)
+        diverse = vector_store.search_similar_documents(text, k=5, score_threshold=-1, mmr=True, mmr_lambda=0.3)
+        assert len(diverse) == 5 and diverse[0][0].page_content == text
+        assert sum(doc.page_content == text for doc, _ in diverse) < 5
+        # lambda=1 é só relevância: mesmo resultado da busca sem MMR
+        relevance_only = vector_store.search_similar_documents(text, k=5, score_threshold=-1, mmr=True,
+                                                               mmr_lambda=1.0)
+        assert [doc.page_content for doc, _ in relevance_only] == [doc.page_content for doc, _ in plain]
+
+def test_upsert_and_delete_by_source():
+    """Reenviar os mesmos chunks não duplica; delete_by_source remove só o arquivo"""
+    with tempfile.TemporaryDirectory() as directory:
+        vector_store = _create_vector_store(directory)
+        first = vector_store.upsert_documents(_documents(10) + _documents(5, source='faq.pdf'))
+        assert first['added'] == 15 and first['skipped'] == 0
+
+        moved = _documents(10)
+        for doc in moved:
+            doc.metadata['chunk_id'] += 100
+        second = vector_store.upsert_documents(moved)
+        assert second['added'] == 0 and second['ids'] == first['ids'][:10]
+        assert vector_store.vector_store.index.ntotal == 15
+        assert vector_store.chunk_store.search(second['ids'][0]).metadata['chunk_id'] == 100
+
+        assert vector_store.delete_by_source('manual.pdf') == 10
+        assert vector_store.delete_by_source('manual.pdf') == 0
+        vector_store.save_vector_store()
+        results = vector_store.search_by_vector(vector_store.embed_query("política"), k=20)
+        assert len(results) == 5 and {doc.metadata['source'] for doc, _ in results} == {'faq.pdf'}
+
+def test_wal_recovery():
+    """Adições e remoções confirmadas sobrevivem a uma queda antes do checkpoint"""
+    with tempfile.TemporaryDirectory() as directory:
+        vector_store = _create_vector_store(directory, wal_checkpoint_interval=0)
+        ids = vector_store.upsert_documents(_documents(10))['ids']
+        vector_store.save_vector_store()
+        assert vector_store.wal.size_bytes() == 0
+
+        vector_store.upsert_documents(_documents(5, source='faq.pdf'))
+        vector_store.delete_documents(ids[:3])
+        wal_path = vector_store.wal.path
+        # Queda: processo encerrado sem checkpoint e um registro cortado no fim do WAL
+        vector_store.close()
+        vector_store.chunk_store.close()
+        with open(wal_path, 'ab') as f:
+            f.write(b'\x07\x00\x00')
+
+        recovered = _create_vector_store(directory, wal_checkpoint_interval=0)
+        stored_ids = set(recovered.vector_store.index_to_docstore_id.values())
+        assert recovered.vector_store.index.ntotal == 12 and not stored_ids & set(ids[:3])
+        faq = recovered.search_by_vector(recovered.embed_query("Trecho 1 do faq.pdf sobre política 1"), k=1)
+        assert faq[0][0].page_content == "Trecho 1 do faq.pdf sobre política 1"
+
+        recovered.checkpoint()
+        assert recovered.wal.size_bytes() == 0
+        recovered.close()
+        recovered.chunk_store.close()
+        reloaded = _create_vector_store(directory, wal_checkpoint_interval=0)
+        assert reloaded.vector_store.index.ntotal == 12
+
+def test_checkpoint_crash_before_commit():
+    """Uma queda entre gravar o índice e confirmar o chunk store mantém o checkpoint anterior"""
+    with tempfile.TemporaryDirectory() as directory:
+        vector_store = _create_vector_store(directory, wal_checkpoint_interval=0)
+        ids = vector_store.upsert_documents(_documents(10))['ids']
+        vector_store.save_vector_store()
+        vector_store.upsert_documents(_documents(5, source='faq.pdf'))
+        vector_store.delete_documents(ids[:3])
+
+        def crash(index_to_docstore_id, meta=None, lexical=None):
+            raise OSError("queda simulada")
+        vector_store.chunk_store.commit = crash
+        try:
+            vector_store.checkpoint()
+            assert False, "checkpoint deveria falhar"
+        except OSError:
+            pass
+        vector_store.close()
+        vector_store.chunk_store.close()
+
+        recovered = _create_vector_store(directory, wal_checkpoint_interval=0)
+        mapping = recovered.vector_store.index_to_docstore_id
+        assert recovered.vector_store.index.ntotal == len(mapping) == 12
+        assert sorted(mapping) == list(range(12)) and not set(mapping.values()) & set(ids[:3])
+        results = recovered.search_by_vector(recovered.embed_query("Trecho 4 do manual.pdf sobre política 4"), k=1)
+        assert results[0][0].id == ids[4]
+
+        recovered.checkpoint()
+        assert [name for name in os.listdir(recovered.active_path) if name.endswith('.faiss')] == \
+            [os.path.basename(recovered._index_file())]
+
+def test_load_error_keeps_corpus():
+    """Um erro ao ler o índice impede a inicialização em vez de recriar o vector store vazio"""
+    import faiss
+
+    with tempfile.TemporaryDirectory() as directory:
+        vector_store = _create_vector_store(directory, wal_checkpoint_interval=0)
+        vector_store.add_documents(_documents(10))
+        vector_store.save_vector_store()
+        index_file = vector_store._index_file()
+        vector_store.close()
+        vector_store.chunk_store.close()
+
+        read_index = faiss.read_index
+        def transient_error(*args):
+            raise RuntimeError("Error in faiss::FileIOReader: erro de leitura simulado")
+        faiss.read_index = transient_error
+        try:
+            _create_vector_store(directory, wal_checkpoint_interval=0)
+            assert False, "erro na carga deveria ser propagado"
+        except RuntimeError:
+            pass
+        finally:
+            faiss.read_index = read_index
+
+        # Índice ausente com chunks de um checkpoint: também não recria vazio
+        os.rename(index_file, index_file + '.bak')
+        try:
+            _create_vector_store(directory, wal_checkpoint_interval=0)
+            assert False, "índice ausente deveria ser propagado"
+        except FileNotFoundError:
+            pass
+        os.rename(index_file + '.bak', index_file)
+
+        reloaded = _create_vector_store(directory, wal_checkpoint_interval=0)
+        assert reloaded.vector_store.index.ntotal == reloaded.chunk_store.count() == 10
+
+def test_single_writer_process():
+    """Só o processo com o lock de escritor grava; os demais leem e adotam os checkpoints dele"""
+    from src.vector_store import ReadOnlyVectorStoreError
+
+    with tempfile.TemporaryDirectory() as directory:
+        writer = _create_vector_store(directory, wal_checkpoint_interval=0)
+        ids = writer.add_documents(_documents(10))
+        writer.save_vector_store()
+        writer.add_documents(_documents(5, source='faq.pdf'))
+
+        # Outro processo (o flock vale por arquivo aberto, também dentro do mesmo processo)
+        reader = _create_vector_store(directory, wal_checkpoint_interval=0, version_check_interval=0)
+        assert reader.read_only and reader.wal is None and reader.get_vector_store_info()['read_only']
+        assert reader.vector_store.index.ntotal == 10
+        for write in (lambda: reader.add_documents(_documents(2, source='outro.pdf')),
+                      lambda: reader.delete_documents(ids[:1]), reader.checkpoint, reader.save_vector_store):
+            try:
+                write()
+                assert False, "processo somente leitura não deveria gravar"
+            except ReadOnlyVectorStoreError:
+                pass
+        assert writer.vector_store.index.ntotal == 15 and writer.chunk_store.count() == 15
+
+        # O checkpoint do escritor é adotado pelo leitor na próxima verificação
+        writer.checkpoint()
+        assert reader.refresh_version(force=True) and reader.vector_store.index.ntotal == 15
+        faq = reader.search_by_vector(reader.embed_query("Trecho 2 do faq.pdf sobre política 2"), k=1)
+        assert faq[0][0].page_content == "Trecho 2 do faq.pdf sobre política 2"
+
+        # Encerrado o escritor, o próximo processo a abrir assume a escrita
+        writer.close()
+        successor = _create_vector_store(directory, wal_checkpoint_interval=0)
+        assert not successor.read_only and successor.wal is not None
+        successor.delete_documents(ids[:2])
+        assert successor.vector_store.index.ntotal == 13
+
+def test_blue_green_versions():
+    """A reconstrução vai para uma versão nova, trocada atomicamente e com rollback"""
+    with tempfile.TemporaryDirectory() as directory:
+        vector_store = _create_vector_store(directory)
+        vector_store.upsert_documents(_documents(10))
+        vector_store.save_vector_store()
+        worker = _create_vector_store(directory, version_check_interval=1e-6)
+
+        staging = vector_store.create_version()
+        staging.upsert_documents(_documents(4, source='novo.pdf'))
+        # Durante o build as buscas continuam na versão atual
+        assert vector_store.search_by_vector(vector_store.embed_query("política"), k=20)[0][0].metadata['source'] == \
+            'manual.pdf'
+        staging.save_vector_store()
+        previous_chunk_store = vector_store.chunk_store
+        first = vector_store.activate_version(staging)
+        # A conexão da versão que saiu de uso é fechada antes de o diretório ser apagado
+        try:
+            previous_chunk_store.count()
+            assert False, "chunk store anterior deveria estar fechado"
+        except sqlite3.ProgrammingError:
+            pass
+        assert vector_store.version == first and vector_store.vector_store.index.ntotal == 4
+        assert not [name for name in os.listdir(vector_store.vector_store_path) if name.endswith('.faiss')]
+        assert find_index_file(vector_store.vector_store_path) == vector_store._index_file()
+
+        # Outro worker adota a versão publicada na próxima busca
+        results = worker.search_by_vector(worker.embed_query("política"), k=20)
+        assert worker.version == first and {doc.metadata['source'] for doc, _ in results} == {'novo.pdf'}
+
+        staging = vector_store.create_version()
+        staging.upsert_documents(_documents(6, source='faq.pdf'))
+        staging.save_vector_store()
+        second = vector_store.activate_version(staging)
+        assert vector_store.list_versions() == [first, second]
+
+        assert vector_store.rollback_version() == first
+        assert vector_store.vector_store.index.ntotal == 4
+        assert _create_vector_store(directory).version == first
+
+def _write_docx_files(directory, count, paragraphs=40):
+    import docx
+    os.makedirs(directory, exist_ok=True)
+    for n in range(count):
+        document = docx.Document()
+        for i in range(paragraphs):
+            document.add_paragraph(f"Documento {n}, cláusula {i}: regras de reembolso e férias. " * 6)
+        document.save(os.path.join(directory, f"politica_{n}.docx"))
+
+def test_ingestion_job_progress_and_cancel():
+    """Jobs em background informam progresso; o cancelamento preserva a versão ativa"""
+    import time
+    from src.document_processor import DocumentProcessor
+    from src.ingestion_jobs import IngestionJobManager, ingest_directory
+
+    with tempfile.TemporaryDirectory() as directory:
+        documents_path = os.path.join(directory, 'documents')
+        _write_docx_files(documents_path, 3)
+        processor = DocumentProcessor(chunk_size=300, chunk_overlap=30)
+        vector_store = _create_vector_store(directory)
+        manager = IngestionJobManager()
+
+        job = manager.submit(lambda job: ingest_directory(vector_store, processor, documents_path,
+                                                          full_rebuild=True, progress=job))
+        while not job.is_finished():
+            time.sleep(0.01)
+        status = manager.get(job.job_id).to_dict()
+        assert status['status'] == 'succeeded', status['error']
+        assert status['files_done'] == status['files_total'] == 3
+        assert status['chunks_embedded'] == vector_store.vector_store.index.ntotal > 0
+        assert status['result']['index_version'] == vector_store.version
+
+        # Build lento cancelado no meio: a versão ativa continua a mesma
+        active = vector_store.version
+        vector_store.embedding_pipeline.embeddings.latency = 0.01
+        slow = manager.submit(lambda job: ingest_directory(vector_store, processor, documents_path,
+                                                           full_rebuild=True, progress=job))
+        while slow.chunks_embedded == 0 and not slow.is_finished():
+            time.sleep(0.01)
+        manager.cancel(slow.job_id)
+        while not slow.is_finished():
+            time.sleep(0.01)
+        assert slow.status == 'cancelled'
+        assert vector_store.version == active and vector_store.list_versions() == [active]
+        manager.shutdown()
+
+def test_concurrent_search_and_ingestion():
+    """Buscas em várias threads enquanto a ingestão adiciona, remove e reconstrói o índice"""
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    with tempfile.TemporaryDirectory() as directory:
+        vector_store = _create_vector_store(directory, embedding_batch_size=4)
+        vector_store.upsert_documents(_documents(50))
+        stable = "Trecho 7 do manual.pdf sobre política 0"
+        stop = threading.Event()
+        errors = []
+
+        def search():
+            searches = 0
+            while not stop.is_set() or searches < 20:
+                try:
+                    results = vector_store.search_by_vector(vector_store.embed_query(stable), k=3)
+                    assert results[0][0].page_content == stable
+                except Exception as e:
+                    errors.append(repr(e))
+                    return searches
+                searches += 1
+            return searches
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            searchers = [executor.submit(search) for _ in range(6)]
+            for round_number in range(5):
+                source = f"lote{round_number}.pdf"
+                vector_store.upsert_documents(_documents(40, source=source))
+                vector_store.delete_by_source(source if round_number % 2 else 'inexistente.pdf')
+                vector_store.rebuild_index('hnsw' if round_number % 2 else 'flat')
+                vector_store.checkpoint()
+            stop.set()
+            searched = sum(future.result() for future in searchers)
+
+        assert not errors, errors[:3]
+        assert searched >= 120
+        mapping = vector_store.vector_store.index_to_docstore_id
+        assert len(mapping) == vector_store.vector_store.index.ntotal == 50 + 3 * 40
+        stats = vector_store.get_vector_store_info()['locks']
+        assert stats['active_readers'] == 0 and not stats['writer_active'] and stats['writes'] > 0
+
+def main():
+    """Executa os testes"""
+    test_pipeline_preserves_order()
+    print("✓ Pipeline de embeddings ordenado")
+    test_add_and_search()
+    print("✓ Adição e busca no vector store")
+    test_embedding_cache_survives_rebuild()
+    print("✓ Cache persistente de embeddings")
+    test_embedding_cache_eviction()
+    print("✓ Remoção por tamanho no cache")
+    test_pipeline_batches_cache_access()
+    print("✓ Cache consultado uma vez por lote no pipeline")
+    test_query_embedding_cache()
+    print("✓ Cache LRU de embeddings de consultas")
+    test_shared_bedrock_client()
+    print("✓ Cliente Bedrock compartilhado")
+    test_mmap_index_load()
+    print("✓ Carregamento do índice com mmap")
+    test_chunk_store_replaces_pickle()
+    print("✓ Chunk store em SQLite")
+    test_chunk_store_does_not_block_other_processes()
+    print("✓ Chunk store sem transações longas")
+    test_ann_index_types()
+    print("✓ Índices IVF e HNSW")
+    test_ann_delete_without_rebuild()
+    print("✓ Remoções em IVF/HNSW sem reconstruir o índice")
+    test_ivf_retrained_as_corpus_grows()
+    print("✓ IVF treinado de novo com o crescimento do corpus")
+    test_quantized_index_with_rerank()
+    print("✓ Índices quantizados com re-ranking")
+    test_embedding_dimensions_recorded()
+    print("✓ Dimensão de embedding registrada no índice")
+    test_range_search_with_cosine()
+    print("✓ Busca por raio com métrica de cosseno")
+    test_search_batch()
+    print("✓ Busca em lote")
+    test_metadata_filtered_search()
+    print("✓ Busca filtrada por metadados")
+    test_hybrid_search()
+    print("✓ Busca híbrida BM25 + vetorial")
+    test_mmr_diversity()
+    print("✓ Diversificação MMR dos resultados")
+    test_upsert_and_delete_by_source()
+    print("✓ Upsert idempotente e remoção por arquivo")
+    test_wal_recovery()
+    print("✓ Recuperação pelo WAL após queda")
+    test_checkpoint_crash_before_commit()
+    print("✓ Checkpoint atômico com queda antes do commit")
+    test_load_error_keeps_corpus()
+    print("✓ Erro na carga preserva o corpus")
+    test_single_writer_process()
+    print("✓ Um único processo escritor")
+    test_blue_green_versions()
+    print("✓ Versões do índice com troca atômica e rollback")
+    test_ingestion_job_progress_and_cancel()
+    print("✓ Jobs de ingestão com progresso e cancelamento")
+    test_concurrent_search_and_ingestion()
+    print("✓ Buscas concorrentes com ingestão")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)